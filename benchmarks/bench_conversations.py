@@ -0,0 +1,220 @@
+# benchmarks/bench_conversations.py
+"""Load generator: N concurrent WhatsApp users walking the real conversation flows.
+
+Setiap user (thread) mengirim pesan, menunggu balasan pertama, lalu mengirim pesan
+berikutnya. Pesan diproses oleh satu loop receiver yang meniru GreenAPIBot.run_forever
+(receiveNotification -> router.route_event -> deleteNotification) dengan router dan
+handler asli dari bot.py, TaskHandler dan AdminHandler, di atas Supabase/GreenAPI tiruan.
+
+Latency balasan diukur dari pesan masuk antrean sampai balasan pertama terkirim, jadi
+termasuk waktu antre di belakang user lain. Query per aksi dihitung di loop receiver.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_conversations --concurrency 1,10,50,100 --db-latency-ms 20
+    python -m benchmarks.bench_conversations --compare    # bandingkan dengan benchmarks/baseline.json
+"""
+import argparse
+import itertools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+ADMIN_PHONES = [f"6280000000{index:03d}@c.us" for index in range(10)]
+
+def next_weekday_deadline(weekday_id: int) -> str:
+    """'DD-MM-YYYY HH:MM' (WIB) on the next date whose weekday matches day id `weekday_id` (1 = Senin)."""
+    wib = timezone(timedelta(hours=7))
+    date = datetime.now(wib) + timedelta(days=1)
+    while date.weekday() + 1 != weekday_id:
+        date += timedelta(days=1)
+    return date.strftime("%d-%m-%Y 23:59")
+
+def flows():
+    """Scripted conversations as lists of (action, text); each starts from an empty session."""
+    return {
+        "reminder_setup": [
+            ("main_menu", "halo"), ("class_list", "1"), ("day_menu", "1"), ("task_list", "1"),
+            ("task_detail", "1"), ("set_reminder", "1"),
+        ],
+        "back_navigation": [
+            ("main_menu", "halo"), ("class_list", "1"), ("day_menu", "1"), ("task_list", "1"),
+            ("back", "0"), ("back", "0"), ("back", "0"),
+        ],
+        "invalid_input": [
+            ("main_menu", "halo"), ("invalid_input", "xyz"), ("class_list", "1"), ("invalid_input", "99"),
+        ],
+        "commands": [
+            ("main_menu", "halo"), ("upcoming", "upcoming"), ("search", "cari branding"),
+        ],
+        "admin_add_task": [
+            ("main_menu", "halo"), ("admin_menu", "2"), ("admin_add_task", "1"), ("admin_pick_class", "1"),
+            ("admin_pick_day", "2"), ("admin_task_name", "Laporan riset pasar"), ("admin_task_type", "1"),
+            ("admin_task_description", "Analisis kompetitor dan positioning"),
+            ("admin_save_task", next_weekday_deadline(2)),
+        ],
+    }
+
+USER_FLOW_WEIGHTS = {"reminder_setup": 4, "back_navigation": 2, "invalid_input": 1, "commands": 2}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,10,50,100", help="Concurrent user counts to run, comma separated")
+    parser.add_argument("--flows-per-user", type=int, default=3, help="Conversations each simulated user walks")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause between a reply and the user's next message")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Simulated latency per Supabase query")
+    parser.add_argument("--send-latency-ms", type=float, default=0.0, help="Simulated latency per sendMessage")
+    parser.add_argument("--reply-timeout", type=float, default=30.0, help="Seconds a user waits for a reply")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--compare", action="store_true", help="Compare with benchmarks/baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression for --compare")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results to benchmarks/baseline.json")
+    return parser.parse_args()
+
+
+class ConversationLoad:
+    """One load level: a receiver loop plus `users` user threads sharing the fakes."""
+    def __init__(self, router, fake_api, fake_db, args):
+        self.router = router
+        self.fake_api = fake_api
+        self.fake_db = fake_db
+        self.args = args
+        self.action_by_message = {}
+        self.queries = defaultdict(list) # action -> query count per routed message
+        self.latencies_ms = defaultdict(list) # action -> reply latency
+        self.errors = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._message_ids = itertools.count(1)
+
+    def _receive_loop(self):
+        receiving = self.fake_api.receiving
+        while not self._stop.is_set():
+            response = receiving.receiveNotification()
+            if not response.data:
+                time.sleep(0.0005)
+                continue
+            body = response.data["body"]
+            calls_before = self.fake_db.total_calls()
+            try:
+                self.router.route_event(body)
+            except Exception as e:
+                self.errors.append(f"route_event raised {e!r}")
+            action = self.action_by_message.get(body["idMessage"])
+            self.queries[action].append(self.fake_db.total_calls() - calls_before)
+            receiving.deleteNotification(response.data["receiptId"])
+
+    def _user(self, sender, conversations):
+        state_manager = self.router.message.state_manager
+        for conversation in conversations:
+            state_manager.delete_state(sender) # sesi baru, setara sesi yang kedaluwarsa
+            for action, text in conversation:
+                with self.fake_api.replied:
+                    seen = self.fake_api.replies[sender]
+                id_message = f"LOAD{next(self._message_ids)}"
+                self.action_by_message[id_message] = action
+                self.fake_api.push_incoming(sender, text, id_message)
+                started = time.perf_counter()
+                if not self.fake_api.wait_for_reply(sender, seen, self.args.reply_timeout):
+                    self.errors.append(f"{sender}: no reply to {action!r} within {self.args.reply_timeout}s")
+                    return
+                with self._lock:
+                    self.latencies_ms[action].append((time.perf_counter() - started) * 1000)
+                if self.args.think_ms:
+                    time.sleep(self.args.think_ms / 1000)
+
+    def run(self, users: int, rng: random.Random) -> float:
+        """Run every user to completion and return the elapsed wall time in seconds."""
+        scripts = flows()
+        names = list(USER_FLOW_WEIGHTS)
+        weights = [USER_FLOW_WEIGHTS[name] for name in names]
+        threads = []
+        for index in range(users):
+            if index % 10 == 0:
+                sender = ADMIN_PHONES[(index // 10) % len(ADMIN_PHONES)]
+                conversations = [scripts["admin_add_task"]] + [scripts[rng.choices(names, weights)[0]]
+                                                               for _ in range(self.args.flows_per_user - 1)]
+            else:
+                sender = f"62812{index:08d}@c.us"
+                conversations = [scripts[rng.choices(names, weights)[0]] for _ in range(self.args.flows_per_user)]
+            threads.append(threading.Thread(target=self._user, args=(sender, conversations), daemon=True))
+
+        receiver = threading.Thread(target=self._receive_loop, name="BenchReceiver", daemon=True)
+        receiver.start()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        self._stop.set()
+        receiver.join()
+        return elapsed
+
+def build_app(fake_api):
+    from benchmarks.bench_handlers import build_app as build_router
+    return build_router(fake_api)
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("ADMIN_PHONES", ",".join(ADMIN_PHONES))
+    # Input tidak valid sengaja dikirim; warning handler akan membanjiri output
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    # Hanya WARNING ke atas: modul src mencatat banyak INFO saat di-import dan startup
+    logging.basicConfig(level=logging.WARNING)
+
+    from benchmarks.fakes import FakeGreenAPI, FakeSupabase, install_fake_supabase, seed_tables
+    from benchmarks.regression import compare_to_baseline, percentile, save_baseline
+
+    results = {}
+    rng = random.Random(args.seed)
+    print(f"{'users':>6} {'msgs':>7} {'msg/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'q/action':>9}")
+    per_action = None
+    for users in (int(value) for value in args.concurrency.split(",")):
+        tables = seed_tables(admin_phone=ADMIN_PHONES[0])
+        tables["users"] = [{"id": index + 1, "phone_number": phone} for index, phone in enumerate(ADMIN_PHONES)]
+        fake_db = FakeSupabase(tables, latency_ms=args.db_latency_ms)
+        fake_api = FakeGreenAPI(latency_ms=args.send_latency_ms)
+        router = build_app(fake_api)
+        install_fake_supabase(fake_db)
+        from src.cache import admin_identity_cache, reference_cache, upcoming_tasks_cache
+        reference_cache.refresh() # cache modul-level tidak boleh terbawa dari level sebelumnya
+        upcoming_tasks_cache.invalidate()
+        admin_identity_cache.refresh()
+
+        load = ConversationLoad(router, fake_api, fake_db, args)
+        elapsed = load.run(users, rng)
+        if load.errors:
+            print(f"{users} users: {len(load.errors)} errors, first: {load.errors[0]}")
+            sys.exit(1)
+
+        samples = [value for values in load.latencies_ms.values() for value in values]
+        query_counts = [value for values in load.queries.values() for value in values]
+        p50, p99 = percentile(samples, 50), percentile(samples, 99)
+        throughput = len(samples) / elapsed
+        print(f"{users:>6} {len(samples):>7} {throughput:>8,.0f} {p50:>8.2f} {p99:>8.2f} "
+              f"{sum(query_counts) / len(query_counts):>9.2f}")
+        results[f"users_{users}_p50_ms"] = p50
+        results[f"users_{users}_p99_ms"] = p99
+        results[f"users_{users}_messages_per_s"] = throughput
+        per_action = load
+
+    if per_action is not None:
+        print("\nPer action at the highest concurrency:")
+        print(f"{'action':<24} {'n':>6} {'p50 ms':>8} {'p99 ms':>8} {'q/action':>9}")
+        for action in sorted(per_action.latencies_ms):
+            latencies, queries = per_action.latencies_ms[action], per_action.queries[action]
+            print(f"{action:<24} {len(latencies):>6} {percentile(latencies, 50):>8.2f} "
+                  f"{percentile(latencies, 99):>8.2f} {sum(queries) / max(len(queries), 1):>9.2f}")
+
+    if args.save_baseline:
+        save_baseline("conversations", results)
+    if args.compare and not compare_to_baseline("conversations", results, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/bench_handlers.py
+"""Benchmark menu rendering latency and Supabase queries per step through the real router and handlers.
+
+Setiap iterasi memakai nomor pengirim baru dan menjalani alur yang sama: menu utama,
+pilih kelas, pilih hari, daftar tugas, detail, set reminder, upcoming, cari, input
+tidak valid, lalu panel ketua kelas. Iterasi pertama berjalan dengan cache dingin.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_handlers --iterations 200 --db-latency-ms 20
+    python -m benchmarks.bench_handlers --compare    # bandingkan dengan benchmarks/baseline.json
+    python -m benchmarks.bench_handlers --storage sqlite    # STORAGE_BACKEND=sqlite (file sementara)
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import types
+
+ADMIN_PHONE = "6280000000000@c.us"
+
+# (nama langkah, teks yang dikirim)
+USER_FLOW = [
+    ("main_menu", "halo"),
+    ("class_list", "1"),
+    ("day_menu", "1"),
+    ("task_list", "1"),
+    ("task_detail", "1"),
+    ("set_reminder", "1"),
+    ("upcoming", "upcoming"),
+    ("search", "cari branding"),
+    ("invalid_input", "xyz"),
+    ("back_to_menu", "menu"),
+    ("admin_panel", "2"),
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200, help="Number of simulated users walking the flow")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Simulated latency per Supabase query")
+    parser.add_argument("--tasks-per-class", type=int, default=40)
+    parser.add_argument("--storage", choices=("supabase", "sqlite"), default="supabase",
+                        help="supabase: FakeSupabase in-process; sqlite: real SQLiteRepository in a temp file")
+    parser.add_argument("--compare", action="store_true", help="Compare with benchmarks/baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression for --compare")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results to benchmarks/baseline.json")
+    return parser.parse_args()
+
+def build_app(fake_api):
+    """Router with the production TaskHandler, AdminHandler and core handlers, answering via `fake_api`."""
+    from whatsapp_chatbot_python.manager.router import Router
+    import bot as app
+    from src.handlers.admin_handler import AdminHandler
+    from src.handlers.task_handler import TaskHandler
+
+    fake_bot = types.SimpleNamespace(api=fake_api, router=Router(fake_api, logging.getLogger("bench.router")))
+    app.task_handler_instance = TaskHandler(fake_bot)
+    app.admin_handler_instance = AdminHandler(fake_bot)
+    app.register_core_handlers(fake_bot)
+    return fake_bot.router
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("ADMIN_PHONES", ADMIN_PHONE)
+    # Hanya WARNING ke atas: modul src mencatat banyak INFO saat di-import dan startup
+    logging.basicConfig(level=logging.WARNING)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.storage == "sqlite":
+        os.environ["STORAGE_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="crealert-bench-"), "bench.sqlite3")
+
+    from benchmarks.fakes import FakeGreenAPI, FakeSupabase, install_fake_supabase, seed_tables, text_message_event
+    from benchmarks.regression import compare_to_baseline, percentile, save_baseline
+
+    tables = seed_tables(tasks_per_class=args.tasks_per_class, admin_phone=ADMIN_PHONE)
+    fake_api = FakeGreenAPI()
+    router = build_app(fake_api)
+    if args.storage == "sqlite":
+        from src.repository import repository
+        for table in ("classes", "days", "users", "tasks", "notifications"):
+            repository.load_rows(table, tables.get(table, []))
+        total_queries = lambda: repository.queries
+    else:
+        fake_db = FakeSupabase(tables, latency_ms=args.db_latency_ms)
+        install_fake_supabase(fake_db)
+        total_queries = fake_db.total_calls
+
+    latencies_ms = {step: [] for step, _ in USER_FLOW}
+    queries = {step: [] for step, _ in USER_FLOW}
+    message_ids = 0
+    for iteration in range(args.iterations):
+        sender = ADMIN_PHONE if iteration % 10 == 0 else f"62812{iteration:08d}@c.us"
+        for step, text in USER_FLOW:
+            message_ids += 1
+            event = text_message_event(sender, text, f"BENCH{message_ids}")
+            sent_before, calls_before = len(fake_api.sent), total_queries()
+            started = time.perf_counter()
+            router.route_event(event)
+            latencies_ms[step].append((time.perf_counter() - started) * 1000)
+            queries[step].append(total_queries() - calls_before)
+            if len(fake_api.sent) == sent_before:
+                print(f"step {step!r} sent no reply (iteration {iteration}); flow is out of sync with the handlers")
+                sys.exit(1)
+        router.message.state_manager.delete_state(sender)
+
+    results = {}
+    print(f"{'step':<14} {'p50 ms':>8} {'p99 ms':>8} {'cold q':>7} {'warm q':>7}")
+    for step, _ in USER_FLOW:
+        p50, p99 = percentile(latencies_ms[step], 50), percentile(latencies_ms[step], 99)
+        warm = queries[step][1:] or queries[step]
+        print(f"{step:<14} {p50:>8.3f} {p99:>8.3f} {queries[step][0]:>7} {sum(warm) / len(warm):>7.2f}")
+        results[f"{step}_p50_ms"] = p50
+        results[f"{step}_p99_ms"] = p99
+    total_ms = sum(sum(samples) for samples in latencies_ms.values())
+    results["messages_per_s"] = message_ids / (total_ms / 1000)
+    print(f"{message_ids} messages, {results['messages_per_s']:,.0f} messages/s, {total_queries()} {args.storage} queries")
+
+    baseline_key = "handlers" if args.storage == "supabase" else f"handlers_{args.storage}"
+    if args.save_baseline:
+        save_baseline(baseline_key, results)
+    if args.compare and not compare_to_baseline(baseline_key, results, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
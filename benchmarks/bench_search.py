@@ -0,0 +1,71 @@
+# benchmarks/bench_search.py
+"""Benchmark TaskSearchIndex build and query latency for one class with many tasks.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_search --tasks 10000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.search import TaskSearchIndex
+
+WORDS = [
+    "essay", "branding", "pitch", "deck", "laporan", "analisis", "pasar", "desain", "logo", "kampanye",
+    "video", "portofolio", "presentasi", "riset", "konten", "strategi", "produk", "konsumen", "naskah", "foto",
+]
+TASK_TYPES = ["mandiri", "kelompok", "ujian", "quiz", "project"]
+
+def make_tasks(count: int, class_id: int = 1, seed: int = 42):
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc)
+    tasks = []
+    for task_id in range(1, count + 1):
+        due_date = start + timedelta(hours=rng.randint(1, 24 * 60))
+        tasks.append({
+            "id": task_id,
+            "class_id": class_id,
+            "day_id": due_date.weekday() + 1,
+            "name": " ".join(rng.sample(WORDS, 2)) + f" {task_id}",
+            "description": " ".join(rng.choices(WORDS, k=12)),
+            "jenis_tugas": rng.choice(TASK_TYPES),
+            "due_date": due_date.isoformat(),
+        })
+    return tasks
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.tasks)
+    index = TaskSearchIndex(ttl_seconds=float("inf"))
+
+    started = time.perf_counter()
+    index.build_class(1, tasks)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(7)
+    queries = [
+        rng.choice([rng.choice(WORDS), rng.choice(WORDS)[:3], f"{rng.choice(WORDS)} {rng.choice(TASK_TYPES)}"])
+        for _ in range(args.queries)
+    ]
+    latencies_us = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(1, query)
+        latencies_us.append((time.perf_counter() - started) * 1_000_000)
+
+    print(f"tasks={args.tasks} build={build_ms:.1f}ms queries={len(queries)}")
+    print(f"search latency: p50={percentile(latencies_us, 50):.0f}us "
+          f"p99={percentile(latencies_us, 99):.0f}us mean={statistics.mean(latencies_us):.0f}us")
+
+if __name__ == "__main__":
+    main()
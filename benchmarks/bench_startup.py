@@ -0,0 +1,131 @@
+# benchmarks/bench_startup.py
+"""Benchmark cold start: `import bot` and time from process spawn to the first replies.
+
+Setiap run adalah proses Python baru (cache import dingin kecuali bytecode .pyc): waktu
+import bot, lalu handler dipasang pada router dengan GreenAPI dan Supabase tiruan dan
+dikirim "halo" (balasan pertama) serta "1" (query storage pertama, cache dingin).
+`deferred_supabase_import_ms` adalah biaya import package supabase yang kini dibayar
+saat client pertama kali dipakai / oleh warm-up di background, bukan saat startup.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --importtime 15    # modul paling lambat menurut -X importtime
+    python -m benchmarks.bench_startup --compare    # bandingkan dengan benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ADMIN_PHONE = "6280000000000@c.us"
+SENDER = "6281200000001@c.us"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Number of fresh processes to start")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Simulated latency per Supabase query")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="Also print the N slowest modules (self time) from python -X importtime")
+    parser.add_argument("--compare", action="store_true", help="Compare with benchmarks/baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression for --compare")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results to benchmarks/baseline.json")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("ADMIN_PHONES", ADMIN_PHONE)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    # URL/key palsu: client Supabase tetap dikonfigurasi (lazy), tapi tidak pernah dipakai karena diganti tiruan
+    env.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    env.setdefault("SUPABASE_KEY", "bench-key")
+    env["BENCH_SPAWNED_AT"] = repr(time.time())
+    return env
+
+def run_child(args) -> None:
+    """Runs inside the spawned process; prints one JSON line with its timings."""
+    spawned_at = float(os.environ["BENCH_SPAWNED_AT"])
+    started = time.perf_counter()
+    import bot  # noqa: F401
+    import_ms = (time.perf_counter() - started) * 1000
+    supabase_loaded = "supabase" in sys.modules
+
+    from benchmarks.bench_handlers import build_app
+    from benchmarks.fakes import FakeGreenAPI, FakeSupabase, install_fake_supabase, seed_tables, text_message_event
+    fake_api = FakeGreenAPI()
+    router = build_app(fake_api)
+    install_fake_supabase(FakeSupabase(seed_tables(admin_phone=ADMIN_PHONE), latency_ms=args.db_latency_ms))
+
+    timings = {"import_bot_ms": import_ms}
+    for step, text in (("first_reply", "halo"), ("first_class_list", "1")):
+        sent_before = len(fake_api.sent)
+        router.route_event(text_message_event(SENDER, text, f"STARTUP-{step}"))
+        if len(fake_api.sent) == sent_before:
+            raise SystemExit(f"step {step!r} sent no reply")
+        timings[f"{step}_ms"] = (time.time() - spawned_at) * 1000
+
+    if "importtime" not in sys._xoptions: # Jangan campurkan import supabase ke daftar --importtime
+        started = time.perf_counter()
+        try:
+            import supabase  # noqa: F401
+            timings["deferred_supabase_import_ms"] = (time.perf_counter() - started) * 1000
+        except ImportError:
+            pass
+    print(json.dumps({"timings": timings, "supabase_loaded_at_import": supabase_loaded}))
+
+def spawn(args, extra_flags=()) -> subprocess.CompletedProcess:
+    command = [sys.executable, *extra_flags, "-m", "benchmarks.bench_startup", "--child",
+               "--db-latency-ms", str(args.db_latency_ms)]
+    return subprocess.run(command, env=child_env(), capture_output=True, text=True)
+
+def print_importtime(args) -> None:
+    completed = spawn(args, ("-X", "importtime"))
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        modules.append((int(self_us), int(cumulative_us), name))
+    print(f"\n{'module':<45} {'self ms':>8} {'cumul. ms':>10}")
+    for self_us, cumulative_us, name in sorted(modules, reverse=True)[:args.importtime]:
+        print(f"{name:<45} {self_us / 1000:>8.1f} {cumulative_us / 1000:>10.1f}")
+
+def main():
+    args = parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    from benchmarks.regression import compare_to_baseline, save_baseline
+
+    samples = {}
+    supabase_loaded = False
+    for run in range(args.runs):
+        completed = spawn(args)
+        if completed.returncode != 0:
+            print(f"run {run} failed:\n{completed.stderr}")
+            sys.exit(1)
+        report = json.loads(completed.stdout.strip().splitlines()[-1])
+        supabase_loaded = supabase_loaded or report["supabase_loaded_at_import"]
+        for name, value in report["timings"].items():
+            samples.setdefault(name, []).append(value)
+
+    results = {}
+    print(f"{'metric':<30} {'median':>8} {'min':>8} {'max':>8}")
+    for name, values in samples.items():
+        results[name] = statistics.median(values)
+        print(f"{name:<30} {results[name]:>8.1f} {min(values):>8.1f} {max(values):>8.1f}")
+    print(f"{args.runs} runs; supabase package imported by `import bot`: {'yes' if supabase_loaded else 'no'}")
+    if args.importtime:
+        print_importtime(args)
+
+    if args.save_baseline:
+        save_baseline("startup", results)
+    if args.compare and not compare_to_baseline("startup", results, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_worker.py
+"""Benchmark NotificationWorker + outbox throughput against in-process Supabase/GreenAPI fakes.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_worker --sizes 1000,10000,100000
+    python -m benchmarks.bench_worker --compare      # bandingkan dengan benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Pending reminder counts to benchmark")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Simulated latency per Supabase query")
+    parser.add_argument("--send-latency-ms", type=float, default=0.0, help="Simulated latency per sendMessage")
+    parser.add_argument("--batch-size", type=int, default=None, help="Override WORKER_FETCH_BATCH_SIZE")
+    parser.add_argument("--backlog-interval", type=float, default=0.0,
+                        help="Worker sleep between backlog batches (production default WORKER_BACKLOG_INTERVAL_SECONDS)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Give up on one size after this many seconds")
+    parser.add_argument("--compare", action="store_true", help="Compare with benchmarks/baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression for --compare")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results to benchmarks/baseline.json")
+    return parser.parse_args()
+
+async def run_size(size, args, tmp_dir):
+    from benchmarks.fakes import FakeGreenAPI, FakeSupabase, install_fake_supabase, seed_tables
+    from src.outbox import CHANNEL_REMINDER, Outbox, OutboxSender
+    from src.workers.notification_worker import NotificationWorker, PollIntervalController
+
+    fake_db = FakeSupabase(seed_tables(notifications=size), latency_ms=args.db_latency_ms)
+    install_fake_supabase(fake_db)
+    fake_api = FakeGreenAPI(latency_ms=args.send_latency_ms)
+    outbox = Outbox(os.path.join(tmp_dir, f"outbox-{size}.sqlite3"))
+    sender = OutboxSender(outbox, send_fn=fake_api.sending.sendMessage, channel=CHANNEL_REMINDER,
+                          rate_per_second=0, batch_size=200)
+
+    worker = NotificationWorker(fake_api)
+    worker.outbox = outbox
+    worker.interval = PollIntervalController(backlog_interval=args.backlog_interval)
+    notifications = fake_db.tables["notifications"]
+
+    started = time.perf_counter()
+    sender.start()
+    await worker.start()
+    queued_at = None
+    deadline = started + args.timeout
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+        if queued_at is None and all(row["is_sent"] for row in notifications):
+            queued_at = time.perf_counter()
+        if queued_at is not None and len(fake_api.sent) >= size:
+            break
+    finished = time.perf_counter()
+    await worker.stop()
+    sender.stop()
+    if len(fake_api.sent) < size:
+        print(f"size={size}: timed out after {args.timeout:.0f}s ({len(fake_api.sent)} sent)")
+        return {}
+    queued_per_s = size / (queued_at - started)
+    sent_per_s = size / (finished - started)
+    print(f"size={size}: queued {queued_per_s:,.0f} reminders/s, delivered {sent_per_s:,.0f} reminders/s "
+          f"({finished - started:.2f}s, {fake_db.total_calls()} Supabase queries)")
+    return {f"queued_{size}_per_s": queued_per_s, f"delivered_{size}_per_s": sent_per_s}
+
+def main():
+    args = parse_args()
+    if args.batch_size:
+        os.environ["WORKER_FETCH_BATCH_SIZE"] = str(args.batch_size)
+    # Hanya WARNING ke atas: modul src mencatat banyak INFO saat di-import dan startup
+    logging.basicConfig(level=logging.WARNING)
+
+    from benchmarks.regression import compare_to_baseline, save_baseline
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in (int(value) for value in args.sizes.split(",")):
+            results.update(asyncio.run(run_size(size, args, tmp_dir)))
+    if args.save_baseline:
+        save_baseline("worker", results)
+    if args.compare and not compare_to_baseline("worker", results, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+# benchmarks/fakes.py
+"""In-process stand-ins for Supabase (PostgREST) and GreenAPI, used by the benchmarks.
+
+Hanya builder method yang dipakai repo ini yang didukung: select (termasuk embed
+`tasks(...)`), eq, in_, lt/lte/gt/gte, order, range, limit, maybe_single,
+insert, update dan execute. Setiap execute bisa diberi latency tiruan.
+"""
+import itertools
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+
+_COMPARATORS = {
+    "eq": lambda value, target: value == target,
+    "in": lambda value, target: value in target,
+    "lt": lambda value, target: value is not None and value < target,
+    "lte": lambda value, target: value is not None and value <= target,
+    "gt": lambda value, target: value is not None and value > target,
+    "gte": lambda value, target: value is not None and value >= target,
+}
+_NEGATED = {op: (lambda compare: lambda value, target: not compare(value, target))(compare) for op, compare in _COMPARATORS.items()}
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+        self.error = None
+
+
+class _FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.count_mode = None
+        self.filters = []
+        self.ordering = []
+        self.row_range = None
+        self.row_limit = None
+        self.single = False
+        self.payload = None
+        self.negate_next = False
+
+    @property
+    def not_(self):
+        self.negate_next = True
+        return self
+
+    def select(self, columns="*", count=None):
+        self.columns, self.count_mode = columns, count
+        return self
+
+    def _filter(self, op, column, target):
+        self.filters.append((column, (_NEGATED if self.negate_next else _COMPARATORS)[op], target))
+        self.negate_next = False
+        return self
+
+    def eq(self, column, value): return self._filter("eq", column, value)
+    def in_(self, column, values): return self._filter("in", column, set(values))
+    def lt(self, column, value): return self._filter("lt", column, value)
+    def lte(self, column, value): return self._filter("lte", column, value)
+    def gt(self, column, value): return self._filter("gt", column, value)
+    def gte(self, column, value): return self._filter("gte", column, value)
+
+    def order(self, column, desc=False):
+        self.ordering.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self.row_range = (start, end)
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def maybe_single(self):
+        self.single = True
+        return self
+
+    def insert(self, payload):
+        self.operation, self.payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self.operation, self.payload = "update", payload
+        return self
+
+    def _matches(self, rows):
+        filters = self.filters
+        # Filter eq/in_ pertama memakai index kolom agar tabel 100k baris tidak di-scan penuh tiap query
+        for position, (column, compare, target) in enumerate(filters):
+            if compare is _COMPARATORS["eq"] or compare is _COMPARATORS["in"]:
+                rows = self.client._candidates(self.table, column, target, compare is _COMPARATORS["in"])
+                filters = filters[:position] + filters[position + 1:]
+                break
+        return [row for row in rows if all(compare(row.get(column), target) for column, compare, target in filters)]
+
+    def execute(self):
+        self.client._record(self.table, self.operation)
+        with self.client.lock:
+            rows = self.client.tables.setdefault(self.table, [])
+            if self.operation == "insert":
+                return FakeResponse(self.client._insert(self.table, self.payload))
+            matched = self._matches(rows)
+            if self.operation == "update":
+                for row in matched:
+                    self.client._unindex(self.table, row, self.payload)
+                    row.update(self.payload)
+                    self.client._index(self.table, row)
+                return FakeResponse([dict(row) for row in matched])
+            for column, desc in reversed(self.ordering):
+                matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+            total = len(matched)
+            if self.row_range:
+                matched = matched[self.row_range[0]:self.row_range[1] + 1]
+            if self.row_limit is not None:
+                matched = matched[:self.row_limit]
+            data = [self.client._embed(self.columns, row) for row in matched]
+        if self.single:
+            return FakeResponse(data[0] if data else None)
+        return FakeResponse(data, total if self.count_mode else None)
+
+
+class FakeSupabase:
+    """Table store with the PostgREST builder API; counts queries per (table, operation)."""
+    def __init__(self, tables=None, latency_ms: float = 0.0):
+        self.tables = {name: [dict(row) for row in rows] for name, rows in (tables or {}).items()}
+        self.latency = latency_ms / 1000.0
+        self.outage = False # True: setiap execute gagal seperti Supabase yang tidak bisa dihubungi
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self._ids = {name: itertools.count(max((row.get("id", 0) for row in rows), default=0) + 1)
+                     for name, rows in self.tables.items()}
+        self._by_id = {}
+        self._indexes = {} # (table, column) -> value -> {id(row): row}
+
+    def table(self, name):
+        return _FakeQuery(self, name)
+
+    def _record(self, table, operation):
+        self.calls[(table, operation)] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.outage:
+            raise ConnectionError("fake Supabase outage")
+
+    def _candidates(self, table, column, target, many):
+        index = self._indexes.get((table, column))
+        if index is None:
+            index = self._indexes[(table, column)] = {}
+            for row in self.tables.get(table, []):
+                index.setdefault(row.get(column), {})[id(row)] = row
+        if not many:
+            return list(index.get(target, {}).values())
+        candidates = []
+        for value in target:
+            candidates.extend(index.get(value, {}).values())
+        return candidates
+
+    def _index(self, table, row):
+        for (indexed_table, column), index in self._indexes.items():
+            if indexed_table == table:
+                index.setdefault(row.get(column), {})[id(row)] = row
+
+    def _unindex(self, table, row, changes):
+        for (indexed_table, column), index in self._indexes.items():
+            if indexed_table == table and column in changes:
+                index.get(row.get(column), {}).pop(id(row), None)
+
+    def _insert(self, table, payload):
+        rows = payload if isinstance(payload, list) else [payload]
+        ids = self._ids.setdefault(table, itertools.count(1))
+        inserted = []
+        for row in rows:
+            row = dict(row)
+            row.setdefault("id", next(ids))
+            self.tables[table].append(row)
+            self._index(table, row)
+            self._by_id.pop(table, None)
+            inserted.append(dict(row))
+        return inserted
+
+    def _embed(self, columns, row):
+        row = dict(row)
+        # Embed PostgREST sederhana: "tasks(...)" pada tabel dengan kolom task_id
+        if "tasks(" in columns and "task_id" in row:
+            tasks_by_id = self._by_id.get("tasks")
+            if tasks_by_id is None:
+                tasks_by_id = self._by_id["tasks"] = {task["id"]: task for task in self.tables.get("tasks", [])}
+            task = tasks_by_id.get(row["task_id"])
+            row["tasks"] = dict(task) if task else None
+        return row
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+class _FakeSendResponse:
+    code = 200
+    error = None
+    data = {"idMessage": "fake"}
+
+
+class _FakeSending:
+    def __init__(self, api):
+        self.api = api
+
+    def sendMessage(self, chatId, message, quotedMessageId=None, archiveChat=None, linkPreview=None):
+        if self.api.latency:
+            time.sleep(self.api.latency)
+        with self.api.replied:
+            self.api.sent.append((chatId, message))
+            self.api.replies[chatId] += 1
+            self.api.replied.notify_all()
+        return _FakeSendResponse()
+
+
+class _FakeReceiveResponse:
+    def __init__(self, data):
+        self.code = 200
+        self.data = data
+
+
+class _FakeReceiving:
+    def __init__(self, api):
+        self.api = api
+        self._receipts = itertools.count(1)
+
+    def receiveNotification(self):
+        with self.api.lock:
+            body = self.api.inbound.popleft() if self.api.inbound else None
+        if body is None:
+            return _FakeReceiveResponse(None)
+        return _FakeReceiveResponse({"receiptId": next(self._receipts), "body": body})
+
+    def deleteNotification(self, receiptId):
+        return _FakeReceiveResponse({"result": True})
+
+
+class FakeGreenAPI:
+    """GreenAPI client stand-in: records sendMessage calls and serves queued incoming notifications."""
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.lock = threading.Lock()
+        self.sent = []
+        self.replies = Counter() # chatId -> jumlah pesan terkirim
+        self.replied = threading.Condition(self.lock)
+        self.inbound = deque()
+        self.sending = _FakeSending(self)
+        self.receiving = _FakeReceiving(self)
+        self._message_ids = itertools.count(1)
+
+    def push_incoming(self, sender: str, text: str, id_message: str = None) -> dict:
+        body = text_message_event(sender, text, id_message or f"FAKE{next(self._message_ids)}")
+        with self.lock:
+            self.inbound.append(body)
+        return body
+
+
+    def wait_for_reply(self, chat_id: str, seen: int, timeout: float) -> bool:
+        """Block until `chat_id` has received more than `seen` messages; False on timeout."""
+        with self.replied:
+            return self.replied.wait_for(lambda: self.replies[chat_id] > seen, timeout)
+
+
+def text_message_event(sender: str, text: str, id_message: str) -> dict:
+    """incomingMessageReceived webhook body for a plain text message."""
+    return {
+        "typeWebhook": "incomingMessageReceived",
+        "idMessage": id_message,
+        "timestamp": int(time.time()),
+        "senderData": {"chatId": sender, "sender": sender, "senderName": sender.split("@")[0]},
+        "messageData": {"typeMessage": "textMessage", "textMessageData": {"textMessage": text}},
+    }
+
+
+def install_fake_supabase(fake: FakeSupabase) -> None:
+    """Point every loaded `src` module that imported the Supabase client at `fake`."""
+    import src.config
+    src.config.supabase = fake
+    for name, module in list(sys.modules.items()):
+        if name.startswith("src.") and module is not None and hasattr(module, "supabase"):
+            module.supabase = fake
+            if hasattr(module, "SUPABASE_CLIENT_AVAILABLE"):
+                module.SUPABASE_CLIENT_AVAILABLE = True
+
+
+def seed_tables(classes: int = 4, tasks_per_class: int = 40, notifications: int = 0,
+                admin_phone: str = "6280000000000@c.us", now=None) -> dict:
+    """Reference data, tasks spread over the coming weeks and `notifications` due reminders."""
+    now = now or datetime.now(timezone.utc)
+    day_names = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"]
+    tables = {
+        "classes": [{"id": class_id, "name": f"Kelas {chr(64 + class_id)}"} for class_id in range(1, classes + 1)],
+        "days": [{"id": day_id, "name": name} for day_id, name in enumerate(day_names, start=1)],
+        "users": [{"id": 1, "phone_number": admin_phone}],
+        "tasks": [],
+        "notifications": [],
+    }
+    task_id = 0
+    for class_id in range(1, classes + 1):
+        for index in range(tasks_per_class):
+            task_id += 1
+            due = now + timedelta(hours=6 + index * 9)
+            tables["tasks"].append({
+                "id": task_id, "class_id": class_id, "day_id": due.weekday() + 1,
+                "name": f"Tugas {task_id} branding", "description": "Analisis pasar dan desain kampanye produk",
+                "jenis_tugas": ["mandiri", "kelompok", "quiz"][task_id % 3],
+                "due_date": due.isoformat(), "created_by": 1,
+            })
+    reminder_types = ["H-3D", "H-1D", "H-1H"]
+    due_at = (now - timedelta(minutes=1)).isoformat()
+    for notification_id in range(1, notifications + 1):
+        tables["notifications"].append({
+            "id": notification_id, "task_id": (notification_id % task_id) + 1 if task_id else None,
+            "phone_number": f"62811{notification_id:08d}@c.us",
+            "reminder_type": reminder_types[notification_id % 3],
+            "notification_time": due_at, "is_sent": False,
+        })
+    return tables
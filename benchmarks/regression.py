@@ -0,0 +1,47 @@
+# benchmarks/regression.py
+"""Shared helpers: percentiles and comparison against benchmarks/baseline.json."""
+import json
+import os
+from typing import Dict
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)
+
+def save_baseline(benchmark: str, results: Dict[str, float], path: str = BASELINE_PATH) -> None:
+    """Store `results` as the new baseline of `benchmark`, keeping other benchmarks untouched."""
+    baseline = load_baseline(path)
+    baseline[benchmark] = {name: round(value, 3) for name, value in results.items()}
+    with open(path, "w", encoding="utf-8") as baseline_file:
+        json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write("\n")
+
+def compare_to_baseline(benchmark: str, results: Dict[str, float], tolerance: float,
+                        path: str = BASELINE_PATH) -> bool:
+    """Print the change per metric and return False if any metric regressed beyond `tolerance`.
+
+    Metrik berakhiran `_per_s` makin besar makin baik; metrik lain (latency) makin kecil makin baik.
+    """
+    baseline = load_baseline(path).get(benchmark)
+    if not baseline:
+        print(f"[{benchmark}] no baseline in {path}; run with --save-baseline first.")
+        return True
+    ok = True
+    for name, value in sorted(results.items()):
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        higher_is_better = name.endswith("_per_s")
+        change = (value - expected) / expected
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        ok = ok and not regressed
+        print(f"[{benchmark}] {name}: {value:.3f} vs baseline {expected:.3f} ({change:+.0%}){'  REGRESSION' if regressed else ''}")
+    return ok
@@ -1,23 +1,35 @@
 # bot.py
 import os
 import logging
+import argparse
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
+from src.logging_setup import configure_logging
+
+# Initialize logger: semua log lewat antrean dan ditulis oleh thread listener (lihat src/logging_setup.py).
+# Dipasang sebelum import modul lain agar log saat import (worker, cache, dll.) ikut tercatat.
+configure_logging()
+
+from whatsapp_api_client_python import API
 from whatsapp_chatbot_python import GreenAPIBot
-from src.config import States
+from src.config import States, BOT_ROLE, HEALTH_SERVER_ENABLED, INSTRUMENTATION_ENABLED, SLOW_HANDLER_SECONDS
 from src.handlers.task_handler import TaskHandler
 from src.handlers.admin_handler import AdminHandler
 from src.workers.notification_worker import NotificationWorker
+from src.cache import start_background_refresh
+from src.warmup import start_warm_up
+from src.change_feed import start_change_feed, stop_change_feed
+from src.repository import repository
+from src.outbox import CHANNEL_REMINDER, CHANNEL_REPLY, get_outbox, get_outbox_sender, start_outbox_sender
+from src.sender_pool import build_sender_pool
+from src.inbound import install_inbound_dedup, install_inbound_throttle
+from src.health import register_readiness_check, start_health_server
+from src.metrics import registry
+from src.instrumentation import install_handler_timing
 # Hapus impor update_state_with_history jika tidak digunakan langsung di bot.py
 # from src.utils import update_state_with_history 
 
-# Initialize logger
-logging.basicConfig(
-    level=logging.INFO, 
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
-print(f"### PYPRINT ### bot.py: Module loaded. Logger: {logger.name}")
 
 # Variabel global untuk instances, akan diisi di main()
 bot_instance = None
@@ -25,59 +37,22 @@ task_handler_instance = None # Nama variabel diubah agar tidak konflik dengan na
 admin_handler_instance = None # Nama variabel diubah
 notification_worker_instance = None # Nama variabel diubah
 
-async def main():
-    global bot_instance, task_handler_instance, admin_handler_instance, notification_worker_instance
+ROLE_RECEIVER = "receiver"
+ROLE_WORKER = "worker"
+ROLE_ALL = "all"
+ROLES = (ROLE_RECEIVER, ROLE_WORKER, ROLE_ALL)
 
-    print(f"### PYPRINT ### bot.py main(): Function started.")
-    logger.info("Main function started.")
-    
-    GREENAPI_ID = os.getenv("GREENAPI_ID")
-    GREENAPI_TOKEN = os.getenv("GREENAPI_TOKEN")
-
-    if not GREENAPI_ID or not GREENAPI_TOKEN:
-        print("### PYPRINT FATAL ### bot.py main(): GREENAPI_ID or GREENAPI_TOKEN not set!")
-        logger.critical("GREENAPI_ID or GREENAPI_TOKEN not set! Bot cannot start properly.")
-        return
-
-    bot_instance = GreenAPIBot(
-        GREENAPI_ID,
-        GREENAPI_TOKEN,
-        settings={
-            "delaySendMessagesMilliseconds": 500,
-            "markIncomingMessagesReaded": "yes",
-            "incomingWebhook": "yes",
-        }
-    )
-    print(f"### PYPRINT ### bot.py main(): GreenAPIBot initialized.")
-    logger.info("GreenAPIBot initialized.")
-
-    try:
-        task_handler_instance = TaskHandler(bot_instance)
-        admin_handler_instance = AdminHandler(bot_instance)
-        print("### PYPRINT ### bot.py main(): TaskHandler and AdminHandler initialized.")
-        logger.info("TaskHandler and AdminHandler initialized.")
-    except Exception as e_handler_init:
-        print(f"### PYPRINT ERROR ### bot.py main(): Error initializing handlers: {e_handler_init}")
-        logger.error(f"Error initializing handlers: {e_handler_init}", exc_info=True)
-
-    try:
-        notification_worker_instance = NotificationWorker(bot_instance)
-        print("### PYPRINT ### bot.py main(): NotificationWorker class instantiated.")
-        logger.info("NotificationWorker class instantiated.")
-    except Exception as e_worker_init:
-        print(f"### PYPRINT ERROR ### bot.py main(): Error instantiating NotificationWorker: {e_worker_init}")
-        logger.error(f"Error instantiating NotificationWorker: {e_worker_init}", exc_info=True)
-    
+def register_core_handlers(bot):
+    """Register the main menu, "menu" and global back ("0") handlers on `bot`."""
     # --- SETUP ROUTER MESSAGE (DARI KODE LAMA ANDA) ---
-    # Menggunakan bot_instance yang sudah diinisialisasi
-    @bot_instance.router.message(type_message="textMessage", state=None)
+    @bot.router.message(type_message="textMessage", state=None)
     def initial_handler(notification):
         logger.info(f"initial_handler called by {notification.sender}")
         notification.answer("*Hi, Skremates!* 💸\n\nSelamat datang di *Crealert: Your Weekly Task Reminder* 🔔! \n\nApa yang ingin kamu akses?\n\n1. Lihat Tugas\n2. Panel Ketua Kelas\n\nKetik angka pilihan kamu *(1-2)*")
         notification.state_manager.update_state_data(notification.sender, {"state_history": []})
         notification.state_manager.update_state(notification.sender, States.INITIAL)
 
-    @bot_instance.router.message(type_message="textMessage", state=States.INITIAL)
+    @bot.router.message(type_message="textMessage", state=States.INITIAL)
     def initial_state_handler(notification):
         logger.info(f"initial_state_handler called by {notification.sender} with text: {notification.message_text}")
         if notification.message_text == "1":
@@ -91,12 +66,12 @@ async def main():
         else:
             notification.answer("⚠️ *Input tidak valid!*\n\n*Hi, Skremates!* 💸\n\nSelamat datang di *Crealert: Your Weekly Task Reminder* 🔔! \n\nApa yang ingin kamu akses?\n\n1. Lihat Tugas\n2. Panel Ketua Kelas\n\nKetik angka pilihan kamu *(1-2)*")
 
-    @bot_instance.router.message(type_message="textMessage", regexp=r"^(menu)$")
+    @bot.router.message(type_message="textMessage", regexp=r"^(menu)$")
     def menu_handler(notification):
         logger.info(f"menu_handler called by {notification.sender}")
         initial_handler(notification)
 
-    @bot_instance.router.message(type_message="textMessage", regexp=r"^0$")
+    @bot.router.message(type_message="textMessage", regexp=r"^0$")
     def global_back_handler(notification): # Pastikan semua handler di sini menggunakan instance yang benar
         logger.info(f"global_back_handler called by {notification.sender}")
         current_state = notification.state_manager.get_state(notification.sender)
@@ -133,6 +108,128 @@ async def main():
         else: initial_handler(notification)
     # --- AKHIR SETUP ROUTER MESSAGE ---
 
+def register_health_checks(bot_thread_future, worker_task):
+    """Readiness checks and scrape-time gauges for the components running in this process."""
+    register_readiness_check("storage", repository.is_available)
+    if bot_thread_future is not None:
+        register_readiness_check("receiver", lambda: not bot_thread_future.done())
+        registry.gauge(
+            "crealert_active_sessions", "Chats with conversation state in the bot's StateManager.",
+            callback=lambda: len(bot_instance.router.message.state_manager.storage)
+        )
+    if worker_task is not None:
+        register_readiness_check("worker", lambda: notification_worker_instance.running and not worker_task.done())
+    for channel in (CHANNEL_REPLY, CHANNEL_REMINDER):
+        sender = get_outbox_sender(channel)
+        if sender is not None:
+            register_readiness_check(f"outbox_{channel}", sender.is_alive)
+    registry.gauge(
+        "crealert_outbox_pending", "Messages waiting in the outbox, per channel.",
+        callback=lambda: [({"channel": channel}, get_outbox().depth(channel)) for channel in (CHANNEL_REPLY, CHANNEL_REMINDER)]
+    )
+    registry.gauge(
+        "crealert_outbox_failed", "Messages that used up OUTBOX_MAX_ATTEMPTS and wait for a manual requeue, per channel.",
+        callback=lambda: [({"channel": channel}, get_outbox().failed_count(channel)) for channel in (CHANNEL_REPLY, CHANNEL_REMINDER)]
+    )
+
+def _log_worker_exit(task):
+    if task.cancelled():
+        return
+    exception = task.exception()
+    if exception:
+        logger.error(f"Main: NotificationWorker task exited with an exception: {exception}", exc_info=exception)
+    else:
+        logger.warning("Main: NotificationWorker task exited unexpectedly. Check logs.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Crealert WhatsApp bot")
+    parser.add_argument(
+        "--role", choices=ROLES, default=BOT_ROLE if BOT_ROLE in ROLES else ROLE_ALL,
+        help="receiver: hanya menerima dan membalas chat; worker: hanya mengirim reminder; all: keduanya (default dari BOT_ROLE)"
+    )
+    return parser.parse_args(argv)
+
+async def main(role: str = BOT_ROLE):
+    global bot_instance, task_handler_instance, admin_handler_instance, notification_worker_instance
+
+    logger.info(f"Main function started with role '{role}'.")
+    run_receiver = role in (ROLE_RECEIVER, ROLE_ALL)
+    run_worker = role in (ROLE_WORKER, ROLE_ALL)
+
+    GREENAPI_ID = os.getenv("GREENAPI_ID")
+    GREENAPI_TOKEN = os.getenv("GREENAPI_TOKEN")
+
+    if not GREENAPI_ID or not GREENAPI_TOKEN:
+        logger.critical("GREENAPI_ID or GREENAPI_TOKEN not set! Bot cannot start properly.")
+        return
+
+    # Client Supabase dibuat dan koneksinya dibuka di background, paralel dengan inisialisasi GreenAPI
+    repository.warm_up_connection()
+    # Isi cache (kelas, hari, tugas minggu ini, reminder terdekat) selagi GreenAPI dan worker dinyalakan
+    cache_warm_up = start_warm_up(receiver=run_receiver, worker=run_worker)
+
+    if run_receiver:
+        bot_instance = GreenAPIBot(
+            GREENAPI_ID,
+            GREENAPI_TOKEN,
+            settings={
+                "delaySendMessagesMilliseconds": 500,
+                "markIncomingMessagesReaded": "yes",
+                "incomingWebhook": "yes",
+            }
+        )
+        logger.info("GreenAPIBot initialized.")
+        api = bot_instance.api
+
+        # Filter pesan masuk. Dedup dipasang terakhir agar berjalan paling awal:
+        # notifikasi yang dikirim ulang GreenAPI (idMessage sama) tidak memakan jatah throttle.
+        install_inbound_throttle(bot_instance.router)
+        install_inbound_dedup(bot_instance.router)
+
+        try:
+            task_handler_instance = TaskHandler(bot_instance)
+            admin_handler_instance = AdminHandler(bot_instance)
+            logger.info("TaskHandler and AdminHandler initialized.")
+        except Exception as e_handler_init:
+            logger.error(f"Error initializing handlers: {e_handler_init}", exc_info=True)
+        register_core_handlers(bot_instance)
+        if INSTRUMENTATION_ENABLED:
+            timed_handlers = install_handler_timing(bot_instance.router, SLOW_HANDLER_SECONDS)
+            logger.info(f"Handler timing enabled for {timed_handlers} handlers (slow threshold {SLOW_HANDLER_SECONDS}s).")
+    else:
+        # Proses worker tidak memakai GreenAPIBot: GreenAPIBot mengubah settings instance dan
+        # menghapus notifikasi masuk saat startup, yang menjadi tugas proses receiver.
+        api = API.GreenAPI(GREENAPI_ID, GREENAPI_TOKEN)
+        logger.info("GreenAPI client initialized for worker role (no inbound receiving).")
+
+    # Semua pesan keluar lewat outbox SQLite: balasan dikuras oleh receiver, reminder oleh worker lewat pool instance GreenAPI
+    try:
+        channels = ([CHANNEL_REPLY] if run_receiver else []) + ([CHANNEL_REMINDER] if run_worker else [])
+        # Pool dibangun sebelum sendMessage instance utama dialihkan ke outbox
+        sender_pool = build_sender_pool(GREENAPI_ID, api) if run_worker else None
+        start_outbox_sender(api, route_replies=run_receiver, pool=sender_pool, channels=channels)
+    except Exception as e_outbox:
+        logger.error(f"Error starting outbox sender, replies will be sent directly: {e_outbox}", exc_info=True)
+
+    if run_receiver:
+        # Muat ulang data kelas/hari dan ID admin secara berkala di background
+        start_background_refresh(refresh_now=cache_warm_up is None)
+
+    # Realtime: invalidasi cache (receiver) dan bangunkan worker saat ada perubahan di Supabase
+    try:
+        start_change_feed()
+    except Exception as e_change_feed:
+        logger.error(f"Error starting change feed, relying on polling only: {e_change_feed}", exc_info=True)
+
+    if run_worker:
+        try:
+            notification_worker_instance = NotificationWorker(api)
+            logger.info("NotificationWorker class instantiated.")
+            if cache_warm_up:
+                cache_warm_up.attach_worker(notification_worker_instance)
+        except Exception as e_worker_init:
+            logger.error(f"Error instantiating NotificationWorker: {e_worker_init}", exc_info=True)
+
     # Dapatkan event loop asyncio saat ini
     loop = asyncio.get_event_loop()
 
@@ -155,45 +252,39 @@ async def main():
     worker_main_task = None
     if notification_worker_instance:
         try:
-            print("### PYPRINT ### bot.py main(): Attempting to start NotificationWorker.")
             logger.info("Main: Attempting to start NotificationWorker.")
             worker_main_task = await notification_worker_instance.start()
-            print(f"### PYPRINT ### bot.py main(): NotificationWorker.start() returned. Task object: {worker_main_task}")
             logger.info(f"Main: NotificationWorker started. Task object: {worker_main_task}")
 
             if worker_main_task:
-                print("### PYPRINT ### bot.py main(): Worker task exists. Adding 15s delay for observation...")
-                logger.info("Main: Worker task exists. Adding 15 seconds delay for observation...")
-                await asyncio.sleep(15)
-                print("### PYPRINT ### bot.py main(): 15s observation finished.")
-                logger.info("Main: 15-second observation finished.")
-                if worker_main_task.done():
-                    logger.warning("Main: Worker task IS DONE during observation. UNEXPECTED. Check logs.")
-                    try:
-                        await worker_main_task
-                    except Exception as e_wt_done:
-                        logger.error(f"Main: Exception from awaiting worker_task: {e_wt_done}", exc_info=True)
-                else:
-                    logger.info("Main: Worker task is still running. Expected.")
+                # Tidak perlu menunggu untuk observasi: task yang berhenti tak terduga langsung tercatat di log
+                worker_main_task.add_done_callback(_log_worker_exit)
             else:
-                print("### PYPRINT ERROR ### bot.py main(): Worker task NOT created.")
                 logger.error("Main: Worker task was NOT created. Check NotificationWorker.start() logs.")
         except Exception as e_worker_start:
             logger.error(f"Main: Error starting NotificationWorker: {e_worker_start}", exc_info=True)
-    else:
-        print("### PYPRINT WARNING ### bot.py main(): notification_worker_instance is None. Worker not started.")
+    elif run_worker:
         logger.warning("notification_worker_instance is None. Worker not started.")
 
     # Jadwalkan fungsi blocking bot untuk berjalan di thread executor
-    bot_thread_future = loop.run_in_executor(executor, run_bot_in_thread)
-    logger.info("Main: bot_instance.run_forever() has been scheduled to run in a separate thread.")
+    bot_thread_future = None
+    if run_receiver:
+        bot_thread_future = loop.run_in_executor(executor, run_bot_in_thread)
+        logger.info("Main: bot_instance.run_forever() has been scheduled to run in a separate thread.")
+
+    if HEALTH_SERVER_ENABLED:
+        register_health_checks(bot_thread_future, worker_main_task)
+        start_health_server()
 
     try:
         if worker_main_task:
-            logger.info("Main: Awaiting NotificationWorker task. Bot is running in a separate thread.")
+            logger.info("Main: Awaiting NotificationWorker task.")
             await worker_main_task
+        elif bot_thread_future:
+            logger.info("Main: NotificationWorker not active in this process. Awaiting the bot thread.")
+            await bot_thread_future
         else:
-            logger.info("Main: NotificationWorker not active. Bot is running in a separate thread. Main loop will idle, waiting for KeyboardInterrupt.")
+            logger.info("Main: Nothing to run in this process. Main loop will idle, waiting for KeyboardInterrupt.")
             while keep_main_loop_running:
                 await asyncio.sleep(1)
 
@@ -220,6 +311,8 @@ async def main():
             except Exception as e_worker_await_cancel:
                 logger.error(f"Main: Error awaiting cancelled worker task: {e_worker_await_cancel}", exc_info=True)
 
+        stop_change_feed()
+
         # 2. Menghentikan Bot di Thread Executor
         logger.info("Main: Attempting to deal with the bot runner thread.")
         if hasattr(bot_instance, 'stop_receiving_notifications'):
@@ -236,14 +329,11 @@ async def main():
         logger.info("Main: Application shutdown sequence finished.")
 
 if __name__ == "__main__":
-    print("### PYPRINT ### bot.py: Script execution started from __main__.")
     logger.info("Starting bot from __main__.")
     try:
-        asyncio.run(main())
+        asyncio.run(main(parse_args().role))
     except KeyboardInterrupt:
-        print("### PYPRINT ### bot.py: Bot (asyncio.run) stopped by KeyboardInterrupt.")
         logger.info("Bot (asyncio.run) stopped by user with KeyboardInterrupt.")
     except Exception as e_run_main:
-        print(f"### PYPRINT ERROR ### bot.py: Bot (asyncio.run) fatal error: {e_run_main}")
         logger.error(f"Bot (asyncio.run) fatal error: {e_run_main}", exc_info=True)
-    print("### PYPRINT ### bot.py: Script finished or exiting from __main__.")
\ No newline at end of file
+    logger.info("Script finished or exiting from __main__.")
\ No newline at end of file
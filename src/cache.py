@@ -0,0 +1,224 @@
+# src/cache.py
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from .config import (
+    ADMIN_PHONES,
+    IDENTITY_CACHE_TTL_SECONDS, REFERENCE_CACHE_TTL_SECONDS, CACHE_REFRESH_INTERVAL_SECONDS,
+    UPCOMING_CACHE_TTL_SECONDS, UPCOMING_DAYS, UPCOMING_MAX_TASKS
+)
+from .repository import repository, RepositoryError
+from .change_feed import change_feed, ChangeEvent, RESYNC
+
+try:
+    from zoneinfo import ZoneInfo
+    indonesia_tz = ZoneInfo("Asia/Jakarta")
+except ImportError:
+    import pytz
+    indonesia_tz = pytz.timezone("Asia/Jakarta")
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe key/value map whose entries expire after `ttl_seconds`.
+
+    Dipakai bersama oleh thread bot dan worker, jadi semua akses lewat lock.
+    """
+    def __init__(self, ttl_seconds: float, max_entries: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            if self.max_entries and len(self._entries) >= self.max_entries:
+                # dict menjaga urutan insert, entry pertama adalah yang paling lama
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value, calling `loader` on a miss. None results are not cached."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable = _MISSING) -> None:
+        """Drop one key, or everything when called without a key."""
+        with self._lock:
+            if key is _MISSING:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Tuple[int, int]:
+        """(hits, misses) since the cache was created."""
+        return self.hits, self.misses
+
+
+class ReferenceDataCache:
+    """Cached `classes` and `days` rows, used for menus and confirmation messages."""
+    def __init__(self, ttl_seconds: float):
+        self._cache = TTLCache(ttl_seconds)
+
+    def _load(self, table: str) -> Optional[List[Dict]]:
+        try:
+            return repository.reference(table) or None
+        except RepositoryError as e:
+            logger.error(f"ReferenceDataCache: Failed to load {table}: {e}")
+            return None
+
+    def classes(self) -> List[Dict]:
+        return self._cache.get_or_load('classes', lambda: self._load('classes')) or []
+
+    def days(self) -> List[Dict]:
+        return self._cache.get_or_load('days', lambda: self._load('days')) or []
+
+    def class_name(self, class_id) -> str:
+        for item in self.classes():
+            if str(item['id']) == str(class_id):
+                return item['name']
+        return f"Kelas ID {class_id}"
+
+    def day_name(self, day_id) -> str:
+        for item in self.days():
+            if str(item['id']) == str(day_id):
+                return item['name']
+        return f"Hari ID {day_id}"
+
+    def refresh(self) -> None:
+        for table in ('classes', 'days'):
+            data = self._load(table)
+            if data:
+                self._cache.set(table, data)
+
+    def invalidate(self, table: Optional[str] = None) -> None:
+        if table is None:
+            self._cache.invalidate()
+        else:
+            self._cache.invalidate(table)
+
+    def stats(self) -> Tuple[int, int]:
+        return self._cache.stats()
+
+
+class AdminIdentityCache:
+    """TTL map from admin phone number to `users.id`, preloaded for every whitelisted admin."""
+    def __init__(self, admin_phones: Iterable[str], ttl_seconds: float):
+        self.admin_phones = frozenset(admin_phones)
+        self._user_ids = TTLCache(ttl_seconds)
+
+    def get_user_id(self, phone_number: str) -> Optional[int]:
+        """Return the cached user id, falling back to one `users` lookup on a miss."""
+        return self._user_ids.get_or_load(phone_number, lambda: repository.user_id(phone_number))
+
+    def refresh(self) -> None:
+        if not self.admin_phones:
+            return
+        for phone_number, user_id in repository.user_ids(self.admin_phones).items():
+            if user_id is not None:
+                self._user_ids.set(phone_number, user_id)
+
+    def stats(self) -> Tuple[int, int]:
+        return self._user_ids.stats()
+
+
+reference_cache = ReferenceDataCache(REFERENCE_CACHE_TTL_SECONDS)
+admin_identity_cache = AdminIdentityCache(ADMIN_PHONES, IDENTITY_CACHE_TTL_SECONDS)
+# class_id -> daftar tugas UPCOMING_DAYS ke depan, dipakai bersama oleh semua user di kelas itu
+upcoming_tasks_cache = TTLCache(UPCOMING_CACHE_TTL_SECONDS)
+
+def load_upcoming_tasks(class_id: int) -> Optional[List[Dict]]:
+    """Tasks of a class due within UPCOMING_DAYS from now, or None when storage fails."""
+    now_wib = datetime.now(indonesia_tz)
+    try:
+        return repository.upcoming_tasks(
+            class_id, now_wib.isoformat(), (now_wib + timedelta(days=UPCOMING_DAYS)).isoformat(), UPCOMING_MAX_TASKS
+        )
+    except RepositoryError as e:
+        logger.error(f"load_upcoming_tasks: Supabase error for class {class_id}: {e}")
+        return None
+
+def cache_stats() -> Dict[str, Tuple[int, int]]:
+    """(hits, misses) of every cache in this module, by cache name."""
+    return {
+        "reference": reference_cache.stats(),
+        "admin_identity": admin_identity_cache.stats(),
+        "upcoming_tasks": upcoming_tasks_cache.stats(),
+    }
+
+def invalidate_class_tasks(class_id) -> None:
+    """Drop per-class task caches after tasks for that class were inserted or changed."""
+    upcoming_tasks_cache.invalidate(int(class_id))
+
+def _apply_change(event: ChangeEvent) -> None:
+    if event.table in ('classes', 'days'):
+        reference_cache.invalidate(None if event.type == RESYNC else event.table)
+        return
+    class_ids = event.values('class_id')
+    if not class_ids:
+        # RESYNC, atau DELETE tanpa REPLICA IDENTITY FULL (old_record hanya berisi id)
+        upcoming_tasks_cache.invalidate()
+    for class_id in class_ids:
+        invalidate_class_tasks(class_id)
+
+change_feed.subscribe(_apply_change, tables=('tasks', 'classes', 'days'))
+
+_refresh_thread = None
+_refresh_stop = threading.Event()
+
+def _refresh_loop(interval_seconds: float, refresh_now: bool) -> None:
+    if not refresh_now:
+        _refresh_stop.wait(interval_seconds)
+    while not _refresh_stop.is_set():
+        try:
+            reference_cache.refresh()
+            admin_identity_cache.refresh()
+            logger.debug("Cache refresh: reference data and admin identities reloaded.")
+        except Exception as e:
+            logger.warning(f"Cache refresh failed, keeping previous entries: {e}")
+        _refresh_stop.wait(interval_seconds)
+
+def start_background_refresh(interval_seconds: float = CACHE_REFRESH_INTERVAL_SECONDS, refresh_now: bool = True) -> None:
+    """Start the daemon thread that keeps reference data and admin identities warm.
+
+    `refresh_now=False` menunda refresh pertama satu interval (saat startup warm-up sudah memuatnya).
+    """
+    global _refresh_thread
+    if not repository.is_available() or (_refresh_thread and _refresh_thread.is_alive()):
+        return
+    _refresh_stop.clear()
+    _refresh_thread = threading.Thread(
+        target=_refresh_loop, args=(interval_seconds, refresh_now), name="CacheRefreshThread", daemon=True
+    )
+    _refresh_thread.start()
+    logger.info(f"Cache refresh thread started (interval {interval_seconds}s).")
+
+def stop_background_refresh() -> None:
+    _refresh_stop.set()
@@ -0,0 +1,238 @@
+# src/change_feed.py
+import asyncio
+import itertools
+import json
+import threading
+import time
+import logging
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from .config import (
+    supabase_url, supabase_key, STORAGE_BACKEND, REALTIME_ENABLED, REALTIME_HEARTBEAT_SECONDS,
+    REALTIME_RECONNECT_MAX_SECONDS
+)
+from .metrics import registry
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+logger = logging.getLogger(__name__)
+
+change_events_total = registry.counter(
+    "crealert_change_events_total", "Row changes delivered to in-process subscribers, by table, type and source."
+)
+
+CHANGE_FEED_TABLES = ("tasks", "classes", "days", "notifications")
+
+INSERT = "INSERT"
+UPDATE = "UPDATE"
+DELETE = "DELETE"
+# Bukan perubahan baris: event yang mungkin terlewat (mis. saat koneksi Realtime putus), anggap semua berubah
+RESYNC = "RESYNC"
+
+SOURCE_LOCAL = "local"
+SOURCE_REALTIME = "realtime"
+
+
+class ChangeEvent(NamedTuple):
+    table: str
+    type: str
+    record: Optional[Dict] = None
+    old_record: Optional[Dict] = None
+    source: str = SOURCE_LOCAL
+
+    def values(self, column: str) -> set:
+        """Values of `column` in the new and old row (empty when the row is unknown, e.g. RESYNC)."""
+        return {row[column] for row in (self.record, self.old_record) if row and row.get(column) is not None}
+
+
+class ChangeFeed:
+    """In-process fan-out of row changes on CHANGE_FEED_TABLES.
+
+    Diisi oleh RealtimeListener (perubahan dari mana pun, termasuk dashboard Supabase) dan
+    oleh StorageBackend untuk tulisan dari proses ini sendiri. Subscriber dipanggil di thread
+    penerbit, jadi harus cepat dan tidak boleh blocking.
+    """
+    def __init__(self):
+        self._subscribers: List[Tuple[Callable[[ChangeEvent], None], Optional[frozenset]]] = []
+        self._lock = threading.Lock()
+        self.last_event_at: Optional[float] = None
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None], tables: Optional[Iterable[str]] = None) -> None:
+        with self._lock:
+            self._subscribers.append((callback, frozenset(tables) if tables else None))
+
+    def unsubscribe(self, callback: Callable[[ChangeEvent], None]) -> None:
+        with self._lock:
+            self._subscribers = [(cb, tables) for cb, tables in self._subscribers if cb != callback]
+
+    def publish(self, event: ChangeEvent) -> None:
+        change_events_total.inc(table=event.table, type=event.type, source=event.source)
+        self.last_event_at = time.time()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback, tables in subscribers:
+            if tables is not None and event.table not in tables:
+                continue
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"ChangeFeed: Subscriber {getattr(callback, '__qualname__', callback)} failed on {event.table} {event.type}: {e}", exc_info=True)
+
+    def publish_rows(self, table: str, change_type: str, rows: Iterable[Dict], source: str = SOURCE_LOCAL) -> None:
+        for row in rows:
+            self.publish(ChangeEvent(table, change_type, row, None, source))
+
+    def resync(self, source: str = SOURCE_LOCAL) -> None:
+        """Tell every subscriber that changes may have been missed."""
+        for table in CHANGE_FEED_TABLES:
+            self.publish(ChangeEvent(table, RESYNC, None, None, source))
+
+
+class RealtimeListener:
+    """Supabase Realtime client (Phoenix websocket protocol) for `postgres_changes` on CHANGE_FEED_TABLES.
+
+    Berjalan di thread sendiri dengan event loop asyncio sendiri. Koneksi yang putus
+    disambung ulang dengan backoff; setelah tersambung ulang feed di-resync karena
+    perubahan selama putus tidak dikirim ulang oleh Realtime. Polling di worker dan
+    TTL cache tetap berjalan sebagai cadangan.
+    """
+    TOPIC = "realtime:crealert-changes"
+
+    def __init__(self, feed: ChangeFeed, url: str, api_key: str, tables: Iterable[str] = CHANGE_FEED_TABLES,
+                 heartbeat_seconds: float = REALTIME_HEARTBEAT_SECONDS,
+                 reconnect_max_seconds: float = REALTIME_RECONNECT_MAX_SECONDS):
+        self.feed = feed
+        self.url = url.rstrip("/").replace("https://", "wss://").replace("http://", "ws://") + \
+            f"/realtime/v1/websocket?apikey={api_key}&vsn=1.0.0"
+        self.api_key = api_key
+        self.tables = tuple(tables)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self.connected = False
+        self.connections = 0
+        self._refs = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._thread_main, name="RealtimeListener", daemon=True)
+        self._thread.start()
+        logger.info(f"RealtimeListener started for tables {', '.join(self.tables)}.")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._loop and self._task:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread:
+            self._thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def _thread_main(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._task = self._loop.create_task(self._run())
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+            logger.info("RealtimeListener stopped.")
+
+    def _message(self, topic: str, event: str, payload: Dict) -> str:
+        return json.dumps({"topic": topic, "event": event, "payload": payload, "ref": str(next(self._refs))})
+
+    def _join_payload(self) -> Dict:
+        return {
+            "config": {
+                "broadcast": {"self": False},
+                "presence": {"key": ""},
+                "postgres_changes": [{"event": "*", "schema": "public", "table": table} for table in self.tables],
+            },
+            "access_token": self.api_key,
+        }
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                async with websockets.connect(self.url, open_timeout=10) as socket:
+                    await socket.send(self._message(self.TOPIC, "phx_join", self._join_payload()))
+                    heartbeat = asyncio.create_task(self._heartbeat(socket))
+                    try:
+                        async for raw in socket:
+                            if self._handle(json.loads(raw)):
+                                backoff = 1.0
+                    finally:
+                        heartbeat.cancel()
+                logger.warning("RealtimeListener: Connection closed by server.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"RealtimeListener: Connection failed: {e!r}")
+            self.connected = False
+            logger.info(f"RealtimeListener: Reconnecting in {backoff:.0f}s (polling keeps running meanwhile).")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.reconnect_max_seconds)
+
+    async def _heartbeat(self, socket) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            await socket.send(self._message("phoenix", "heartbeat", {}))
+
+    def _handle(self, message: Dict) -> bool:
+        """Process one server message. Returns True once the channel join is confirmed."""
+        event, payload = message.get("event"), message.get("payload") or {}
+        if event == "phx_reply" and message.get("topic") == self.TOPIC and not self.connected:
+            if payload.get("status") != "ok":
+                logger.error(f"RealtimeListener: Join rejected: {payload.get('response')}")
+                return False
+            self.connected = True
+            self.connections += 1
+            logger.info(f"RealtimeListener: Subscribed to postgres_changes (connection #{self.connections}).")
+            if self.connections > 1:
+                self.feed.resync(SOURCE_REALTIME) # Perubahan selama koneksi putus tidak akan dikirim ulang
+            return True
+        if event == "postgres_changes":
+            data = payload.get("data") or {}
+            if data.get("table") in self.tables:
+                self.feed.publish(ChangeEvent(
+                    data["table"], data.get("type", UPDATE), data.get("record") or None,
+                    data.get("old_record") or None, SOURCE_REALTIME
+                ))
+        elif event == "system" and payload.get("status") == "error":
+            logger.error(f"RealtimeListener: Realtime reported an error: {payload.get('message')}")
+        elif event in ("phx_error", "phx_close"):
+            logger.warning(f"RealtimeListener: Channel {event}: {payload}")
+        return False
+
+
+change_feed = ChangeFeed()
+_listener: Optional[RealtimeListener] = None
+
+def start_change_feed() -> Optional[RealtimeListener]:
+    """Start the Realtime listener when enabled and configured. Returns it (None when not started)."""
+    global _listener
+    if not REALTIME_ENABLED or STORAGE_BACKEND != "supabase":
+        logger.info("Change feed: Realtime disabled, caches and worker rely on polling and local writes only.")
+        return None
+    if websockets is None or not supabase_url or not supabase_key:
+        logger.warning("Change feed: websockets package or Supabase URL/key missing, Realtime listener not started.")
+        return None
+    if _listener is None:
+        _listener = RealtimeListener(change_feed, supabase_url, supabase_key)
+        registry.gauge(
+            "crealert_change_feed_connected", "1 while the Supabase Realtime channel is subscribed.",
+            callback=lambda: 1 if _listener.connected else 0
+        )
+    _listener.start()
+    return _listener
+
+def stop_change_feed() -> None:
+    if _listener is not None:
+        _listener.stop()
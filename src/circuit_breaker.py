@@ -0,0 +1,93 @@
+# src/circuit_breaker.py
+import threading
+import time
+import logging
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Call rejected without being attempted because the circuit is open."""
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"circuit '{name}' is open, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures; open -> half-open after `reset_seconds`.
+
+    Saat half-open hanya satu panggilan percobaan yang diteruskan; panggilan lain langsung
+    ditolak sampai percobaan itu selesai. Berhasil -> closed, gagal -> open lagi.
+    `is_failure` menentukan exception mana yang dihitung sebagai gangguan.
+    """
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float,
+                 is_failure: Callable[[BaseException], bool] = lambda e: True):
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_seconds = reset_seconds
+        self.is_failure = is_failure
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a probe through (0 when not open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(self.opened_at + self.reset_seconds - time.monotonic(), 0.0)
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    raise CircuitOpenError(self.name, self.retry_after())
+                self.state = HALF_OPEN
+                logger.info(f"CircuitBreaker '{self.name}': half-open, sending a probe call.")
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    raise CircuitOpenError(self.name, 0.0)
+                self._probe_in_flight = True
+
+    def _on_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"CircuitBreaker '{self.name}': probe succeeded, circuit closed.")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def _on_failure(self, error: BaseException) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                    logger.error(
+                        f"CircuitBreaker '{self.name}': open after {self.consecutive_failures} consecutive failures "
+                        f"(last: {error!r}). Failing fast for {self.reset_seconds}s."
+                    )
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """Run `fn` through the breaker; raises CircuitOpenError instead of calling it while open."""
+        self._acquire()
+        try:
+            result = fn()
+        except BaseException as e:
+            if self.is_failure(e):
+                self._on_failure(e)
+            else:
+                self._on_success() # Server menjawab (mis. constraint violation): bukan gangguan
+            raise
+        self._on_success()
+        return result
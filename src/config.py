@@ -1,11 +1,10 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from supabase.lib.client_options import ClientOptions
 import logging
+from .supabase_client import LazySupabaseClient
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Logging dikonfigurasi oleh bot.py (configure_logging), bukan saat modul ini di-import
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -24,25 +23,139 @@ if supabase_key:
 if not supabase_url or not supabase_key:
     logger.error("[CONFIG_PY] CRITICAL: SUPABASE_URL or SUPABASE_KEY is missing after os.getenv!")
 
-options = ClientOptions(
-    auto_refresh_token=True,
-    persist_session=True
+# Timeout per request PostgREST; bersama circuit breaker di repository menjaga handler tidak menggantung saat Supabase down
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "5"))
+
+# Client dibuat saat pertama dipakai (atau oleh warm-up di background saat startup), bukan saat import
+supabase = None
+if supabase_url and supabase_key:
+    supabase = LazySupabaseClient(supabase_url, supabase_key, SUPABASE_TIMEOUT_SECONDS)
+else:
+    logger.error("[CONFIG_PY] Supabase client NOT created due to missing URL/Key.")
+
+# Admin configuration (frozenset agar pengecekan is_admin cukup satu hash lookup)
+ADMIN_PHONES = frozenset(phone.strip() for phone in os.getenv("ADMIN_PHONES", "").split(",") if phone.strip())
+logger.info(f"[CONFIG_PY] Admin phones loaded: {sorted(ADMIN_PHONES)}")
+
+# Cache configuration
+IDENTITY_CACHE_TTL_SECONDS = int(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "900"))
+REFERENCE_CACHE_TTL_SECONDS = int(os.getenv("REFERENCE_CACHE_TTL_SECONDS", "900"))
+CACHE_REFRESH_INTERVAL_SECONDS = int(os.getenv("CACHE_REFRESH_INTERVAL_SECONDS", "300"))
+
+# Jumlah tugas per halaman pada daftar tugas (menjaga ukuran pesan WhatsApp tetap kecil)
+TASK_PAGE_SIZE = int(os.getenv("TASK_PAGE_SIZE", "5"))
+TASK_LIST_DESCRIPTION_MAX_CHARS = int(os.getenv("TASK_LIST_DESCRIPTION_MAX_CHARS", "120"))
+
+# Tampilan "upcoming": tugas N hari ke depan untuk satu kelas, di-cache per kelas
+UPCOMING_DAYS = int(os.getenv("UPCOMING_DAYS", "7"))
+UPCOMING_MAX_TASKS = int(os.getenv("UPCOMING_MAX_TASKS", "30"))
+UPCOMING_CACHE_TTL_SECONDS = int(os.getenv("UPCOMING_CACHE_TTL_SECONDS", "120"))
+
+# Index pencarian "cari <kata>" dibangun ulang dari DB setelah TTL ini sebagai jaring pengaman
+SEARCH_INDEX_TTL_SECONDS = int(os.getenv("SEARCH_INDEX_TTL_SECONDS", "1800"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "10"))
+
+# Template pesan reminder bisa di-override lewat file JSON {"H-1H": "...{task_name}..."}
+REMINDER_TEMPLATES_FILE = os.getenv("REMINDER_TEMPLATES_FILE")
+REMINDER_RENDER_CACHE_SIZE = int(os.getenv("REMINDER_RENDER_CACHE_SIZE", "2048"))
+
+# Interval polling NotificationWorker: tidur sampai reminder berikutnya jatuh tempo (maks. MAX),
+# cepat selama masih ada backlog, dan backoff eksponensial saat Supabase error berturut-turut
+WORKER_FETCH_BATCH_SIZE = int(os.getenv("WORKER_FETCH_BATCH_SIZE", "200"))
+WORKER_MIN_INTERVAL_SECONDS = float(os.getenv("WORKER_MIN_INTERVAL_SECONDS", "1"))
+WORKER_MAX_INTERVAL_SECONDS = float(os.getenv("WORKER_MAX_INTERVAL_SECONDS", "60"))
+WORKER_BACKLOG_INTERVAL_SECONDS = float(os.getenv("WORKER_BACKLOG_INTERVAL_SECONDS", "0.5"))
+WORKER_ERROR_BACKOFF_BASE_SECONDS = float(os.getenv("WORKER_ERROR_BACKOFF_BASE_SECONDS", "5"))
+WORKER_ERROR_BACKOFF_MAX_SECONDS = float(os.getenv("WORKER_ERROR_BACKOFF_MAX_SECONDS", "300"))
+
+# Backpressure antara tahap fetch dan tahap kirim NotificationWorker
+WORKER_SEND_QUEUE_SIZE = int(os.getenv("WORKER_SEND_QUEUE_SIZE", "50"))
+WORKER_SEND_CONCURRENCY = int(os.getenv("WORKER_SEND_CONCURRENCY", "1"))
+WORKER_SEND_ERROR_WINDOW = int(os.getenv("WORKER_SEND_ERROR_WINDOW", "20"))
+WORKER_SEND_MAX_ERROR_RATE = float(os.getenv("WORKER_SEND_MAX_ERROR_RATE", "0.5"))
+
+# Outbox: semua pesan keluar ditulis dulu ke SQLite lalu dikirim oleh satu sender
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "outbox.sqlite3")
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_SEND_RATE_PER_SECOND = float(os.getenv("OUTBOX_SEND_RATE_PER_SECOND", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "5"))
+OUTBOX_IDLE_POLL_SECONDS = float(os.getenv("OUTBOX_IDLE_POLL_SECONDS", "1"))
+OUTBOX_MAX_PENDING = int(os.getenv("OUTBOX_MAX_PENDING", "500"))
+OUTBOX_ROUTE_REPLIES = os.getenv("OUTBOX_ROUTE_REPLIES", "true").lower() in ("1", "true", "yes")
+
+# Pool instance GreenAPI untuk reminder, format "idInstance:apiToken,idInstance:apiToken".
+# Instance utama (GREENAPI_ID) selalu ikut dalam pool; balasan chat tetap lewat instance utama.
+GREENAPI_POOL = [
+    tuple(part.strip() for part in entry.split(":", 1))
+    for entry in os.getenv("GREENAPI_POOL", "").split(",") if ":" in entry
+]
+SENDER_POOL_RATE_PER_SECOND = float(os.getenv("SENDER_POOL_RATE_PER_SECOND", "2")) # Per instance
+SENDER_POOL_BURST = int(os.getenv("SENDER_POOL_BURST", "5"))
+SENDER_POOL_VNODES = int(os.getenv("SENDER_POOL_VNODES", "100"))
+SENDER_POOL_DEGRADED_COOLDOWN_SECONDS = float(os.getenv("SENDER_POOL_DEGRADED_COOLDOWN_SECONDS", "60")) # Sebelum kirim percobaan
+
+# Dedup pesan masuk berdasarkan idMessage. Kosongkan INBOUND_DEDUP_PATH untuk dedup di memori saja.
+INBOUND_DEDUP_WINDOW_SECONDS = float(os.getenv("INBOUND_DEDUP_WINDOW_SECONDS", "86400"))
+INBOUND_DEDUP_MAX_IDS = int(os.getenv("INBOUND_DEDUP_MAX_IDS", "20000"))
+INBOUND_DEDUP_PATH = os.getenv("INBOUND_DEDUP_PATH", OUTBOX_PATH)
+
+# Throttle per pengirim: token bucket + debounce untuk pesan identik yang dikirim beruntun
+INBOUND_RATE_PER_SECOND = float(os.getenv("INBOUND_RATE_PER_SECOND", "1"))
+INBOUND_BURST = int(os.getenv("INBOUND_BURST", "5"))
+INBOUND_DEBOUNCE_SECONDS = float(os.getenv("INBOUND_DEBOUNCE_SECONDS", "1.5"))
+INBOUND_MAX_SENDERS = int(os.getenv("INBOUND_MAX_SENDERS", "10000"))
+
+# Peran proses: "receiver" (bot penerima pesan), "worker" (NotificationWorker) atau "all" (keduanya)
+BOT_ROLE = os.getenv("BOT_ROLE", "all").strip().lower()
+
+# Endpoint /healthz, /readyz dan /metrics. Render mengisi PORT untuk web service.
+HEALTH_SERVER_ENABLED = os.getenv("HEALTH_SERVER_ENABLED", "true").lower() in ("1", "true", "yes")
+HEALTH_HOST = os.getenv("HEALTH_HOST", "0.0.0.0")
+HEALTH_PORT = int(os.getenv("PORT", "8080"))
+
+# Logging: level global, level per modul ("src.workers=WARNING,src.outbox=DEBUG") dan sampling log per item
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = dict(
+    tuple(part.strip() for part in entry.split("=", 1))
+    for entry in os.getenv("LOG_LEVELS", "").split(",") if "=" in entry
 )
+LOG_ITEM_SAMPLE_EVERY = int(os.getenv("LOG_ITEM_SAMPLE_EVERY", "100"))
+
+# Storage: "supabase" (default) atau "sqlite" untuk deployment satu node tanpa round-trip PostgREST.
+# Isi awal SQLite bisa disalin dari Supabase: python -m src.sqlite_backend --copy-from-supabase
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").strip().lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "crealert.sqlite3")
+
+# Change feed Supabase Realtime (postgres_changes pada tasks, classes, days, notifications):
+# cache langsung di-invalidate dan worker dibangunkan; polling/TTL tetap jalan sebagai cadangan.
+# Tabel harus masuk publication `supabase_realtime` di dashboard Supabase.
+REALTIME_ENABLED = os.getenv("REALTIME_ENABLED", "true").lower() in ("1", "true", "yes")
+REALTIME_HEARTBEAT_SECONDS = float(os.getenv("REALTIME_HEARTBEAT_SECONDS", "25"))
+REALTIME_RECONNECT_MAX_SECONDS = float(os.getenv("REALTIME_RECONNECT_MAX_SECONDS", "60"))
+
+# Circuit breaker Supabase: setelah N kegagalan beruntun semua query gagal cepat selama RESET detik,
+# lalu satu query percobaan menentukan apakah Supabase sudah pulih. Selama terbuka, handler memakai
+# hasil baca terakhir yang berhasil (maksimal STALE_CACHE_MAX_ENTRIES query berbeda).
+SUPABASE_BREAKER_FAILURE_THRESHOLD = int(os.getenv("SUPABASE_BREAKER_FAILURE_THRESHOLD", "5"))
+SUPABASE_BREAKER_RESET_SECONDS = float(os.getenv("SUPABASE_BREAKER_RESET_SECONDS", "30"))
+STALE_CACHE_MAX_ENTRIES = int(os.getenv("STALE_CACHE_MAX_ENTRIES", "2000"))
+
+# Warm-up saat startup: data referensi, tugas UPCOMING_DAYS ke depan dan index pencarian per kelas,
+# serta reminder yang jatuh tempo dalam WARMUP_REMINDER_WINDOW_MINUTES dimuat ke cache sebelum user pertama datang.
+# Hit rate cache dilaporkan ke log WARMUP_REPORT_AFTER_SECONDS setelah warm-up selesai (0 = tidak dilaporkan).
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_REMINDER_WINDOW_MINUTES = int(os.getenv("WARMUP_REMINDER_WINDOW_MINUTES", "60"))
+WARMUP_REPORT_AFTER_SECONDS = float(os.getenv("WARMUP_REPORT_AFTER_SECONDS", "600"))
 
-# supabase: Client = create_client(supabase_url, supabase_key, options=options)
-supabase: Client = None
-try:
-    if supabase_url and supabase_key:
-        supabase = create_client(supabase_url, supabase_key, options=options)
-        logger.info("[CONFIG_PY] Supabase client CREATED successfully.")
-    else:
-        logger.error("[CONFIG_PY] Supabase client NOT created due to missing URL/Key.")
-except Exception as e:
-    logger.error(f"[CONFIG_PY] Error creating Supabase client: {e}", exc_info=True)
-
-# Admin configuration
-ADMIN_PHONES = os.getenv("ADMIN_PHONES", "").split(",")
-logger.info(f"[CONFIG_PY] Admin phones loaded: {ADMIN_PHONES}")
+# Instrumentasi: histogram per handler (state) dan per query Supabase (tabel, operasi).
+# Jika dimatikan, handler dan client Supabase tidak dibungkus sama sekali.
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOW_HANDLER_SECONDS = float(os.getenv("SLOW_HANDLER_SECONDS", "1.0"))
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0.5"))
+if INSTRUMENTATION_ENABLED and supabase is not None:
+    from .instrumentation import InstrumentedSupabase
+    supabase = InstrumentedSupabase(supabase, SLOW_QUERY_SECONDS)
 
 # Define states
 class States:
@@ -59,6 +172,7 @@ class States:
     ADMIN_TASK_TYPE = "ADMIN_TASK_TYPE"
     ADMIN_TASK_DESCRIPTION = "ADMIN_TASK_DESCRIPTION"
     ADMIN_TASK_DEADLINE = "ADMIN_TASK_DEADLINE"
+    ADMIN_BULK_IMPORT = "ADMIN_BULK_IMPORT"
 
 def is_admin(phone_number: str) -> bool:
     """Check if phone number is in admin whitelist"""
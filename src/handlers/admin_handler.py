@@ -2,8 +2,11 @@
 from datetime import datetime
 # from typing import List, Dict # Not directly used in this specific snippet modification
 import logging
-from ..config import States, supabase, is_admin
-from ..utils import update_state_with_history
+import requests
+from ..config import States, is_admin
+from ..utils import update_state_with_history, parse_bulk_tasks, TASK_TYPES
+from ..cache import reference_cache, admin_identity_cache
+from ..repository import repository
 try:
     from zoneinfo import ZoneInfo
     indonesia_tz = ZoneInfo("Asia/Jakarta")
@@ -13,6 +16,30 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+ADMIN_MENU_TEXT = (
+    "*🛠️ Panel Ketua Kelas*\n\n"
+    "1. Tambah Tugas Baru\n"
+    "2. Kembali ke Menu Utama\n"
+    "3. Import Banyak Tugas Sekaligus\n\n"
+    "_Note:_\n"
+    "Ketik angka sesuai pilihan\n"
+    "Ketik 0 untuk kembali ke Home"
+)
+
+BULK_IMPORT_PROMPT = (
+    "*📥 Import Banyak Tugas Sekaligus*\n\n"
+    "Kirim daftar tugas, satu tugas per baris, atau lampirkan file CSV.\n"
+    "Format: Kelas;Nama Tugas;Jenis;Deskripsi;DD-MM-YYYY HH:MM\n\n"
+    "Contoh:\n"
+    "1;Essay Branding;mandiri;Min. 500 kata;25-12-2023 23:59\n"
+    "2;Pitch Deck;kelompok;Maks. 10 slide;26-12-2023 12:00\n\n"
+    "_Note:_\n"
+    "Kelas diisi angka kelas, Jenis boleh angka (1-5) atau nama jenis\n"
+    "Hari pengumpulan otomatis mengikuti tanggal deadline\n"
+    "Pemisah boleh ; | atau koma\n"
+    "Ketik 0 untuk kembali ke Panel Ketua Kelas"
+)
+
 class AdminHandler:
     def __init__(self, bot):
         self.bot = bot
@@ -39,14 +66,7 @@ class AdminHandler:
                 )
                 return
             
-            notification.answer(
-                "*🛠️ Panel Ketua Kelas*\n\n"
-                "1. Tambah Tugas Baru\n"
-                "2. Kembali ke Menu Utama\n\n"
-                "_Note:_\n"
-                "Ketik angka sesuai pilihan\n"
-                "Ketik 0 untuk kembali ke Home"
-            )
+            notification.answer(ADMIN_MENU_TEXT)
             update_state_with_history(notification, States.ADMIN_MENU)
 
         @self.bot.router.message(
@@ -77,6 +97,50 @@ class AdminHandler:
             """Handle admin menu selections"""
             self.start_add_task_flow(notification)
 
+        @self.bot.router.message(
+            type_message="textMessage",
+            state=States.ADMIN_MENU,
+            regexp=r"^3$"
+        )
+        def admin_bulk_import_menu_handler(notification):
+            """Handle bulk import selection from admin menu"""
+            notification.answer(BULK_IMPORT_PROMPT)
+            update_state_with_history(notification, States.ADMIN_BULK_IMPORT)
+
+        @self.bot.router.message(
+            type_message="documentMessage",
+            state=States.ADMIN_BULK_IMPORT
+        )
+        def admin_bulk_import_file_handler(notification):
+            """Handle an attached CSV file in bulk import flow"""
+            file_data = notification.event["messageData"].get("fileMessageData", {})
+            file_name = file_data.get("fileName", "")
+            download_url = file_data.get("downloadUrl")
+            if not download_url or not file_name.lower().endswith((".csv", ".txt")):
+                notification.answer("⚠️ *File tidak didukung!*\n\nKirim file .csv atau tempel daftar tugas sebagai teks.")
+                return
+            try:
+                file_response = requests.get(download_url, timeout=15)
+                file_response.raise_for_status()
+                raw_text = file_response.content.decode("utf-8-sig")
+            except (requests.RequestException, UnicodeDecodeError) as e:
+                logger.error(f"Failed to download bulk import file '{file_name}': {e}")
+                notification.answer("❌ Gagal membaca file. Pastikan file CSV berformat UTF-8 lalu coba lagi.")
+                return
+            self.import_bulk_tasks(notification, raw_text)
+
+        @self.bot.router.message(
+            type_message="textMessage",
+            state=States.ADMIN_BULK_IMPORT
+        )
+        def admin_bulk_import_text_handler(notification):
+            """Handle a pasted block of tasks in bulk import flow"""
+            if notification.message_text.strip() == "0":
+                notification.answer(ADMIN_MENU_TEXT)
+                update_state_with_history(notification, States.ADMIN_MENU)
+                return
+            self.import_bulk_tasks(notification, notification.message_text)
+
 
         @self.bot.router.message(
             type_message="textMessage",
@@ -91,14 +155,7 @@ class AdminHandler:
             if notification.message_text == "0":
                 # This will take them to ADMIN_MENU. 
                 # If they start "Add Task" again, start_add_task_flow will reset admin_task_in_progress.
-                notification.answer(
-                    "*🛠️ Panel Ketua Kelas*\n\n"
-                    "1. Tambah Tugas Baru\n"
-                    "2. Kembali ke Menu Utama\n\n"
-                    "_Note:_\n"
-                    "Ketik angka sesuai pilihan\n"
-                    "Ketik 0 untuk kembali ke Home"
-                )
+                notification.answer(ADMIN_MENU_TEXT)
                 # Preserve current admin_task_in_progress if we are just updating history for back nav
                 # But since we go to ADMIN_MENU, it will be reset by start_add_task_flow if "Add new task" is chosen.
                 # For consistent back navigation logic that preserves form data, this could be more granular.
@@ -114,8 +171,7 @@ class AdminHandler:
                 if not (1 <= class_choice <= 8): # Assuming max 8 classes, adjust if necessary
                     raise ValueError("Invalid class choice")
             except ValueError:
-                response = supabase.table('classes').select('id, name').order('id').execute()
-                classes = {str(item['id']): item['name'] for item in response.data}
+                classes = {str(item['id']): item['name'] for item in reference_cache.classes()}
                 class_list = "\n".join([f"{num}. {name}" for num, name in classes.items()])
                 notification.answer(
                     "⚠️ *Input tidak valid!*\n\n"
@@ -133,8 +189,7 @@ class AdminHandler:
                 {"state_history": history, "admin_task_in_progress": admin_task_in_progress}
             )
             
-            days_response = supabase.table('days').select('id, name').order('id').execute()
-            days = {str(item['id']): item['name'] for item in days_response.data}
+            days = {str(item['id']): item['name'] for item in reference_cache.days()}
             day_list = "\n".join([f"{num}. {name}" for num, name in days.items()])
             
             notification.answer(
@@ -158,8 +213,7 @@ class AdminHandler:
 
             if notification.message_text == "0":
                 # Go back to class selection
-                response = supabase.table('classes').select('id, name').order('id').execute()
-                classes = {str(item['id']): item['name'] for item in response.data}
+                classes = {str(item['id']): item['name'] for item in reference_cache.classes()}
                 class_list = "\n".join([f"{num}. {name}" for num, name in classes.items()])
                 notification.answer(
                     "*🧑‍🏫 Pilih Kelas:*\n\n" +
@@ -182,8 +236,7 @@ class AdminHandler:
                 if not (1 <= day_choice <= 7): # Assuming 7 days
                     raise ValueError("Invalid day choice")
             except ValueError:
-                days_response = supabase.table('days').select('id, name').order('id').execute()
-                days = {str(item['id']): item['name'] for item in days_response.data}
+                days = {str(item['id']): item['name'] for item in reference_cache.days()}
                 day_list = "\n".join([f"{num}. {name}" for num, name in days.items()])
                 notification.answer(
                     "⚠️ *Input tidak valid!*\n\n"
@@ -220,8 +273,7 @@ class AdminHandler:
             history = state_data.get("state_history", [])
 
             if notification.message_text == "0":
-                days_response = supabase.table('days').select('id, name').order('id').execute()
-                days = {str(item['id']): item['name'] for item in days_response.data}
+                days = {str(item['id']): item['name'] for item in reference_cache.days()}
                 day_list = "\n".join([f"{num}. {name}" for num, name in days.items()])
                 notification.answer(
                     "*🗓️ Pilih Hari Pengumpulan:*\n\n" +
@@ -290,8 +342,7 @@ class AdminHandler:
                 update_state_with_history(notification, States.ADMIN_TASK_NAME)
                 return
 
-            task_types = {"1": "mandiri", "2": "kelompok", "3": "ujian", "4": "quiz", "5": "project"}
-            if notification.message_text not in task_types:
+            if notification.message_text not in TASK_TYPES:
                 notification.answer(
                     "⚠️ *Input tidak valid!*\n\n"
                     "*📂 Pilih Jenis Tugas:*\n\n"
@@ -306,7 +357,7 @@ class AdminHandler:
                 )
                 return
 
-            admin_task_in_progress["task_type"] = task_types[notification.message_text]
+            admin_task_in_progress["task_type"] = TASK_TYPES[notification.message_text]
             notification.state_manager.update_state_data(
                 notification.sender,
                 {"state_history": history, "admin_task_in_progress": admin_task_in_progress}
@@ -377,8 +428,7 @@ class AdminHandler:
             admin_task_in_progress = state_data.get("admin_task_in_progress", {})
             history = state_data.get("state_history", [])
 
-            days_response = supabase.table('days').select('id, name').order('id').execute()
-            days = {str(item['id']): item['name'] for item in days_response.data}
+            days = {str(item['id']): item['name'] for item in reference_cache.days()}
             day_list = "\n".join([f"{num}. {name}" for num, name in days.items()])
 
             notification.answer(
@@ -442,8 +492,7 @@ class AdminHandler:
                 deadline_weekday = aware_due_date.weekday() + 1 
 
                 if deadline_weekday != selected_day_id:
-                    day_response = supabase.table("days").select("name").eq("id", selected_day_id).execute()
-                    selected_day_name = day_response.data[0]["name"] if day_response.data else f"Hari ID {selected_day_id}"
+                    selected_day_name = reference_cache.day_name(selected_day_id)
                     notification.answer(
                         f"⚠️ *Input tidak valid!*\n\n"
                         f"Tanggal deadline yang kamu masukkan ({aware_due_date.strftime('%A, %d-%m-%Y')}) tidak jatuh pada hari {selected_day_name}.\n\n"
@@ -467,12 +516,11 @@ class AdminHandler:
                 )
                 return
             
-            admin_response = supabase.table("users").select("id").eq("phone_number", notification.sender).execute()
-            if not admin_response.data:
+            admin_id = admin_identity_cache.get_user_id(notification.sender)
+            if admin_id is None:
                 notification.answer("❌ Admin tidak ditemukan di database.")
                 self.start_add_task_flow(notification) 
                 return
-            admin_id = admin_response.data[0]["id"]
 
             # Construct task_data with timezone-aware due_date
             task_to_save = {
@@ -486,14 +534,11 @@ class AdminHandler:
             }
             
             try:
-                db_response = supabase.table("tasks").insert(task_to_save).execute()
+                saved_tasks = repository.insert_tasks(task_to_save)
                 
-                if db_response.data:
-                    class_resp = supabase.table("classes").select("name").eq("id", task_to_save["class_id"]).execute()
-                    class_name = class_resp.data[0]["name"] if class_resp.data else f"Kelas ID {task_to_save['class_id']}"
-                    
-                    day_resp = supabase.table("days").select("name").eq("id", task_to_save["day_id"]).execute()
-                    day_name = day_resp.data[0]["name"] if day_resp.data else f"Hari ID {task_to_save['day_id']}"
+                if saved_tasks:
+                    class_name = reference_cache.class_name(task_to_save["class_id"])
+                    day_name = reference_cache.day_name(task_to_save["day_id"])
 
                     notification.answer(
                         "✅ *Tugas berhasil ditambahkan!*\n\n"
@@ -510,21 +555,14 @@ class AdminHandler:
                         {"state_history": history, "admin_task_in_progress": {}} 
                     )
                 else:
-                    logger.error(f"Failed to save task to DB: {db_response.error}")
-                    notification.answer("❌ Gagal menyimpan tugas ke database. Error: " + (str(db_response.error) if db_response.error else "Unknown"))
+                    logger.error("Failed to save task to DB: insert returned no rows")
+                    notification.answer("❌ Gagal menyimpan tugas ke database. Error: Unknown")
             except Exception as e:
                 logger.error(f"Error saving task: {e}")
                 notification.answer(f"❌ Terjadi kesalahan saat menyimpan tugas: {e}")
 
             # Return to admin menu
-            notification.answer(
-                "*🛠️ Panel Ketua Kelas*\n\n"
-                "1. Tambah Tugas Baru\n"
-                "2. Kembali ke Menu Utama\n\n"
-                "_Note:_\n"
-                "Ketik angka sesuai pilihan\n"
-                "Ketik 0 untuk kembali ke Home"
-            )
+            notification.answer(ADMIN_MENU_TEXT)
             update_state_with_history(notification, States.ADMIN_MENU)
 
     def start_add_task_flow(self, notification):
@@ -538,8 +576,7 @@ class AdminHandler:
             {"state_history": history, "admin_task_in_progress": {}} # Key change: admin_task_in_progress is reset here
         )
 
-        response = supabase.table('classes').select('id, name').order('id').execute()
-        classes = {str(item['id']): item['name'] for item in response.data}
+        classes = {str(item['id']): item['name'] for item in reference_cache.classes()}
         class_list = "\n".join([f"{num}. {name}" for num, name in classes.items()])
         
         notification.answer(
@@ -551,4 +588,48 @@ class AdminHandler:
         )
         update_state_with_history(notification, States.ADMIN_CLASS_SELECTION)
 
+    def import_bulk_tasks(self, notification, raw_text):
+        """Validate a bulk task block and save all valid rows in one insert."""
+        class_names = {item['id']: item['name'] for item in reference_cache.classes()}
+
+        task_rows, errors = parse_bulk_tasks(raw_text, class_names.keys(), indonesia_tz)
+        error_report = ""
+        if errors:
+            error_report = f"\n\n⚠️ *{len(errors)} baris dilewati:*\n" + "\n".join(f"- {error}" for error in errors)
+
+        if not task_rows:
+            notification.answer(
+                "❌ *Tidak ada tugas yang bisa disimpan.*" + error_report +
+                "\n\nPerbaiki daftar lalu kirim ulang, atau ketik 0 untuk kembali."
+            )
+            return
+
+        admin_id = admin_identity_cache.get_user_id(notification.sender)
+        if admin_id is None:
+            notification.answer("❌ Admin tidak ditemukan di database.")
+            return
+        for task_row in task_rows:
+            task_row["created_by"] = admin_id
+
+        try:
+            saved_tasks = repository.insert_tasks(task_rows)
+        except Exception as e:
+            logger.error(f"Error bulk saving {len(task_rows)} tasks: {e}")
+            notification.answer(f"❌ Terjadi kesalahan saat menyimpan tugas: {e}")
+            return
+        if not saved_tasks:
+            logger.error(f"Failed to bulk save {len(task_rows)} tasks to DB: insert returned no rows")
+            notification.answer("❌ Gagal menyimpan tugas ke database.")
+            return
+
+        saved_list = "\n".join(
+            f"- {class_names.get(row['class_id'], row['class_id'])}: {row['name']} ({row['jenis_tugas'].capitalize()})"
+            for row in task_rows
+        )
+        notification.answer(
+            f"✅ *{len(saved_tasks)} tugas berhasil ditambahkan!*\n\n" + saved_list + error_report
+        )
+        notification.answer(ADMIN_MENU_TEXT)
+        update_state_with_history(notification, States.ADMIN_MENU)
+
     # show_admin_list method can remain as is, it doesn't interact with this specific state issue.
\ No newline at end of file
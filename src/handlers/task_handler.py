@@ -1,7 +1,13 @@
 # src/handlers/task_handler.py
 from datetime import datetime
-from ..config import States, supabase
+from ..config import (
+    States, TASK_PAGE_SIZE, TASK_LIST_DESCRIPTION_MAX_CHARS, UPCOMING_DAYS,
+    SEARCH_MAX_RESULTS
+)
 from ..utils import update_state_with_history, calculate_notification_times # calculate_notification_times masih dipakai
+from ..cache import reference_cache, upcoming_tasks_cache, load_upcoming_tasks
+from ..search import task_search_index
+from ..repository import repository, RepositoryError, is_stale
 import logging
 
 try:
@@ -13,6 +19,9 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Ditampilkan di atas menu yang dijawab dari data terakhir saat Supabase sedang gangguan
+STALE_DATA_NOTE = "⚠️ _Server sedang gangguan, data di bawah ini mungkin belum terbaru._\n\n"
+
 class TaskHandler:
     def __init__(self, bot):
         self.bot = bot
@@ -35,17 +44,19 @@ class TaskHandler:
     def _display_class_selection_menu(self, notification, prefix_message=""):
         logger.info(f"_display_class_selection_menu: Called for {notification.sender}")
         try:
-            response = supabase.table('classes').select('id, name').order('id').execute()
-            if hasattr(response, 'error') and response.error:
-                logger.error(f"_display_class_selection_menu: Supabase error: {response.error}")
+            try:
+                classes_data = repository.classes()
+            except RepositoryError as e:
+                logger.error(f"_display_class_selection_menu: Supabase error: {e}")
                 notification.answer(prefix_message + "Gagal mengambil daftar kelas.")
                 return False
-            classes_data = response.data
             if not classes_data:
                 logger.warning("_display_class_selection_menu: No classes found.")
                 notification.answer(prefix_message + "Belum ada kelas tersedia.")
                 return False
             class_list_str = "\n".join([f"{item['id']}. {item['name']}" for item in classes_data])
+            if is_stale(classes_data):
+                prefix_message += STALE_DATA_NOTE
             message = (prefix_message + "🧑‍🏫 *Pilih Kelasmu:* 👩‍🏫\n\n" + class_list_str +
                        "\n\n_Note:_\nKetik angka pilihan.\nKetik 0 untuk ke Menu Utama.")
             notification.answer(message)
@@ -77,40 +88,38 @@ class TaskHandler:
             return False
 
         try:
-            days_response = supabase.table('days').select('id, name').order('id').execute()
-            if hasattr(days_response, 'error') and days_response.error:
-                logger.error(f"_display_day_selection_menu: Supabase error fetching days: {days_response.error}")
+            try:
+                days_data = repository.days()
+            except RepositoryError as e:
+                logger.error(f"_display_day_selection_menu: Supabase error fetching days: {e}")
                 notification.answer(prefix_message + "Gagal mengambil daftar hari.")
                 return False
-            days_data = days_response.data
             if not days_data:
                 logger.warning("_display_day_selection_menu: No days found in 'days' table.")
                 notification.answer(prefix_message + "Belum ada hari tersedia.")
                 return False
 
+            # Satu query untuk semua hari (in_ day_id), bukan satu query per hari
+            try:
+                task_names_by_day = repository.task_names_by_day(selected_class_id, [day_item['id'] for day_item in days_data])
+            except RepositoryError as e:
+                logger.error(f"_display_day_selection_menu: Supabase error fetching tasks for class_id {selected_class_id}: {e}")
+                task_names_by_day = None
+
             day_details_list = []
             for day_item in days_data:
                 day_id = day_item['id']
                 day_name = day_item['name']
 
-                # Fetch tasks for this day_id and selected_class_id
-                tasks_for_day_response = supabase.table('tasks') \
-                    .select('name') \
-                    .eq('class_id', selected_class_id) \
-                    .eq('day_id', day_id) \
-                    .execute()
-
-                if hasattr(tasks_for_day_response, 'error') and tasks_for_day_response.error:
-                    logger.error(f"_display_day_selection_menu: Supabase error fetching tasks for day_id {day_id}, class_id {selected_class_id}: {tasks_for_day_response.error}")
-                    # Menampilkan error untuk hari spesifik ini, namun menu tetap lanjut
+                if task_names_by_day is None:
+                    # Menampilkan error per hari, namun menu tetap lanjut
                     day_details_list.append(f"{day_id}. {day_name}: (Error mengambil data tugas)")
                     continue
 
-                day_tasks_data = tasks_for_day_response.data
-                task_count = len(day_tasks_data)
+                task_names = task_names_by_day.get(day_id, [])
+                task_count = len(task_names)
 
                 if task_count > 0:
-                    task_names = [task['name'] for task in day_tasks_data]
                     # Batasi jumlah nama tugas yang ditampilkan jika terlalu banyak, misal 3 nama pertama
                     max_names_to_show = 3
                     if len(task_names) > max_names_to_show:
@@ -122,8 +131,11 @@ class TaskHandler:
                     day_details_list.append(f"{day_id}. {day_name}: 0")
 
             day_list_str = "\n".join(day_details_list)
+            if is_stale(days_data) or is_stale(task_names_by_day):
+                prefix_message += STALE_DATA_NOTE
             message = (prefix_message + "🗓️ *Pilih Hari Pengumpulan:* 🗓️\n\n" + day_list_str +
-                       "\n\n_Note:_\nAngka di sebelah nama hari menunjukkan jumlah tugas pada hari tersebut.\nKetik angka pilihan.\nKetik 0 untuk ke Pilihan Kelas.")
+                       "\n\n_Note:_\nAngka di sebelah nama hari menunjukkan jumlah tugas pada hari tersebut.\nKetik angka pilihan.\n"
+                       f"Ketik upcoming untuk melihat semua tugas {UPCOMING_DAYS} hari ke depan.\nKetik cari <kata> untuk mencari tugas.\nKetik 0 untuk ke Pilihan Kelas.")
             notification.answer(message)
             return True
         except Exception as e:
@@ -131,12 +143,14 @@ class TaskHandler:
             notification.answer(prefix_message + "Error menampilkan pilihan hari dengan detail tugas.")
             return False
 
-    def _display_task_list_menu(self, notification, tasks_data, day_name, prefix_message=""):
-        logger.info(f"_display_task_list_menu: Called for {notification.sender} for day {day_name}")
+    def _display_task_list_menu(self, notification, tasks_data, day_name, prefix_message="", page=0, total=None):
+        logger.info(f"_display_task_list_menu: Called for {notification.sender} for day {day_name}, page {page}")
         tasks_list_display = []
         for idx, task in enumerate(tasks_data, 1):
             task_name = task.get('name', 'N/A')
-            task_description = task.get('description', 'N/A')
+            task_description = task.get('description') or 'N/A'
+            if len(task_description) > TASK_LIST_DESCRIPTION_MAX_CHARS:
+                task_description = task_description[:TASK_LIST_DESCRIPTION_MAX_CHARS].rstrip() + "…"
             task_due_iso = task.get('due_date')
             due_date_display = "N/A"
             if task_due_iso:
@@ -145,11 +159,57 @@ class TaskHandler:
                 due_date_display = due_date_wib.strftime('%d/%m/%Y %H:%M WIB')
             tasks_list_display.append(f"{idx}. {task_name}\n🗒️ {task_description}\n⏰ {due_date_display}")
 
-        message = (prefix_message + f"📚 *Tugas untuk hari {day_name}*:\n\n" +
+        total_pages = max(-(-(total or 0) // TASK_PAGE_SIZE), 1)
+        page_header = f" (Halaman {page + 1}/{total_pages})" if total_pages > 1 else ""
+        navigation_note = ""
+        if page + 1 < total_pages:
+            navigation_note += "Ketik n untuk halaman berikutnya.\n"
+        if page > 0:
+            navigation_note += "Ketik p untuk halaman sebelumnya.\n"
+
+        if is_stale(tasks_data):
+            prefix_message += STALE_DATA_NOTE
+        message = (prefix_message + f"📚 *Tugas untuk hari {day_name}*{page_header}:\n\n" +
                    "\n\n".join(tasks_list_display) +
-                   "\n\n_Note:_\nKetik angka tugas untuk detail & reminder.\nKetik 0 untuk kembali ke Pilihan Hari.")
+                   "\n\n_Note:_\nKetik angka tugas untuk detail & reminder.\n" + navigation_note +
+                   "Ketik 0 untuk kembali ke Pilihan Hari.")
         notification.answer(message)
 
+    def _fetch_task_page(self, class_id: int, day_id: int, page: int):
+        """Fetch one page of tasks for a class/day. Returns (tasks, total_count, error)."""
+        try:
+            tasks_data, total = repository.task_page(class_id, day_id, page * TASK_PAGE_SIZE, TASK_PAGE_SIZE)
+        except RepositoryError as e:
+            return [], 0, e
+        return tasks_data, total, None
+
+    def _fetch_upcoming_tasks(self, class_id: int):
+        """Tasks for a class due within UPCOMING_DAYS, served from the shared per-class cache."""
+        tasks_data = upcoming_tasks_cache.get_or_load(class_id, lambda: load_upcoming_tasks(class_id))
+        if is_stale(tasks_data):
+            upcoming_tasks_cache.invalidate(class_id) # Jangan simpan data lama; coba Supabase lagi di permintaan berikutnya
+        return tasks_data
+
+    def _display_upcoming_tasks(self, notification, class_id: int, tasks_data):
+        now_wib = datetime.now(indonesia_tz)
+        lines = []
+        for task in tasks_data:
+            due_date_wib = datetime.fromisoformat(task['due_date'].replace('Z', '+00:00')).astimezone(indonesia_tz)
+            if due_date_wib < now_wib: # Cache bisa berumur beberapa menit, lewati yang sudah lewat deadline
+                continue
+            lines.append(
+                f"{len(lines) + 1}. {task.get('name', 'N/A')} ({(task.get('jenis_tugas') or 'N/A').capitalize()})\n"
+                f"⏰ {reference_cache.day_name(task.get('day_id'))}, {due_date_wib.strftime('%d/%m/%Y %H:%M WIB')}"
+            )
+        class_name = reference_cache.class_name(class_id)
+        stale_note = STALE_DATA_NOTE if is_stale(tasks_data) else ""
+        if not lines:
+            notification.answer(stale_note + f"📭 Yeay! Tidak ada tugas untuk kelas {class_name} dalam {UPCOMING_DAYS} hari ke depan.")
+            return
+        notification.answer(
+            stale_note + f"📅 *Tugas {UPCOMING_DAYS} hari ke depan — {class_name}:*\n\n" + "\n\n".join(lines) +
+            "\n\n_Note:_\nPilih hari lewat menu Lihat Tugas untuk detail & reminder.\nKetik menu untuk ke Menu Utama."
+        )
 
     def _display_task_detail_menu(self, notification, task_data, prefix_message=""):
         logger.info(f"_display_task_detail_menu: Displaying detail for task: {task_data.get('name')}")
@@ -174,6 +234,22 @@ class TaskHandler:
     def setup_handlers(self):
         logger.info("TaskHandler: Setting up message handlers.")
 
+        def upcoming_command_handler(notification):
+            self.upcoming_handler(notification)
+
+        def search_command_handler(notification):
+            self.search_handler(notification)
+
+        # Didaftarkan per state (bukan global) agar teks perintah di form admin tidak ikut tertangkap
+        for state in (None, States.INITIAL, States.CLASS_SELECTION, States.DAY_SELECTION,
+                      States.TASK_LIST, States.NOTIFICATION_SETUP):
+            self.bot.router.message(
+                type_message="textMessage", state=state, regexp=r"(?i)^\s*upcoming(\s+\d+)?\s*$"
+            )(upcoming_command_handler)
+            self.bot.router.message(
+                type_message="textMessage", state=state, regexp=r"(?is)^\s*cari\s+.+$"
+            )(search_command_handler)
+
         @self.bot.router.message(type_message="textMessage", state=States.CLASS_SELECTION)
         def class_selection_state_handler(notification):
             logger.info(f"CLASS_SELECTION_STATE_HANDLER: Received '{notification.message_text}' from {notification.sender}")
@@ -216,6 +292,10 @@ class TaskHandler:
                         self.start_flow_handler(notification)
                 else:
                     self.start_flow_handler(notification) # Fallback jika class_id tidak ada
+            elif notification.message_text.strip().lower() in ("n", "next"):
+                self.task_page_handler(notification, 1)
+            elif notification.message_text.strip().lower() in ("p", "prev"):
+                self.task_page_handler(notification, -1)
             elif notification.message_text.isdigit():
                 tasks = state_data.get("tasks", [])
                 try:
@@ -241,8 +321,8 @@ class TaskHandler:
                 day_name = "hari terpilih" # Default
                 
                 if selected_day_id: # coba dapatkan nama hari jika ada day_id
-                    day_name_resp = supabase.table('days').select('name').eq('id', int(selected_day_id)).maybe_single().execute()
-                    if day_name_resp.data: day_name = day_name_resp.data['name']
+                    day_row = repository.day(int(selected_day_id))
+                    if day_row: day_name = day_row['name']
 
                 if tasks_in_state and selected_day_id and selected_class_id:
                      notification.state_manager.update_state_data(
@@ -251,7 +331,8 @@ class TaskHandler:
                             "selected_class_id": selected_class_id, "state_history": state_data.get("state_history",[]),
                             "selected_task": None # Reset selected_task
                         })
-                     self._display_task_list_menu(notification, tasks_in_state, day_name)
+                     self._display_task_list_menu(notification, tasks_in_state, day_name,
+                                                  page=state_data.get("task_page", 0), total=state_data.get("task_total"))
                      update_state_with_history(notification, States.TASK_LIST)
                 else:
                     # Fallback jika data tidak lengkap untuk kembali ke list tugas
@@ -292,17 +373,21 @@ class TaskHandler:
 
                     if records_to_insert:
                         logger.info(f"Attempting to insert {len(records_to_insert)} notification records.")
-                        response = supabase.table('notifications').insert(records_to_insert).execute()
-
-                        if hasattr(response, 'error') and response.error:
-                            logger.error(f"Supabase error saving notifications: {response.error}")
-                            notification.answer(f"❌ *Gagal menyimpan notifikasi ke DB*\nError: {response.error.message if hasattr(response.error, 'message') else response.error}")
-                        elif response.data:
+                        try:
+                            saved_notifications = repository.insert_notifications(records_to_insert)
+                            save_error = None
+                        except RepositoryError as e:
+                            saved_notifications, save_error = None, e
+
+                        if save_error:
+                            logger.error(f"Supabase error saving notifications: {save_error}")
+                            notification.answer(f"❌ *Gagal menyimpan notifikasi ke DB*\nError: {save_error}")
+                        elif saved_notifications:
                             logger.info(f"Reminders successfully set for task ID {task['id']}.")
                             notification.answer(f"✅ *Reminder berhasil diatur!*\n\nKamu akan menerima reminder untuk tugas:\n📝 {task.get('name', 'N/A')}\n\nReminder akan dikirim pada jadwalnya.")
                             self._display_initial_menu(notification) # Kembali ke menu awal setelah sukses
                         else:
-                            logger.warning(f"Failed to save notifications, no data/error in response: {response}")
+                            logger.warning("Failed to save notifications, insert returned no rows")
                             notification.answer("❌ *Gagal menyimpan notifikasi (DB issue)*\nSilakan coba lagi.")
                     else:
                         logger.error("No notification records generated to insert.")
@@ -340,6 +425,7 @@ class TaskHandler:
         # Update state dengan class_id yang baru dipilih, reset state berikutnya dalam alur
         updated_flow_data = {
             "selected_class_id": selected_class_id_str,
+            "last_class_id": selected_class_id_str, # Diingat untuk perintah "upcoming"
             "state_history": history,
             "selected_day_id": None, # Reset pilihan hari
             "tasks": None,           # Reset daftar tugas
@@ -374,17 +460,13 @@ class TaskHandler:
                 return
 
             logger.info(f"DAY_SELECTION_HANDLER: Querying tasks for class_id: {class_id_for_query}, day_id: {day_id_for_query}")
-            day_name_response = supabase.table('days').select('name').eq('id', day_id_for_query).maybe_single().execute()
-            day_name = day_name_response.data['name'] if day_name_response.data else f"ID Hari {day_id_for_query}"
+            day_row = repository.day(day_id_for_query)
+            day_name = day_row['name'] if day_row else f"ID Hari {day_id_for_query}"
 
-            tasks_response = supabase.table('tasks') \
-                .select('id, name, description, due_date, jenis_tugas, class_id, day_id') \
-                .eq('class_id', class_id_for_query) \
-                .eq('day_id', day_id_for_query) \
-                .order('due_date').execute()
+            tasks_data, tasks_total, tasks_error = self._fetch_task_page(class_id_for_query, day_id_for_query, 0)
 
-            if hasattr(tasks_response, 'error') and tasks_response.error:
-                logger.error(f"DAY_SELECTION_HANDLER: Supabase error fetching tasks: {tasks_response.error}")
+            if tasks_error:
+                logger.error(f"DAY_SELECTION_HANDLER: Supabase error fetching tasks: {tasks_error}")
                 notification.answer("Error mengambil daftar tugas dari database.")
                 # Pertimbangkan untuk kembali ke menu pemilihan hari atau kelas
                 if self._display_day_selection_menu(notification): # Coba tampilkan menu hari lagi
@@ -393,8 +475,7 @@ class TaskHandler:
                     self.start_flow_handler(notification)
                 return
 
-            tasks_data = tasks_response.data
-            logger.info(f"DAY_SELECTION_HANDLER: Found {len(tasks_data)} tasks for class {class_id_for_query} day {day_id_for_query}.")
+            logger.info(f"DAY_SELECTION_HANDLER: Found {tasks_total} tasks for class {class_id_for_query} day {day_id_for_query}, showing {len(tasks_data)}.")
 
             if not tasks_data:
                 notification.answer(f"📭 Yeay! Tidak ada tugas untuk kelas yang dipilih pada hari {day_name}.")
@@ -417,14 +498,16 @@ class TaskHandler:
             history = state_data.get("state_history", [])
             notification.state_manager.update_state_data(
                 notification.sender, {
-                    "tasks": tasks_data,
+                    "tasks": tasks_data, # Hanya halaman yang sedang tampil yang disimpan di state
+                    "task_page": 0,
+                    "task_total": tasks_total,
                     "selected_day_id": selected_day_id_str, # Simpan hari yang dipilih
                     "selected_class_id": selected_class_id_str, # Pastikan class_id tetap ada
                     "state_history": history,
                     "selected_task": None # Reset selected_task karena baru memilih hari
                 })
             logger.info(f"DAY_SELECTION_HANDLER: State updated with {len(tasks_data)} tasks for {notification.sender}.")
-            self._display_task_list_menu(notification, tasks_data, day_name)
+            self._display_task_list_menu(notification, tasks_data, day_name, page=0, total=tasks_total)
             update_state_with_history(notification, States.TASK_LIST)
 
         except Exception as e:
@@ -433,6 +516,112 @@ class TaskHandler:
             # Pertimbangkan fallback yang lebih aman, misal kembali ke menu awal
             self.start_flow_handler(notification)
 
+    def upcoming_handler(self, notification):
+        """Show every task of the user's class due in the next UPCOMING_DAYS days."""
+        parts = notification.message_text.split()
+        state_data = notification.state_manager.get_state_data(notification.sender) or {}
+        class_id_str = parts[1] if len(parts) > 1 else (state_data.get("selected_class_id") or state_data.get("last_class_id"))
+        logger.info(f"UPCOMING_HANDLER: {notification.sender} requested upcoming tasks for class '{class_id_str}'")
+        if not class_id_str:
+            class_list = "\n".join(f"{item['id']}. {item['name']}" for item in reference_cache.classes())
+            notification.answer(
+                "ℹ️ Kelasmu belum diketahui.\n\nKetik upcoming diikuti angka kelas, contoh: *upcoming 1*\n\n" + class_list
+            )
+            return
+        try:
+            tasks_data = self._fetch_upcoming_tasks(int(class_id_str))
+        except Exception as e:
+            logger.error(f"UPCOMING_HANDLER: Exception: {e}", exc_info=True)
+            tasks_data = None
+        if tasks_data is None:
+            notification.answer("Error mengambil daftar tugas dari database.")
+            return
+        if notification.state_manager.get_state(notification.sender) is None:
+            notification.state_manager.update_state(notification.sender, States.INITIAL) # Agar kelas bisa diingat
+        notification.state_manager.update_state_data(notification.sender, {"last_class_id": class_id_str})
+        self._display_upcoming_tasks(notification, int(class_id_str), tasks_data)
+
+    def search_handler(self, notification):
+        """Answer "cari <kata>" from the in-memory task index of the user's class."""
+        query = notification.message_text.strip()[4:].strip()
+        state_data = notification.state_manager.get_state_data(notification.sender) or {}
+        class_id_str = state_data.get("selected_class_id") or state_data.get("last_class_id")
+        logger.info(f"SEARCH_HANDLER: {notification.sender} searched '{query}' in class '{class_id_str}'")
+        if not class_id_str:
+            notification.answer(
+                "ℹ️ Kelasmu belum diketahui.\n\nPilih kelas lewat menu Lihat Tugas atau ketik *upcoming <angka kelas>* terlebih dahulu, lalu cari lagi."
+            )
+            return
+        try:
+            results = task_search_index.search(int(class_id_str), query, limit=SEARCH_MAX_RESULTS)
+        except Exception as e:
+            logger.error(f"SEARCH_HANDLER: Exception: {e}", exc_info=True)
+            results = None
+        if results is None:
+            notification.answer("Error mengambil daftar tugas dari database.")
+            return
+        class_name = reference_cache.class_name(class_id_str)
+        if not results:
+            notification.answer(f"🔍 Tidak ada tugas di kelas {class_name} yang cocok dengan \"{query}\".")
+            return
+
+        lines = []
+        now_wib = datetime.now(indonesia_tz)
+        for idx, task in enumerate(results, 1):
+            due_date_display = "N/A"
+            if task.get('due_date'):
+                due_date_wib = datetime.fromisoformat(task['due_date'].replace('Z', '+00:00')).astimezone(indonesia_tz)
+                due_date_display = f"{reference_cache.day_name(task.get('day_id'))}, {due_date_wib.strftime('%d/%m/%Y %H:%M WIB')}"
+                if due_date_wib < now_wib:
+                    due_date_display += " (sudah lewat)"
+            lines.append(f"{idx}. {task.get('name', 'N/A')} ({(task.get('jenis_tugas') or 'N/A').capitalize()})\n⏰ {due_date_display}")
+        notification.answer(
+            f"🔍 *Hasil pencarian \"{query}\" — {class_name}:*\n\n" + "\n\n".join(lines) +
+            "\n\n_Note:_\nPilih hari lewat menu Lihat Tugas untuk detail & reminder.\nKetik menu untuk ke Menu Utama."
+        )
+
+    def task_page_handler(self, notification, step: int):
+        """Move the task list one page forward or back, fetching only that page."""
+        state_data = notification.state_manager.get_state_data(notification.sender) or {}
+        selected_class_id_str = state_data.get("selected_class_id")
+        selected_day_id_str = state_data.get("selected_day_id")
+        if not selected_class_id_str or not selected_day_id_str:
+            logger.error(f"TASK_PAGE_HANDLER: class/day missing in state for {notification.sender}. Redirecting to start.")
+            self.start_flow_handler(notification)
+            return
+
+        current_page = state_data.get("task_page", 0)
+        total = state_data.get("task_total") or 0
+        last_page = max((total - 1) // TASK_PAGE_SIZE, 0)
+        new_page = current_page + step
+        day_name = reference_cache.day_name(selected_day_id_str)
+        if not (0 <= new_page <= last_page):
+            self._display_task_list_menu(
+                notification, state_data.get("tasks") or [], day_name,
+                prefix_message="⚠️ *Tidak ada halaman lagi ke arah itu.*\n\n", page=current_page, total=total
+            )
+            return
+
+        try:
+            tasks_data, tasks_total, tasks_error = self._fetch_task_page(
+                int(selected_class_id_str), int(selected_day_id_str), new_page
+            )
+        except Exception as e:
+            logger.error(f"TASK_PAGE_HANDLER: Exception: {e}", exc_info=True)
+            tasks_data, tasks_total, tasks_error = [], 0, e
+        if tasks_error or not tasks_data:
+            logger.error(f"TASK_PAGE_HANDLER: Failed to fetch page {new_page}: {tasks_error}")
+            notification.answer("Error mengambil daftar tugas dari database.")
+            return
+
+        notification.state_manager.update_state_data(notification.sender, {
+            "tasks": tasks_data,
+            "task_page": new_page,
+            "task_total": tasks_total,
+            "selected_task": None
+        })
+        self._display_task_list_menu(notification, tasks_data, day_name, page=new_page, total=tasks_total)
+
     def task_detail_handler(self, notification):
         selected_task_index_str = notification.message_text
         logger.info(f"TASK_DETAIL_HANDLER: User {notification.sender} selected task index str '{selected_task_index_str}'")
@@ -461,9 +650,10 @@ class TaskHandler:
                 day_id_for_name = state_data.get("selected_day_id")
                 day_name_for_list = "hari terpilih"
                 if day_id_for_name:
-                    day_name_resp = supabase.table('days').select('name').eq('id', int(day_id_for_name)).maybe_single().execute()
-                    if day_name_resp.data: day_name_for_list = day_name_resp.data['name']
-                self._display_task_list_menu(notification, tasks_in_state, day_name_for_list)
+                    day_row = repository.day(int(day_id_for_name))
+                    if day_row: day_name_for_list = day_row['name']
+                self._display_task_list_menu(notification, tasks_in_state, day_name_for_list,
+                                              page=state_data.get("task_page", 0), total=state_data.get("task_total"))
                 # State tetap TASK_LIST karena hanya menampilkan ulang menu
                 # update_state_with_history(notification, States.TASK_LIST) # Tidak perlu update state karena sudah di TASK_LIST
                 return
@@ -514,13 +704,14 @@ class TaskHandler:
             day_name = "hari terpilih"
             if day_id:
                 try:
-                    day_resp = supabase.table('days').select('name').eq('id', int(day_id)).maybe_single().execute()
-                    if day_resp.data: day_name = day_resp.data['name']
+                    day_row = repository.day(int(day_id))
+                    if day_row: day_name = day_row['name']
                 except ValueError: # Jika day_id tidak bisa di-cast ke int
                      logger.error(f"SHOW_INVALID_MESSAGE: Invalid day_id '{day_id}' in state for TASK_LIST.")
 
             if tasks:
-                self._display_task_list_menu(notification, tasks, day_name, prefix_message=prefix)
+                self._display_task_list_menu(notification, tasks, day_name, prefix_message=prefix,
+                                              page=state_data.get("task_page", 0), total=state_data.get("task_total"))
             else:
                 # Jika tidak ada tasks, coba kembali ke menu pemilihan hari
                 logger.warning("SHOW_INVALID_MESSAGE: No tasks in state for TASK_LIST. Attempting to show day selection.")
@@ -541,13 +732,14 @@ class TaskHandler:
                 day_name_for_list_fallback = "hari terpilih"
                 if day_id_for_list:
                     try:
-                        day_name_resp_fallback = supabase.table('days').select('name').eq('id', int(day_id_for_list)).maybe_single().execute()
-                        if day_name_resp_fallback.data: day_name_for_list_fallback = day_name_resp_fallback.data['name']
+                        day_row = repository.day(int(day_id_for_list))
+                        if day_row: day_name_for_list_fallback = day_row['name']
                     except ValueError:
                         logger.error(f"SHOW_INVALID_MESSAGE: Invalid day_id '{day_id_for_list}' in state for NOTIFICATION_SETUP fallback.")
 
                 if tasks_in_state:
-                    self._display_task_list_menu(notification, tasks_in_state, day_name_for_list_fallback, prefix_message=prefix + "Detail tugas tidak ditemukan. ")
+                    self._display_task_list_menu(notification, tasks_in_state, day_name_for_list_fallback, prefix_message=prefix + "Detail tugas tidak ditemukan. ",
+                                              page=state_data.get("task_page", 0), total=state_data.get("task_total"))
                     update_state_with_history(notification, States.TASK_LIST) # Pastikan state kembali ke TASK_LIST
                 else:
                     notification.answer(prefix + "Detail tugas tidak ditemukan dan daftar tugas juga kosong.")
@@ -0,0 +1,80 @@
+# src/health.py
+import json
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+from .config import HEALTH_HOST, HEALTH_PORT
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Nama -> fungsi yang mengembalikan True jika komponen siap melayani
+_readiness_checks: Dict[str, Callable[[], bool]] = {}
+
+def register_readiness_check(name: str, check: Callable[[], bool]) -> None:
+    _readiness_checks[name] = check
+
+def readiness() -> Dict[str, bool]:
+    results = {}
+    for name, check in list(_readiness_checks.items()):
+        try:
+            results[name] = bool(check())
+        except Exception as e:
+            logger.warning(f"Readiness check '{name}' raised: {e}")
+            results[name] = False
+    return results
+
+
+class _HealthRequestHandler(BaseHTTPRequestHandler):
+    server_version = "CrealertHealth/1.0"
+
+    def _reply(self, status: int, body: str, content_type: str) -> None:
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/healthz":
+            self._reply(200, "ok\n", "text/plain; charset=utf-8")
+        elif path == "/readyz":
+            checks = readiness()
+            ready = all(checks.values())
+            self._reply(200 if ready else 503, json.dumps({"ready": ready, "checks": checks}) + "\n", "application/json")
+        elif path == "/metrics":
+            self._reply(200, registry.render(), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._reply(404, "not found\n", "text/plain; charset=utf-8")
+
+    def log_message(self, format, *args):
+        # Probe Render datang tiap beberapa detik; jangan penuhi log INFO
+        logger.debug(f"Health server: {self.address_string()} {format % args}")
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+def start_health_server(host: str = HEALTH_HOST, port: int = HEALTH_PORT) -> Optional[ThreadingHTTPServer]:
+    """Serve /healthz, /readyz and /metrics from a daemon thread. Returns None if the port is unavailable."""
+    global _server
+    if _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), _HealthRequestHandler)
+    except OSError as e:
+        logger.error(f"Health server: Cannot bind {host}:{port} ({e}). Health and metrics endpoints disabled.")
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="HealthServerThread", daemon=True).start()
+    logger.info(f"Health server listening on {host}:{port} (/healthz, /readyz, /metrics).")
+    return _server
+
+def stop_health_server() -> None:
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
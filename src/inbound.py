@@ -0,0 +1,236 @@
+# src/inbound.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional
+from .config import (
+    INBOUND_DEDUP_WINDOW_SECONDS, INBOUND_DEDUP_MAX_IDS, INBOUND_DEDUP_PATH,
+    INBOUND_RATE_PER_SECOND, INBOUND_BURST, INBOUND_DEBOUNCE_SECONDS, INBOUND_MAX_SENDERS
+)
+from .sender_pool import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+def event_id(event: dict) -> Optional[str]:
+    """Stable id of an incoming GreenAPI webhook body: idMessage, or a hash of the body as fallback."""
+    message_id = event.get("idMessage")
+    if message_id:
+        return f"{event.get('typeWebhook')}:{message_id}"
+    if not event.get("typeWebhook"):
+        return None
+    body = json.dumps(event, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{event['typeWebhook']}:sha1:{hashlib.sha1(body.encode('utf-8')).hexdigest()}"
+
+
+class RecentIdSet:
+    """Bounded set of ids seen within `window_seconds`, evicting the oldest first."""
+    def __init__(self, window_seconds: float = INBOUND_DEDUP_WINDOW_SECONDS, max_entries: int = INBOUND_DEDUP_MAX_IDS):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._seen and (len(self._seen) > self.max_entries or next(iter(self._seen.values())) < cutoff):
+            self._seen.popitem(last=False)
+
+    def add_if_new(self, item_id: str) -> bool:
+        """Remember `item_id`. Returns False if it was already seen inside the window."""
+        now = time.time()
+        with self._lock:
+            seen_at = self._seen.get(item_id)
+            if seen_at is not None and seen_at >= now - self.window_seconds:
+                return False
+            self._seen[item_id] = now
+            self._seen.move_to_end(item_id)
+            self._prune(now)
+        self._persist(item_id, now)
+        return True
+
+    def discard(self, item_id: str) -> None:
+        """Forget `item_id`, so its next delivery is treated as new."""
+        with self._lock:
+            self._seen.pop(item_id, None)
+        self._unpersist(item_id)
+
+    def _persist(self, item_id: str, seen_at: float) -> None:
+        pass
+
+    def _unpersist(self, item_id: str) -> None:
+        pass
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._seen)
+
+
+class PersistentIdSet(RecentIdSet):
+    """RecentIdSet backed by SQLite, so ids seen before a restart are still recognized."""
+    def __init__(self, path: str, window_seconds: float = INBOUND_DEDUP_WINDOW_SECONDS,
+                 max_entries: int = INBOUND_DEDUP_MAX_IDS):
+        super().__init__(window_seconds, max_entries)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS inbound_seen (id TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+        cutoff = time.time() - window_seconds
+        self._conn.execute("DELETE FROM inbound_seen WHERE seen_at < ?", (cutoff,))
+        rows = self._conn.execute(
+            "SELECT id, seen_at FROM inbound_seen ORDER BY seen_at DESC LIMIT ?", (max_entries,)
+        ).fetchall()
+        for item_id, seen_at in reversed(rows):
+            self._seen[item_id] = seen_at
+        self._writes = 0
+        logger.info(f"PersistentIdSet: Loaded {len(rows)} recent inbound ids from {path}.")
+
+    def _persist(self, item_id: str, seen_at: float) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO inbound_seen (id, seen_at) VALUES (?, ?)", (item_id, seen_at))
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._conn.execute("DELETE FROM inbound_seen WHERE seen_at < ?", (seen_at - self.window_seconds,))
+
+    def _unpersist(self, item_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM inbound_seen WHERE id = ?", (item_id,))
+
+
+class InboundDeduplicator:
+    """Drops redelivered GreenAPI notifications before they reach the router."""
+    def __init__(self, seen_ids: RecentIdSet):
+        self.seen_ids = seen_ids
+        self.duplicates = 0
+
+    def should_route(self, event: dict) -> bool:
+        item_id = event_id(event)
+        if item_id is None or self.seen_ids.add_if_new(item_id):
+            return True
+        self.duplicates += 1
+        sender = (event.get("senderData") or {}).get("chatId")
+        logger.info(f"InboundDeduplicator: Skipping duplicate {item_id} from {sender} (total duplicates: {self.duplicates}).")
+        return False
+
+    def forget(self, event: dict) -> None:
+        """Un-record an event whose handling failed, so GreenAPI's redelivery is routed again."""
+        item_id = event_id(event)
+        if item_id is not None:
+            self.seen_ids.discard(item_id)
+
+
+THROTTLED_REPLY = "⏳ *Pelan-pelan ya!* Pesanmu terlalu cepat. Tunggu sebentar, lalu kirim lagi pilihanmu."
+
+
+class _SenderState:
+    __slots__ = ("bucket", "last_key", "last_at", "warned")
+
+    def __init__(self, rate: float, burst: int):
+        self.bucket = TokenBucket(rate, burst)
+        self.last_key = None
+        self.last_at = 0.0
+        self.warned = False
+
+
+class SenderThrottle:
+    """Per-sender token bucket plus debounce of identical rapid messages.
+
+    Pesan identik dari pengirim yang sama dalam `debounce_seconds` dianggap satu
+    (misal "0" yang terkirim berkali-kali). Pengirim yang melewati rate limit
+    hanya mendapat satu balasan THROTTLED_REPLY yang sudah jadi, tanpa query DB,
+    sampai token bucket-nya terisi lagi.
+    """
+    def __init__(self, rate_per_second: float = INBOUND_RATE_PER_SECOND, burst: int = INBOUND_BURST,
+                 debounce_seconds: float = INBOUND_DEBOUNCE_SECONDS, max_senders: int = INBOUND_MAX_SENDERS):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.debounce_seconds = debounce_seconds
+        self.max_senders = max_senders
+        self._senders: "OrderedDict[str, _SenderState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.debounced = 0
+        self.throttled = 0
+
+    def _state_for(self, sender: str) -> _SenderState:
+        with self._lock:
+            state = self._senders.get(sender)
+            if state is None:
+                state = _SenderState(self.rate_per_second, self.burst)
+                self._senders[sender] = state
+                if len(self._senders) > self.max_senders:
+                    self._senders.popitem(last=False)
+            else:
+                self._senders.move_to_end(sender)
+            return state
+
+    def check(self, event: dict) -> Optional[str]:
+        """Return None to route the event, "debounced"/"throttled" to drop it, or "warn" to drop and reply once."""
+        if event.get("typeWebhook") != "incomingMessageReceived":
+            return None
+        sender = (event.get("senderData") or {}).get("chatId")
+        if not sender:
+            return None
+        state = self._state_for(sender)
+        now = time.monotonic()
+        message_key = json.dumps(event.get("messageData"), sort_keys=True, ensure_ascii=False, default=str)
+        if message_key == state.last_key and now - state.last_at < self.debounce_seconds:
+            state.last_at = now
+            self.debounced += 1
+            return "debounced"
+        state.last_key = message_key
+        state.last_at = now
+        if state.bucket.try_acquire():
+            state.warned = False
+            return None
+        self.throttled += 1
+        if state.warned:
+            return "throttled"
+        state.warned = True
+        logger.info(f"SenderThrottle: Throttling {sender} (total throttled: {self.throttled}).")
+        return "warn"
+
+
+def install_inbound_throttle(router, throttle: Optional[SenderThrottle] = None) -> SenderThrottle:
+    """Wrap `router.route_event` with per-sender throttling; throttled senders get one cheap reply."""
+    throttle = throttle or SenderThrottle()
+    route_event = router.route_event
+
+    def route_event_throttled(event: dict) -> None:
+        verdict = throttle.check(event)
+        if verdict is None:
+            route_event(event)
+        elif verdict == "warn":
+            router.api.sending.sendMessage(event["senderData"]["chatId"], THROTTLED_REPLY)
+
+    router.route_event = route_event_throttled
+    return throttle
+
+
+def build_deduplicator(path: Optional[str] = INBOUND_DEDUP_PATH) -> InboundDeduplicator:
+    if path:
+        try:
+            return InboundDeduplicator(PersistentIdSet(path))
+        except sqlite3.Error as e:
+            logger.error(f"InboundDeduplicator: Cannot open {path} ({e}). Falling back to in-memory dedup.")
+    return InboundDeduplicator(RecentIdSet())
+
+def install_inbound_dedup(router, deduplicator: Optional[InboundDeduplicator] = None) -> InboundDeduplicator:
+    """Wrap `router.route_event` so duplicate notifications are skipped before any handler runs."""
+    deduplicator = deduplicator or build_deduplicator()
+    route_event = router.route_event
+
+    def route_event_once(event: dict) -> None:
+        if not deduplicator.should_route(event):
+            return
+        try:
+            route_event(event)
+        except BaseException:
+            # run_forever tidak menghapus notifikasi yang gagal, jadi GreenAPI mengirimnya ulang: jangan dianggap duplikat
+            deduplicator.forget(event)
+            raise
+
+    router.route_event = route_event_once
+    return deduplicator
@@ -0,0 +1,104 @@
+# src/instrumentation.py
+import time
+import logging
+from functools import wraps
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+handler_latency_seconds = registry.histogram(
+    "crealert_handler_latency_seconds", "Routed message handler latency by conversation state and handler."
+)
+supabase_call_seconds = registry.histogram(
+    "crealert_supabase_call_seconds", "Supabase query latency by table and operation."
+)
+slow_operations_total = registry.counter(
+    "crealert_slow_operations_total", "Handlers and Supabase calls slower than their threshold."
+)
+
+# Method builder PostgREST yang menentukan jenis operasi; method lain (eq, order, ...) hanya filter
+_OPERATIONS = frozenset(("select", "insert", "update", "upsert", "delete"))
+
+
+def install_handler_timing(router, slow_seconds: float) -> int:
+    """Wrap every handler registered on `router.message` so each call is timed by state.
+
+    Dipanggil sekali setelah semua handler terdaftar; handler yang ditambahkan setelahnya
+    tidak diukur. Returns the number of handlers wrapped.
+    """
+    wrapped = 0
+    for handler in router.message.handlers:
+        if getattr(handler.handler, "_timed", False):
+            continue
+        handler.handler = _timed_handler(handler.handler, handler.filters.get("state"), slow_seconds)
+        wrapped += 1
+    return wrapped
+
+def _timed_handler(handler, state, slow_seconds: float):
+    state_label = str(state) if state is not None else "none"
+    name = getattr(handler, "__name__", "handler")
+
+    @wraps(handler)
+    def timed(notification):
+        started = time.perf_counter()
+        try:
+            return handler(notification)
+        finally:
+            elapsed = time.perf_counter() - started
+            handler_latency_seconds.observe(elapsed, state=state_label, handler=name)
+            if elapsed >= slow_seconds:
+                slow_operations_total.inc(kind="handler")
+                logger.warning(
+                    "Slow handler %s (state %s) for %s: %.0f ms",
+                    name, state_label, notification.sender, elapsed * 1000
+                )
+    timed._timed = True
+    return timed
+
+
+class _TimedQuery:
+    """Proxy around a PostgREST request builder that times `execute()`."""
+    __slots__ = ("_builder", "_table", "_operation", "_slow_seconds")
+
+    def __init__(self, builder, table: str, operation: str, slow_seconds: float):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+        self._slow_seconds = slow_seconds
+
+    def __getattr__(self, name):
+        attribute = getattr(self._builder, name)
+        if not callable(attribute):
+            return attribute
+        operation = name if name in _OPERATIONS else self._operation
+
+        def chained(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _TimedQuery(result, self._table, operation, self._slow_seconds)
+            return result
+        return chained
+
+    def execute(self):
+        started = time.perf_counter()
+        try:
+            return self._builder.execute()
+        finally:
+            elapsed = time.perf_counter() - started
+            supabase_call_seconds.observe(elapsed, table=self._table, operation=self._operation)
+            if elapsed >= self._slow_seconds:
+                slow_operations_total.inc(kind="supabase")
+                logger.warning("Slow Supabase %s on %s: %.0f ms", self._operation, self._table, elapsed * 1000)
+
+
+class InstrumentedSupabase:
+    """Supabase client wrapper that times every `table(...)...execute()` call by table and operation."""
+    def __init__(self, client, slow_seconds: float):
+        self._client = client
+        self._slow_seconds = slow_seconds
+
+    def table(self, name: str):
+        return _TimedQuery(self._client.table(name), name, "select", self._slow_seconds)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
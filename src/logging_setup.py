@@ -0,0 +1,76 @@
+# src/logging_setup.py
+import atexit
+import itertools
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from .config import LOG_LEVEL, LOG_LEVELS, LOG_ITEM_SAMPLE_EVERY
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[QueueListener] = None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    QueueHandler bawaan mem-format pesan di thread pemanggil; di sini hanya
+    traceback yang dirender lebih dulu, sisanya (msg % args) di thread listener.
+    """
+    _exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Pass one in `every` records; WARNING and above always pass."""
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(every, 1)
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or next(self._counter) % self.every == 0
+
+
+def configure_logging(level: str = LOG_LEVEL, module_levels: Dict[str, str] = LOG_LEVELS) -> None:
+    """Route all records through a queue drained by a background listener thread.
+
+    Handler yang sudah terpasang di root (misalnya dari basicConfig) dipindah ke listener,
+    jadi thread bot dan event loop worker tidak pernah menunggu I/O log.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    root = logging.getLogger()
+    handlers = [handler for handler in root.handlers if not isinstance(handler, QueueHandler)] or [logging.StreamHandler()]
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    root.handlers = [_DeferredQueueHandler(log_queue)]
+    root.setLevel(level)
+    for module_name, module_level in module_levels.items():
+        logging.getLogger(module_name).setLevel(module_level.upper())
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def item_logger(name: str, every: int = LOG_ITEM_SAMPLE_EVERY) -> logging.Logger:
+    """Child logger `<name>.items` for per-item logs, sampled to one in `every` records."""
+    logger = logging.getLogger(f"{name}.items")
+    if not any(isinstance(existing, SamplingFilter) for existing in logger.filters):
+        logger.addFilter(SamplingFilter(every))
+    return logger
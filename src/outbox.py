@@ -0,0 +1,362 @@
+# src/outbox.py
+import argparse
+import sqlite3
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from .config import (
+    OUTBOX_PATH, OUTBOX_BATCH_SIZE, OUTBOX_SEND_RATE_PER_SECOND, OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETRY_BASE_SECONDS, OUTBOX_IDLE_POLL_SECONDS, OUTBOX_ROUTE_REPLIES,
+    WORKER_SEND_ERROR_WINDOW, WORKER_SEND_MAX_ERROR_RATE
+)
+from .metrics import send_latency_seconds, sends_total
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id TEXT NOT NULL,
+    message TEXT NOT NULL,
+    dedupe_key TEXT UNIQUE,
+    channel TEXT NOT NULL DEFAULT 'reply',
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT
+);
+"""
+_INDEX = "CREATE INDEX IF NOT EXISTS idx_outbox_channel_pending ON outbox (channel, status, next_attempt_at, id)"
+
+# Balasan chat dikirim dari instance yang menerima pesan; reminder boleh lewat SenderPool
+CHANNEL_REPLY = 'reply'
+CHANNEL_REMINDER = 'reminder'
+
+def attempt_send(send_fn: Callable[[str, str], object], chat_id: str, message: str) -> Optional[str]:
+    """Call a GreenAPI sendMessage function. Returns None on success, otherwise an error description."""
+    started = time.perf_counter()
+    try:
+        response = send_fn(chat_id, message)
+    except Exception as e:
+        sends_total.inc(result="error")
+        return str(e)
+    finally:
+        send_latency_seconds.observe(time.perf_counter() - started)
+    code = getattr(response, 'code', 200)
+    if code != 200:
+        sends_total.inc(result="error")
+        return f"HTTP {code}: {getattr(response, 'error', '')}"
+    sends_total.inc(result="ok")
+    return None
+
+
+class SendHealth:
+    """Sliding window of recent send outcomes, used to stop feeding a degraded GreenAPI instance."""
+    def __init__(self, window=WORKER_SEND_ERROR_WINDOW, max_error_rate=WORKER_SEND_MAX_ERROR_RATE):
+        self.outcomes = deque(maxlen=window)
+        self.max_error_rate = max_error_rate
+        self.total_failures = 0
+
+    def record(self, success: bool) -> None:
+        self.outcomes.append(success)
+        if not success:
+            self.total_failures += 1
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def is_degraded(self) -> bool:
+        # Butuh sampel minimal setengah window agar satu-dua error tidak langsung menghentikan fetch
+        return len(self.outcomes) * 2 >= self.outcomes.maxlen and self.error_rate() >= self.max_error_rate
+
+    def reset(self) -> None:
+        self.outcomes.clear()
+
+
+class Outbox:
+    """Durable SQLite queue for every outbound WhatsApp message.
+
+    Pesan ditulis dulu ke sini (dalam batch, satu transaksi), lalu dikirim oleh
+    OutboxSender per channel, sehingga balasan menu tidak mengantre di belakang reminder.
+    `dedupe_key` mencegah baris ganda saat pesan yang sama di-enqueue ulang setelah crash.
+
+    Pengiriman bersifat at-least-once: jika proses mati setelah sendMessage berhasil tetapi
+    sebelum complete() mencatatnya, pesan itu dikirim ulang saat start berikutnya.
+    Pesan yang gagal OUTBOX_MAX_ATTEMPTS kali tetap disimpan dengan status 'failed'
+    (gauge crealert_outbox_failed) dan bisa dikirim ulang dengan
+    `python -m src.outbox --requeue-failed`.
+    """
+    def __init__(self, path: str = OUTBOX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        if 'channel' not in columns: # Outbox lama dibuat sebelum ada channel
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN channel TEXT NOT NULL DEFAULT 'reply'")
+        self._conn.execute(_INDEX)
+        self._wakeups = {CHANNEL_REPLY: threading.Event(), CHANNEL_REMINDER: threading.Event()}
+
+    def wakeup_event(self, channel: str) -> threading.Event:
+        """Event set whenever new messages are enqueued on `channel`."""
+        return self._wakeups[channel]
+
+    def enqueue_many(self, items: Iterable[Tuple[str, str, Optional[str]]], channel: str = CHANNEL_REPLY) -> int:
+        """Insert (chat_id, message, dedupe_key) tuples in one transaction. Returns rows actually added."""
+        now = time.time()
+        rows = [(chat_id, message, dedupe_key, channel, now, now) for chat_id, message, dedupe_key in items]
+        if not rows:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO outbox (chat_id, message, dedupe_key, channel, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.execute("COMMIT")
+            inserted = self._conn.total_changes - before
+        self._wakeups[channel].set()
+        return inserted
+
+    def enqueue(self, chat_id: str, message: str, dedupe_key: Optional[str] = None, channel: str = CHANNEL_REPLY) -> int:
+        return self.enqueue_many([(chat_id, message, dedupe_key)], channel)
+
+    def due_batch(self, limit: int, channel: str = CHANNEL_REPLY) -> List[Tuple[int, str, str, int]]:
+        """Oldest pending messages on `channel` whose next attempt is due: (id, chat_id, message, attempts)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, chat_id, message, attempts FROM outbox "
+                "WHERE channel = ? AND status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (channel, time.time(), limit)
+            ).fetchall()
+
+    def complete(self, sent_ids: List[int], failures: List[Tuple[int, int, str]]) -> None:
+        """Record a drained batch: sent ids, and (id, attempts, error) for failed sends."""
+        now = time.time()
+        retry_rows, dead_rows = [], []
+        for outbox_id, attempts, error in failures:
+            attempts += 1
+            if attempts >= OUTBOX_MAX_ATTEMPTS:
+                dead_rows.append((attempts, error, outbox_id))
+            else:
+                retry_rows.append((attempts, now + OUTBOX_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), error, outbox_id))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("UPDATE outbox SET status = 'sent', sent_at = ? WHERE id = ?",
+                                   [(now, outbox_id) for outbox_id in sent_ids])
+            self._conn.executemany("UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                                   retry_rows)
+            self._conn.executemany("UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                                   dead_rows)
+            self._conn.execute("COMMIT")
+        for _, error, outbox_id in dead_rows:
+            logger.error(f"Outbox: Message {outbox_id} failed after {OUTBOX_MAX_ATTEMPTS} attempts, kept for requeue. Last error: {error}")
+
+    def depth(self, channel: Optional[str] = None) -> int:
+        with self._lock:
+            if channel is None:
+                return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE channel = ? AND status = 'pending'",
+                                      (channel,)).fetchone()[0]
+
+    def failed_count(self, channel: Optional[str] = None) -> int:
+        with self._lock:
+            if channel is None:
+                return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'failed'").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE channel = ? AND status = 'failed'",
+                                      (channel,)).fetchone()[0]
+
+    def requeue_failed(self, channel: Optional[str] = None) -> int:
+        """Put messages that used up their attempts back in the queue with a fresh retry budget."""
+        query = "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'failed'"
+        params = [time.time()]
+        if channel is not None:
+            query += " AND channel = ?"
+            params.append(channel)
+        with self._lock:
+            requeued = self._conn.execute(query, params).rowcount
+        for name, wakeup in self._wakeups.items():
+            if channel in (None, name):
+                wakeup.set()
+        return requeued
+
+    def purge_sent(self, older_than_seconds: float = 86400) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?",
+                                        (time.time() - older_than_seconds,))
+            return cursor.rowcount
+
+
+class OutboxSender:
+    """Single thread draining one outbox channel, with retries.
+
+    Tanpa `pool`, pesan dikirim berurutan lewat `send_fn` dengan jeda
+    1/rate_per_second. Dengan `pool` (SenderPool), satu batch dibagi ke
+    beberapa instance GreenAPI yang masing-masing punya rate limit sendiri.
+    """
+    def __init__(self, outbox: Outbox, send_fn: Optional[Callable[[str, str], object]] = None, pool=None,
+                 channel: str = CHANNEL_REPLY, health: Optional[SendHealth] = None,
+                 rate_per_second: float = OUTBOX_SEND_RATE_PER_SECOND, batch_size: int = OUTBOX_BATCH_SIZE):
+        self.outbox = outbox
+        self.send_fn = send_fn
+        self.pool = pool
+        self.channel = channel
+        self.min_gap = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self.batch_size = batch_size
+        self.health = health or SendHealth()
+        self.sent_total = 0
+        self.failed_total = 0
+        self._next_send_at = 0.0
+        self._sent_times = deque()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"OutboxSender-{self.channel}", daemon=True)
+        self._thread.start()
+        logger.info(f"OutboxSender[{self.channel}] started: {self.outbox.depth(self.channel)} pending message(s) in {self.outbox.path}.")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self.outbox.wakeup_event(self.channel).set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def drain_rate_per_minute(self) -> int:
+        cutoff = time.monotonic() - 60
+        while self._sent_times and self._sent_times[0] < cutoff:
+            self._sent_times.popleft()
+        return len(self._sent_times)
+
+    def _dispatch(self, batch) -> Tuple[List[int], List[Tuple[int, int, str]]]:
+        """Send one batch sequentially through `send_fn`, paced by min_gap."""
+        sent_ids, failures = [], []
+        for outbox_id, chat_id, message, attempts in batch:
+            if self._stop.is_set():
+                break
+            delay = self._next_send_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_send_at = time.monotonic() + self.min_gap
+            error = attempt_send(self.send_fn, chat_id, message)
+            if error is None:
+                sent_ids.append(outbox_id)
+            else:
+                failures.append((outbox_id, attempts, error))
+        return sent_ids, failures
+
+    def _run(self) -> None:
+        last_stats_log = time.monotonic()
+        wakeup = self.outbox.wakeup_event(self.channel)
+        while not self._stop.is_set():
+            try:
+                batch = self.outbox.due_batch(self.batch_size, self.channel)
+            except sqlite3.Error as e:
+                logger.error(f"OutboxSender: Failed to read outbox: {e}")
+                self._stop.wait(OUTBOX_IDLE_POLL_SECONDS)
+                continue
+            if not batch:
+                wakeup.wait(OUTBOX_IDLE_POLL_SECONDS)
+                wakeup.clear()
+                continue
+
+            if self.pool is not None:
+                sent_ids, failures = self.pool.send_batch(batch)
+            else:
+                sent_ids, failures = self._dispatch(batch)
+            finished_at = time.monotonic()
+            for _ in sent_ids:
+                self.health.record(True)
+                self._sent_times.append(finished_at)
+            for outbox_id, attempts, error in failures:
+                self.health.record(False)
+                logger.warning(f"OutboxSender[{self.channel}]: Message {outbox_id} failed (attempt {attempts + 1}): {error}")
+            self.outbox.complete(sent_ids, failures)
+            self.sent_total += len(sent_ids)
+            self.failed_total += len(failures)
+
+            if time.monotonic() - last_stats_log >= 60:
+                last_stats_log = time.monotonic()
+                logger.info(f"OutboxSender[{self.channel}]: depth={self.outbox.depth(self.channel)} drain_rate={self.drain_rate_per_minute()}/min "
+                            f"sent_total={self.sent_total} failed_total={self.failed_total}")
+                self.outbox.purge_sent()
+
+
+# Kesehatan pengiriman reminder; NotificationWorker berhenti fetch saat ini degraded
+outbox_send_health = SendHealth()
+_outbox = None
+_outbox_senders = {}
+_outbox_lock = threading.Lock()
+
+def get_outbox() -> Outbox:
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox()
+        return _outbox
+
+def get_outbox_sender(channel: str = CHANNEL_REMINDER) -> Optional[OutboxSender]:
+    return _outbox_senders.get(channel)
+
+def start_outbox_sender(api, route_replies: bool = OUTBOX_ROUTE_REPLIES, pool=None,
+                        channels: Iterable[str] = (CHANNEL_REPLY, CHANNEL_REMINDER)) -> Dict[str, OutboxSender]:
+    """Start the senders for `channels`, optionally routing handler replies into the outbox.
+
+    Balasan handler (`notification.answer`) memanggil `api.sending.sendMessage`,
+    jadi method itu diganti dengan versi yang menulis ke outbox; sender memakai
+    method asli untuk benar-benar mengirim. Reminder lewat `pool` jika ada.
+    Proses receiver dan worker yang terpisah masing-masing hanya menguras channel miliknya.
+    """
+    outbox = get_outbox()
+    original_send = api.sending.sendMessage
+    send_direct = lambda chat_id, message: original_send(chat_id, message)
+    if CHANNEL_REPLY in channels and CHANNEL_REPLY not in _outbox_senders:
+        _outbox_senders[CHANNEL_REPLY] = OutboxSender(outbox, send_fn=send_direct, channel=CHANNEL_REPLY)
+    if CHANNEL_REMINDER in channels and CHANNEL_REMINDER not in _outbox_senders:
+        _outbox_senders[CHANNEL_REMINDER] = OutboxSender(
+            outbox, send_fn=send_direct, pool=pool, channel=CHANNEL_REMINDER, health=outbox_send_health
+        )
+    if route_replies:
+        def enqueue_reply(chatId, message, *args, **kwargs):
+            """Stand-in for `sendMessage` that only queues the text.
+
+            Hanya chatId dan message yang dipakai: quotedMessageId, archiveChat dan
+            linkPreview diabaikan, dan yang dikembalikan None (bukan Response), karena
+            pesan baru benar-benar dikirim nanti oleh OutboxSender[reply].
+            """
+            outbox.enqueue(chatId, message)
+        api.sending.sendMessage = enqueue_reply
+        logger.info("Outbox: Handler replies are routed through the outbox.")
+    for sender in _outbox_senders.values():
+        sender.start()
+    return dict(_outbox_senders)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the outbox or requeue messages that used up their attempts")
+    parser.add_argument("--path", default=OUTBOX_PATH, help="Outbox SQLite file (default OUTBOX_PATH)")
+    parser.add_argument("--channel", choices=(CHANNEL_REPLY, CHANNEL_REMINDER), help="Only this channel")
+    parser.add_argument("--requeue-failed", action="store_true", help="Send failed messages again with a fresh retry budget")
+    args = parser.parse_args(argv)
+    outbox = Outbox(args.path)
+    if args.requeue_failed:
+        print(f"{outbox.requeue_failed(args.channel)} failed message(s) requeued in {args.path}")
+    print(f"pending={outbox.depth(args.channel)} failed={outbox.failed_count(args.channel)}")
+
+if __name__ == "__main__":
+    main()
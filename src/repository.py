@@ -0,0 +1,463 @@
+# src/repository.py
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from .config import (
+    supabase, SUPABASE_BREAKER_FAILURE_THRESHOLD, SUPABASE_BREAKER_RESET_SECONDS, STALE_CACHE_MAX_ENTRIES,
+    STORAGE_BACKEND, SQLITE_PATH
+)
+from .metrics import registry
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .change_feed import change_feed, INSERT
+
+logger = logging.getLogger(__name__)
+
+repository_coalesced_total = registry.counter(
+    "crealert_repository_coalesced_total", "Reads served by joining an identical in-flight query, by method."
+)
+repository_batch_size = registry.histogram(
+    "crealert_repository_batch_size", "Ids per batched point-lookup query, by loader.",
+    buckets=(1, 2, 5, 10, 25, 50, 100)
+)
+
+repository_stale_reads_total = registry.counter(
+    "crealert_repository_stale_reads_total", "Reads answered from last-known-good data while Supabase was unavailable, by method."
+)
+
+TASK_LIST_COLUMNS = 'id, name, description, due_date, jenis_tugas, class_id, day_id'
+DUE_NOTIFICATION_COLUMNS = 'id, phone_number, notification_time, reminder_type, task_id, tasks(id, name, description, due_date, jenis_tugas)'
+
+
+class RepositoryError(Exception):
+    """Supabase answered with an error response."""
+
+
+class SupabaseUnavailableError(RepositoryError):
+    """Supabase is unreachable or timing out, or the circuit breaker is open."""
+
+
+# SQLSTATE kelas 08 (koneksi), 53 (resource habis) dan 57 (statement timeout/dibatalkan) dihitung gangguan;
+# error lain dari PostgREST (constraint, kolom salah) berarti server sehat dan menjawab
+_OUTAGE_SQLSTATE_CLASSES = ("08", "53", "57")
+
+def _is_outage(error: BaseException) -> bool:
+    try:
+        # Di-import di sini agar postgrest (~0.2 s) tidak ikut dimuat saat startup; saat ada error client sudah dibuat
+        from postgrest.exceptions import APIError
+    except ImportError:
+        APIError = None
+    if APIError is not None and isinstance(error, APIError):
+        return str(error.code or "")[:2] in _OUTAGE_SQLSTATE_CLASSES
+    return isinstance(error, Exception)
+
+supabase_breaker = CircuitBreaker(
+    "supabase", SUPABASE_BREAKER_FAILURE_THRESHOLD, SUPABASE_BREAKER_RESET_SECONDS, is_failure=_is_outage
+)
+_BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+registry.gauge(
+    "crealert_supabase_circuit_state", "Supabase circuit breaker state (0 closed, 1 half-open, 2 open).",
+    callback=lambda: _BREAKER_STATE_VALUES[supabase_breaker.state]
+)
+
+def _execute(query, what: str):
+    try:
+        response = supabase_breaker.call(query.execute)
+    except CircuitOpenError as e:
+        raise SupabaseUnavailableError(f"{what}: {e}") from e
+    except Exception as e:
+        if _is_outage(e):
+            raise SupabaseUnavailableError(f"{what}: {e!r}") from e
+        raise
+    if hasattr(response, 'error') and response.error:
+        raise RepositoryError(f"{what}: {response.error}")
+    return response
+
+
+class StaleList(list):
+    """Last-known-good rows served while Supabase is unavailable."""
+    stale = True
+
+
+class StaleDict(dict):
+    """Last-known-good mapping served while Supabase is unavailable."""
+    stale = True
+
+
+def is_stale(data) -> bool:
+    """True if `data` came from the last-known-good store instead of Supabase."""
+    return getattr(data, 'stale', False)
+
+def _as_stale(value):
+    if isinstance(value, list):
+        return StaleList(value)
+    if isinstance(value, dict):
+        return StaleDict(value)
+    if isinstance(value, tuple):
+        return tuple(_as_stale(item) for item in value)
+    return value
+
+
+class LastKnownGood:
+    """Bounded LRU of the latest successful result per read key."""
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._values: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            return self._values.get(key)
+
+
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers with the same key share its result.
+
+    Hasil dibagi ke semua pemanggil, jadi list/dict yang dikembalikan jangan diubah.
+    """
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Tuple, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            repository_coalesced_total.inc(method=key[0])
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class BatchLoader:
+    """Coalesce point lookups into one `in_` query per batch.
+
+    Pemanggil pertama langsung query (tanpa jeda tunggu); key yang diminta selama query itu
+    berjalan dikumpulkan dan diambil bersama di batch berikutnya oleh thread yang sama.
+    """
+    def __init__(self, name: str, fetch_many: Callable[[List[Hashable]], Dict[Hashable, Any]], max_batch: int = 100):
+        self.name = name
+        self.fetch_many = fetch_many
+        self.max_batch = max_batch
+        self._queued: Dict[Hashable, Future] = {}
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._draining = False
+        self._lock = threading.Lock()
+
+    def load(self, key: Hashable) -> Any:
+        return self.load_many([key])[key]
+
+    def load_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Value per key (None when the row does not exist)."""
+        futures = {}
+        with self._lock:
+            for key in keys:
+                future = self._in_flight.get(key) or self._queued.get(key)
+                if future is None:
+                    future = self._queued[key] = Future()
+                else:
+                    repository_coalesced_total.inc(method=self.name)
+                futures[key] = future
+            drain = not self._draining
+            self._draining = True
+        if drain:
+            self._drain()
+        return {key: future.result() for key, future in futures.items()}
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                if not self._queued:
+                    self._draining = False
+                    return
+                keys = list(self._queued)[:self.max_batch]
+                batch = {key: self._queued.pop(key) for key in keys}
+                self._in_flight.update(batch)
+            repository_batch_size.observe(len(keys), loader=self.name)
+            try:
+                found = self.fetch_many(keys)
+                for key, future in batch.items():
+                    future.set_result(found.get(key))
+            except Exception as e:
+                for future in batch.values():
+                    future.set_exception(e)
+            finally:
+                with self._lock:
+                    for key in batch:
+                        self._in_flight.pop(key, None)
+
+
+class StorageBackend:
+    """Every read and write the handlers, caches and NotificationWorker need from storage.
+
+    Implementasi: SupabaseRepository (default) dan SQLiteRepository (src/sqlite_backend.py),
+    dipilih lewat STORAGE_BACKEND. Baris dikembalikan sebagai dict dengan kolom yang sama
+    seperti PostgREST; error storage dilempar sebagai RepositoryError.
+    """
+    name = ""
+
+    def is_available(self) -> bool:
+        raise NotImplementedError
+
+    def warm_up_connection(self) -> None:
+        """Start opening the storage connection in the background so the first request does not pay for it."""
+
+    # --- Data referensi ---
+    def reference(self, table: str) -> List[Dict]:
+        """`id, name` rows of `classes` or `days`, ordered by id."""
+        raise NotImplementedError
+
+    def classes(self) -> List[Dict]:
+        return self.reference('classes')
+
+    def days(self) -> List[Dict]:
+        return self.reference('days')
+
+    def day(self, day_id: int) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def user_id(self, phone_number: str) -> Optional[int]:
+        raise NotImplementedError
+
+    def user_ids(self, phone_numbers: Iterable[str]) -> Dict[str, Optional[int]]:
+        raise NotImplementedError
+
+    # --- Tugas ---
+    def task_names_by_day(self, class_id: int, day_ids: Iterable[int]) -> Dict[int, List[str]]:
+        """Task names of a class grouped by day, for every day in `day_ids`."""
+        raise NotImplementedError
+
+    def task_page(self, class_id: int, day_id: int, start: int, size: int) -> Tuple[List[Dict], int]:
+        """One page of a class/day task list ordered by deadline, and the total task count."""
+        raise NotImplementedError
+
+    def upcoming_tasks(self, class_id: int, start_iso: str, end_iso: str, limit: int) -> List[Dict]:
+        raise NotImplementedError
+
+    def tasks_for_class(self, class_id: int, columns: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def insert_tasks(self, rows) -> List[Dict]:
+        """Insert one task dict or a list of them; returns the saved rows."""
+        saved = self._insert('tasks', rows)
+        change_feed.publish_rows('tasks', INSERT, saved) # Cache dan index pencarian di proses ini langsung ikut
+        return saved
+
+    # --- Notifikasi ---
+    def insert_notifications(self, rows: List[Dict]) -> List[Dict]:
+        saved = self._insert('notifications', rows)
+        change_feed.publish_rows('notifications', INSERT, saved) # Bangunkan worker bila berjalan di proses ini
+        return saved
+
+    def due_notifications(self, now_iso: str, limit: int, exclude_ids: Iterable[int] = ()) -> List[Dict]:
+        """Unsent notifications due at `now_iso`, oldest first, with their task embedded as `tasks`.
+
+        `exclude_ids` melewati baris yang masih diproses worker dan belum ditandai is_sent.
+        """
+        raise NotImplementedError
+
+    def next_notification_time(self, after_iso: str) -> Optional[str]:
+        """`notification_time` of the earliest unsent notification after `after_iso`."""
+        raise NotImplementedError
+
+    def mark_notifications_sent(self, notification_ids: List[int]) -> None:
+        raise NotImplementedError
+
+    def _insert(self, table: str, rows) -> List[Dict]:
+        raise NotImplementedError
+
+
+class SupabaseRepository(StorageBackend):
+    """All Supabase reads and writes used by the handlers, caches and NotificationWorker.
+
+    Bacaan identik yang sedang berjalan dibagi (single-flight) dan lookup per id dikumpulkan
+    menjadi query `in_`. Method baca mengembalikan data PostgREST dan melempar RepositoryError
+    bila Supabase mengembalikan error. Saat Supabase tidak tersedia, bacaan menu (kelas, hari,
+    daftar tugas) dijawab dari hasil terakhir yang berhasil, ditandai `is_stale()`.
+    """
+    name = "supabase"
+
+    def __init__(self):
+        self._flight = SingleFlight()
+        self.last_known_good = LastKnownGood(STALE_CACHE_MAX_ENTRIES)
+        self.days_by_id = BatchLoader('day', self._fetch_days)
+        self.user_ids_by_phone = BatchLoader('user_id', self._fetch_user_ids)
+
+    def _read(self, key: Tuple, build_query: Callable[[], Any], parse: Callable[[Any], Any], what: str,
+              stale_key: Optional[Tuple] = None):
+        stale_key = stale_key or key
+        try:
+            value = self._flight.do(key, lambda: parse(_execute(build_query(), what)))
+        except SupabaseUnavailableError as e:
+            stale = self.last_known_good.get(stale_key)
+            if stale is None:
+                raise
+            repository_stale_reads_total.inc(method=key[0])
+            logger.debug(f"Repository: Serving last-known-good {key[0]} ({e})")
+            return _as_stale(stale)
+        self.last_known_good.set(stale_key, value)
+        return value
+
+    def is_available(self) -> bool:
+        return supabase is not None
+
+    def warm_up_connection(self) -> None:
+        warm_up = getattr(supabase, 'warm_up', None) # LazySupabaseClient, juga lewat InstrumentedSupabase
+        if warm_up is not None:
+            warm_up()
+
+    # --- Data referensi ---
+    def reference(self, table: str) -> List[Dict]:
+        return self._read(
+            ('reference', table),
+            lambda: supabase.table(table).select('id, name').order('id'),
+            lambda response: response.data or [],
+            f"list {table}"
+        )
+
+    def _fetch_days(self, day_ids: List[int]) -> Dict[int, Dict]:
+        response = _execute(supabase.table('days').select('id, name').in_('id', day_ids), "days by id")
+        return {row['id']: row for row in response.data or []}
+
+    def day(self, day_id: int) -> Optional[Dict]:
+        try:
+            return self.days_by_id.load(int(day_id))
+        except SupabaseUnavailableError:
+            for row in self.last_known_good.get(('reference', 'days')) or []:
+                if row['id'] == int(day_id):
+                    return row
+            raise
+
+    def _fetch_user_ids(self, phones: List[str]) -> Dict[str, int]:
+        response = _execute(
+            supabase.table('users').select('id, phone_number').in_('phone_number', phones), "users by phone"
+        )
+        return {row['phone_number']: row['id'] for row in response.data or []}
+
+    def user_id(self, phone_number: str) -> Optional[int]:
+        return self.user_ids_by_phone.load(phone_number)
+
+    def user_ids(self, phone_numbers: Iterable[str]) -> Dict[str, Optional[int]]:
+        return self.user_ids_by_phone.load_many(phone_numbers)
+
+    # --- Tugas ---
+    def task_names_by_day(self, class_id: int, day_ids: Iterable[int]) -> Dict[int, List[str]]:
+        """Task names of a class grouped per day, in one query for all `day_ids`."""
+        day_ids = sorted(set(day_ids))
+        def group(response):
+            names: Dict[int, List[str]] = {day_id: [] for day_id in day_ids}
+            for row in response.data or []:
+                names.setdefault(row['day_id'], []).append(row['name'])
+            return names
+        return self._read(
+            ('task_names_by_day', class_id, tuple(day_ids)),
+            lambda: supabase.table('tasks').select('day_id, name').eq('class_id', class_id).in_('day_id', day_ids),
+            group,
+            f"task names for class {class_id}"
+        )
+
+    def task_page(self, class_id: int, day_id: int, start: int, size: int) -> Tuple[List[Dict], int]:
+        def page(response):
+            tasks_data = response.data or []
+            total = response.count if response.count is not None else start + len(tasks_data)
+            return tasks_data, total
+        return self._read(
+            ('task_page', class_id, day_id, start, size),
+            lambda: supabase.table('tasks')
+                .select(TASK_LIST_COLUMNS, count='exact')
+                .eq('class_id', class_id)
+                .eq('day_id', day_id)
+                .order('due_date')
+                .order('id')
+                .range(start, start + size - 1),
+            page,
+            f"tasks for class {class_id} day {day_id}"
+        )
+
+    def upcoming_tasks(self, class_id: int, start_iso: str, end_iso: str, limit: int) -> List[Dict]:
+        return self._read(
+            ('upcoming_tasks', class_id, start_iso[:16], end_iso[:16], limit), # per menit, agar panggilan bersamaan berbagi query
+            lambda: supabase.table('tasks')
+                .select(TASK_LIST_COLUMNS)
+                .eq('class_id', class_id)
+                .gte('due_date', start_iso)
+                .lte('due_date', end_iso)
+                .order('due_date')
+                .limit(limit),
+            lambda response: response.data or [],
+            f"upcoming tasks for class {class_id}",
+            stale_key=('upcoming_tasks', class_id, limit)
+        )
+
+    def tasks_for_class(self, class_id: int, columns: str) -> List[Dict]:
+        return self._read(
+            ('tasks_for_class', class_id, columns),
+            lambda: supabase.table('tasks').select(columns).eq('class_id', class_id),
+            lambda response: response.data or [],
+            f"tasks for class {class_id}"
+        )
+
+    def _insert(self, table: str, rows) -> List[Dict]:
+        return _execute(supabase.table(table).insert(rows), f"insert {table}").data or []
+
+    # --- Notifikasi ---
+    def due_notifications(self, now_iso: str, limit: int, exclude_ids: Iterable[int] = ()) -> List[Dict]:
+        query = (
+            supabase.table('notifications')
+                .select(DUE_NOTIFICATION_COLUMNS)
+                .eq('is_sent', False)
+                .lte('notification_time', now_iso)
+        )
+        exclude_ids = sorted(exclude_ids)
+        if exclude_ids:
+            query = query.not_.in_('id', exclude_ids)
+        return _execute(query.order('notification_time').limit(limit), "due notifications").data or []
+
+    def next_notification_time(self, after_iso: str) -> Optional[str]:
+        data = _execute(
+            supabase.table('notifications')
+                .select('notification_time')
+                .eq('is_sent', False)
+                .gt('notification_time', after_iso)
+                .order('notification_time')
+                .limit(1),
+            "next notification time"
+        ).data
+        return data[0]['notification_time'] if data else None
+
+    def mark_notifications_sent(self, notification_ids: List[int]) -> None:
+        _execute(
+            supabase.table('notifications').update({'is_sent': True}).in_('id', notification_ids),
+            "mark notifications sent"
+        )
+
+
+def create_repository(backend: str = STORAGE_BACKEND) -> StorageBackend:
+    """Storage backend named by STORAGE_BACKEND (`supabase` or `sqlite`)."""
+    if backend == "sqlite":
+        from .sqlite_backend import SQLiteRepository
+        return SQLiteRepository(SQLITE_PATH)
+    if backend != "supabase":
+        logger.error(f"Unknown STORAGE_BACKEND '{backend}', falling back to supabase.")
+    return SupabaseRepository()
+
+repository = create_repository()
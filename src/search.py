@@ -0,0 +1,176 @@
+# src/search.py
+import heapq
+import re
+import threading
+import time
+import logging
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .config import SEARCH_INDEX_TTL_SECONDS
+from .repository import repository, RepositoryError, is_stale
+from .change_feed import change_feed, ChangeEvent, INSERT
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+INDEXED_FIELDS = ('name', 'description', 'jenis_tugas')
+TASK_COLUMNS = 'id, name, description, due_date, jenis_tugas, class_id, day_id'
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def _due_timestamp(due_date: Optional[str]) -> float:
+    """Deadline as epoch seconds; tasks without a readable deadline sort after every dated task."""
+    try:
+        return datetime.fromisoformat(due_date.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return float('inf')
+
+
+class _ClassIndex:
+    __slots__ = ("tasks", "due_at", "postings", "sorted_terms", "built_at")
+
+    def __init__(self):
+        self.tasks: Dict[int, Dict] = {}
+        self.due_at: Dict[int, float] = {}
+        self.postings: Dict[str, Set[int]] = {}
+        self.sorted_terms: Optional[List[str]] = None
+        self.built_at = time.monotonic()
+
+    def add(self, task: Dict) -> None:
+        task_id = task['id']
+        self.tasks[task_id] = {key: task.get(key) for key in ('id', 'name', 'description', 'due_date', 'jenis_tugas', 'day_id')}
+        self.due_at[task_id] = _due_timestamp(task.get('due_date'))
+        for field in INDEXED_FIELDS:
+            for term in tokenize(task.get(field)):
+                posting = self.postings.get(term)
+                if posting is None:
+                    self.postings[term] = {task_id}
+                    self.sorted_terms = None # Kosakata berubah, daftar terurut dibangun ulang saat search
+                else:
+                    posting.add(task_id)
+
+    def matching_ids(self, query_term: str) -> Set[int]:
+        """Task ids whose indexed text has a term starting with `query_term`."""
+        if self.sorted_terms is None:
+            self.sorted_terms = sorted(self.postings)
+        matches: Set[int] = set()
+        position = bisect_left(self.sorted_terms, query_term)
+        while position < len(self.sorted_terms) and self.sorted_terms[position].startswith(query_term):
+            matches |= self.postings[self.sorted_terms[position]]
+            position += 1
+        return matches
+
+
+class TaskSearchIndex:
+    """Per-class in-memory inverted index over task name, description and jenis_tugas.
+
+    Index sebuah kelas dibangun saat pertama kali dicari (satu query ke `tasks`),
+    lalu diperbarui lewat change feed setiap ada tugas yang ditambah atau diubah
+    (dari AdminHandler maupun dashboard Supabase).
+    """
+    def __init__(self, ttl_seconds: float = SEARCH_INDEX_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._classes: Dict[int, _ClassIndex] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load_class(self, class_id: int) -> Optional[List[Dict]]:
+        try:
+            return repository.tasks_for_class(class_id, TASK_COLUMNS)
+        except RepositoryError as e:
+            logger.error(f"TaskSearchIndex: Supabase error loading tasks for class {class_id}: {e}")
+            return None
+
+    def build_class(self, class_id: int, tasks: Iterable[Dict]) -> None:
+        """Replace the index of one class with `tasks`."""
+        class_index = _ClassIndex()
+        for task in tasks:
+            class_index.add(task)
+        with self._lock:
+            self._classes[class_id] = class_index
+        logger.info(f"TaskSearchIndex: Built index for class {class_id} with {len(class_index.tasks)} tasks.")
+
+    def _get_class(self, class_id: int) -> Optional[_ClassIndex]:
+        with self._lock:
+            class_index = self._classes.get(class_id)
+        if class_index is None or time.monotonic() - class_index.built_at > self.ttl_seconds:
+            self.misses += 1
+            tasks = self._load_class(class_id)
+            if tasks is None or (is_stale(tasks) and class_index is not None):
+                return class_index # Pakai index lama (jika ada) saat DB error
+            self.build_class(class_id, tasks)
+            with self._lock:
+                class_index = self._classes.get(class_id)
+            if is_stale(tasks):
+                class_index.built_at = 0.0 # Dibangun dari data lama: bangun ulang begitu Supabase pulih
+        else:
+            self.hits += 1
+        return class_index
+
+    def preload(self, class_id: int) -> bool:
+        """Load the index of a class ahead of its first search. Returns False when it could not be loaded."""
+        return self._get_class(class_id) is not None
+
+    def stats(self) -> Tuple[int, int]:
+        """(hits, misses) of class index lookups; a miss loads the class from storage."""
+        return self.hits, self.misses
+
+    def add_tasks(self, tasks: Iterable[Dict]) -> None:
+        """Index newly inserted tasks for classes that are already loaded."""
+        with self._lock:
+            for task in tasks:
+                class_index = self._classes.get(task.get('class_id'))
+                if class_index is not None and task.get('id') is not None:
+                    class_index.add(task)
+
+    def invalidate(self, class_id: Optional[int] = None) -> None:
+        with self._lock:
+            if class_id is None:
+                self._classes.clear()
+            else:
+                self._classes.pop(class_id, None)
+
+    def apply_change(self, event: ChangeEvent) -> None:
+        """Keep loaded class indexes in sync with a change on `tasks`."""
+        if event.type == INSERT and event.record and event.record.get('class_id') is not None:
+            self.add_tasks([event.record])
+            return
+        # Update/delete: posting list tidak bisa dikurangi per tugas, bangun ulang index kelas itu saat dicari
+        class_ids = event.values('class_id')
+        if not class_ids:
+            self.invalidate()
+        for class_id in class_ids:
+            self.invalidate(class_id)
+
+    def search(self, class_id: int, query: str, limit: int = 10) -> Optional[List[Dict]]:
+        """Tasks of a class matching every query word (prefix match).
+
+        Tugas yang deadline-nya belum lewat didahulukan (paling dekat dulu); tugas yang sudah
+        lewat hanya mengisi sisa `limit`, yang paling baru lewat lebih dulu.
+        Returns None when the class index could not be loaded.
+        """
+        query_terms = tokenize(query)
+        class_index = self._get_class(class_id)
+        if class_index is None:
+            return None
+        if not query_terms:
+            return []
+        with self._lock:
+            result_ids: Optional[Set[int]] = None
+            for term in query_terms:
+                term_ids = class_index.matching_ids(term)
+                result_ids = term_ids if result_ids is None else result_ids & term_ids
+                if not result_ids:
+                    return []
+            tasks, due_at, now = class_index.tasks, class_index.due_at, time.time()
+            result_ids = heapq.nsmallest(limit, (task_id for task_id in result_ids if due_at[task_id] >= now), key=due_at.get) + \
+                heapq.nlargest(limit, (task_id for task_id in result_ids if due_at[task_id] < now), key=due_at.get)
+            return [tasks[task_id] for task_id in result_ids[:limit]]
+
+
+task_search_index = TaskSearchIndex()
+change_feed.subscribe(task_search_index.apply_change, tables=('tasks',))
@@ -0,0 +1,229 @@
+# src/sender_pool.py
+import hashlib
+import threading
+import time
+import logging
+from bisect import bisect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from .config import (
+    GREENAPI_POOL, SENDER_POOL_RATE_PER_SECOND, SENDER_POOL_BURST, SENDER_POOL_VNODES,
+    SENDER_POOL_DEGRADED_COOLDOWN_SECONDS
+)
+from .outbox import SendHealth, attempt_send
+from .circuit_breaker import CLOSED, OPEN, HALF_OPEN
+
+logger = logging.getLogger(__name__)
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class TokenBucket:
+    """Thread-safe token bucket; `reserve` returns how long the caller must wait for its token."""
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            if self.tokens >= 0 or self.rate <= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def try_acquire(self) -> bool:
+        """Take one token if available, without waiting."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class PoolInstance:
+    """One GreenAPI instance in the pool, with its own rate limit and health window.
+
+    Sama seperti CircuitBreaker: instance yang degraded dianggap open dan dilewati selama
+    `cooldown_seconds`, lalu half-open dan satu pesan percobaan diteruskan. Berhasil ->
+    window kesehatan di-reset dan instance kembali ke pool, gagal -> open lagi.
+    """
+    def __init__(self, id_instance: str, send_fn: Callable[[str, str], object],
+                 rate_per_second: float = SENDER_POOL_RATE_PER_SECOND, burst: int = SENDER_POOL_BURST,
+                 cooldown_seconds: float = SENDER_POOL_DEGRADED_COOLDOWN_SECONDS):
+        self.id_instance = id_instance
+        self.send_fn = send_fn
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.health = SendHealth()
+        self.cooldown_seconds = cooldown_seconds
+        self.sent_total = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._probe_in_flight:
+            return HALF_OPEN
+        return CLOSED if self.opened_at is None else OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until a degraded instance gets its probe send (0 when not open)."""
+        if self.opened_at is None or self._probe_in_flight:
+            return 0.0
+        return max(self.opened_at + self.cooldown_seconds - time.monotonic(), 0.0)
+
+    def accepts(self) -> bool:
+        """True if new chats may be routed here; hands out the single probe once the cooldown is over."""
+        with self._lock:
+            if self._probe_in_flight:
+                return False
+            if self.opened_at is None:
+                if not self.health.is_degraded():
+                    return True
+                self.opened_at = time.monotonic()
+                logger.warning(f"SenderPool: Instance {self.id_instance} degraded (error rate {self.health.error_rate():.0%}), "
+                               f"skipped for {self.cooldown_seconds}s.")
+                return False
+            if time.monotonic() - self.opened_at < self.cooldown_seconds:
+                return False
+            self._probe_in_flight = True
+            logger.info(f"SenderPool: Instance {self.id_instance} half-open, sending a probe message.")
+            return True
+
+    def _finish_probe(self, success: bool) -> None:
+        with self._lock:
+            if not self._probe_in_flight:
+                return
+            self._probe_in_flight = False
+            if success:
+                self.health.reset()
+                self.opened_at = None
+                logger.info(f"SenderPool: Instance {self.id_instance} probe succeeded, back in the pool.")
+            else:
+                self.opened_at = time.monotonic()
+
+    def send(self, chat_id: str, message: str) -> Optional[str]:
+        delay = self.bucket.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        error = attempt_send(self.send_fn, chat_id, message)
+        self.health.record(error is None)
+        self._finish_probe(error is None)
+        if error is None:
+            self.sent_total += 1
+        return error
+
+
+class HashRing:
+    """Consistent-hash ring over instance ids, `vnodes` points per instance."""
+    def __init__(self, node_ids: Sequence[str], vnodes: int = SENDER_POOL_VNODES):
+        points = sorted((_ring_hash(f"{node_id}#{i}"), node_id) for node_id in node_ids for i in range(vnodes))
+        self._hashes = [point[0] for point in points]
+        self._nodes = [point[1] for point in points]
+        self._node_count = len(set(node_ids))
+
+    def nodes_for(self, key: str) -> Iterator[str]:
+        """Distinct node ids in ring order starting at `key`; the first one owns the key."""
+        if not self._nodes:
+            return
+        position = bisect(self._hashes, _ring_hash(key))
+        seen = set()
+        for offset in range(len(self._nodes)):
+            node_id = self._nodes[(position + offset) % len(self._nodes)]
+            if node_id not in seen:
+                seen.add(node_id)
+                yield node_id
+                if len(seen) == self._node_count:
+                    return
+
+
+class SenderPool:
+    """Spread outbound reminders over several GreenAPI instances.
+
+    Penerima dipetakan ke instance lewat consistent hashing, jadi satu user selalu
+    menerima reminder dari nomor yang sama. Instance yang sedang degraded dilewati
+    dan penerimanya dialihkan ke instance berikutnya di ring sampai probe-nya berhasil.
+    """
+    def __init__(self, instances: List[PoolInstance], vnodes: int = SENDER_POOL_VNODES):
+        self.instances: Dict[str, PoolInstance] = {instance.id_instance: instance for instance in instances}
+        self.ring = HashRing(list(self.instances), vnodes)
+        self._executor = ThreadPoolExecutor(max_workers=max(len(instances), 1), thread_name_prefix="SenderPool")
+
+    def instance_for(self, chat_id: str) -> PoolInstance:
+        owner = None
+        for node_id in self.ring.nodes_for(chat_id):
+            instance = self.instances[node_id]
+            if owner is None:
+                owner = instance
+            if instance.accepts():
+                return instance
+        return owner # Semua degraded: tetap pakai pemilik aslinya
+
+    def _send_group(self, instance: PoolInstance, rows) -> Tuple[List[int], List[Tuple[int, int, str]]]:
+        sent_ids, failures = [], []
+        for outbox_id, chat_id, message, attempts in rows:
+            error = instance.send(chat_id, message)
+            if error is None:
+                sent_ids.append(outbox_id)
+            else:
+                failures.append((outbox_id, attempts, f"[{instance.id_instance}] {error}"))
+        return sent_ids, failures
+
+    def send_batch(self, batch) -> Tuple[List[int], List[Tuple[int, int, str]]]:
+        """Send outbox rows (id, chat_id, message, attempts) in parallel across instances.
+
+        Baris untuk satu instance dikirim berurutan, jadi urutan pesan per chat tetap terjaga.
+        """
+        groups: Dict[str, list] = {}
+        for row in batch:
+            groups.setdefault(self.instance_for(row[1]).id_instance, []).append(row)
+        futures = [self._executor.submit(self._send_group, self.instances[node_id], rows)
+                   for node_id, rows in groups.items()]
+        sent_ids, failures = [], []
+        for future in futures:
+            group_sent, group_failures = future.result()
+            sent_ids.extend(group_sent)
+            failures.extend(group_failures)
+        return sent_ids, failures
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            node_id: {
+                "sent_total": instance.sent_total,
+                "error_rate": instance.health.error_rate(),
+                "degraded": instance.state != CLOSED or instance.health.is_degraded(),
+                "state": instance.state,
+                "cooldown_seconds": instance.cooldown_seconds,
+                "retry_after": instance.retry_after(),
+            }
+            for node_id, instance in self.instances.items()
+        }
+
+
+def build_sender_pool(primary_id: str, primary_api) -> SenderPool:
+    """Pool of the primary bot instance plus every GREENAPI_POOL instance.
+
+    Harus dipanggil sebelum `start_outbox_sender`, karena method sendMessage
+    instance utama kemudian diganti dengan versi yang menulis ke outbox.
+    """
+    from whatsapp_api_client_python import API
+
+    primary_send = primary_api.sending.sendMessage
+    instances = [PoolInstance(primary_id, lambda chat_id, message: primary_send(chat_id, message))]
+    for id_instance, api_token in GREENAPI_POOL:
+        if id_instance == primary_id:
+            continue
+        pooled_api = API.GreenAPI(id_instance, api_token)
+        instances.append(PoolInstance(id_instance, lambda chat_id, message, api=pooled_api: api.sending.sendMessage(chat_id, message)))
+    logger.info(f"SenderPool: {len(instances)} GreenAPI instance(s) for reminders, {SENDER_POOL_RATE_PER_SECOND}/s each.")
+    return SenderPool(instances)
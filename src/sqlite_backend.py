@@ -0,0 +1,311 @@
+# src/sqlite_backend.py
+import argparse
+import sqlite3
+import threading
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from .repository import StorageBackend, RepositoryError, TASK_LIST_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS classes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS days (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    phone_number TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    class_id INTEGER NOT NULL REFERENCES classes (id),
+    day_id INTEGER NOT NULL REFERENCES days (id),
+    name TEXT NOT NULL,
+    description TEXT,
+    jenis_tugas TEXT,
+    due_date TEXT NOT NULL,
+    created_by INTEGER,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY,
+    phone_number TEXT NOT NULL,
+    task_id INTEGER NOT NULL REFERENCES tasks (id) ON DELETE CASCADE,
+    notification_time TEXT NOT NULL,
+    reminder_type TEXT,
+    is_sent INTEGER NOT NULL DEFAULT 0
+);
+-- Daftar tugas per kelas/hari dan "upcoming" per kelas, keduanya terurut deadline
+CREATE INDEX IF NOT EXISTS idx_tasks_class_day_due ON tasks (class_id, day_id, due_date, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_class_due ON tasks (class_id, due_date);
+-- Hanya notifikasi yang belum terkirim yang dicari worker
+CREATE INDEX IF NOT EXISTS idx_notifications_pending ON notifications (notification_time) WHERE is_sent = 0;
+"""
+
+# Sama dengan tabel `days` di Supabase; diisi otomatis saat database baru dibuat
+DEFAULT_DAYS = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"]
+
+# Kolom timestamptz di Supabase: disimpan sebagai ISO 8601 UTC agar urutan string = urutan waktu
+_TIMESTAMP_COLUMNS = {"tasks": ("due_date", "created_at"), "notifications": ("notification_time",)}
+
+def utc_iso(value: str) -> str:
+    """Normalize an ISO 8601 timestamp (any offset, or naive UTC) to UTC with `+00:00`."""
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+class SQLiteRepository(StorageBackend):
+    """Embedded SQLite storage for single-node deployments (STORAGE_BACKEND=sqlite).
+
+    Satu koneksi dipakai bersama semua thread lewat lock, seperti Outbox. Bacaan menu
+    memakai index di atas, jadi tidak ada round-trip jaringan per langkah menu.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.queries = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._columns = {
+            table: [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+            for table in ("classes", "days", "users", "tasks", "notifications")
+        }
+        if not self._conn.execute("SELECT 1 FROM days LIMIT 1").fetchone():
+            self._conn.executemany("INSERT INTO days (id, name) VALUES (?, ?)", list(enumerate(DEFAULT_DAYS, start=1)))
+        logger.info(f"SQLiteRepository: Using {path}.")
+
+    def _query(self, sql: str, params: Iterable = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            self.queries += 1
+            try:
+                return self._conn.execute(sql, tuple(params)).fetchall()
+            except sqlite3.Error as e:
+                raise RepositoryError(f"sqlite: {e}") from e
+
+    def _select_columns(self, table: str, columns: str) -> str:
+        names = [column.strip() for column in columns.split(',')]
+        unknown = [name for name in names if name not in self._columns[table]]
+        if unknown:
+            raise RepositoryError(f"sqlite: unknown column(s) {unknown} on {table}")
+        return ", ".join(names)
+
+    def is_available(self) -> bool:
+        return True
+
+    # --- Data referensi ---
+    def reference(self, table: str) -> List[Dict]:
+        if table not in ("classes", "days"):
+            raise RepositoryError(f"sqlite: {table} is not a reference table")
+        return [dict(row) for row in self._query(f"SELECT id, name FROM {table} ORDER BY id")]
+
+    def day(self, day_id: int) -> Optional[Dict]:
+        rows = self._query("SELECT id, name FROM days WHERE id = ?", (int(day_id),))
+        return dict(rows[0]) if rows else None
+
+    def user_id(self, phone_number: str) -> Optional[int]:
+        rows = self._query("SELECT id FROM users WHERE phone_number = ?", (phone_number,))
+        return rows[0]['id'] if rows else None
+
+    def user_ids(self, phone_numbers: Iterable[str]) -> Dict[str, Optional[int]]:
+        phone_numbers = list(phone_numbers)
+        placeholders = ", ".join("?" * len(phone_numbers))
+        found = {
+            row['phone_number']: row['id']
+            for row in self._query(f"SELECT id, phone_number FROM users WHERE phone_number IN ({placeholders})", phone_numbers)
+        } if phone_numbers else {}
+        return {phone_number: found.get(phone_number) for phone_number in phone_numbers}
+
+    # --- Tugas ---
+    def task_names_by_day(self, class_id: int, day_ids: Iterable[int]) -> Dict[int, List[str]]:
+        day_ids = sorted(set(day_ids))
+        names: Dict[int, List[str]] = {day_id: [] for day_id in day_ids}
+        placeholders = ", ".join("?" * len(day_ids))
+        for row in self._query(
+            f"SELECT day_id, name FROM tasks WHERE class_id = ? AND day_id IN ({placeholders}) ORDER BY due_date, id",
+            [class_id, *day_ids]
+        ):
+            names.setdefault(row['day_id'], []).append(row['name'])
+        return names
+
+    def task_page(self, class_id: int, day_id: int, start: int, size: int) -> Tuple[List[Dict], int]:
+        rows = self._query(
+            f"SELECT {self._select_columns('tasks', TASK_LIST_COLUMNS)} FROM tasks "
+            "WHERE class_id = ? AND day_id = ? ORDER BY due_date, id LIMIT ? OFFSET ?",
+            (class_id, day_id, size, start)
+        )
+        total = self._query("SELECT COUNT(*) FROM tasks WHERE class_id = ? AND day_id = ?", (class_id, day_id))[0][0]
+        return [dict(row) for row in rows], total
+
+    def upcoming_tasks(self, class_id: int, start_iso: str, end_iso: str, limit: int) -> List[Dict]:
+        return [dict(row) for row in self._query(
+            f"SELECT {self._select_columns('tasks', TASK_LIST_COLUMNS)} FROM tasks "
+            "WHERE class_id = ? AND due_date >= ? AND due_date <= ? ORDER BY due_date LIMIT ?",
+            (class_id, utc_iso(start_iso), utc_iso(end_iso), limit)
+        )]
+
+    def tasks_for_class(self, class_id: int, columns: str) -> List[Dict]:
+        return [dict(row) for row in self._query(
+            f"SELECT {self._select_columns('tasks', columns)} FROM tasks WHERE class_id = ?", (class_id,)
+        )]
+
+    def _insert(self, table: str, rows) -> List[Dict]:
+        rows = [rows] if isinstance(rows, dict) else list(rows)
+        if not rows:
+            return []
+        prepared = []
+        for row in rows:
+            unknown = set(row) - set(self._columns[table])
+            if unknown:
+                raise RepositoryError(f"sqlite: unknown column(s) {sorted(unknown)} on {table}")
+            row = dict(row)
+            for column in _TIMESTAMP_COLUMNS.get(table, ()):
+                if row.get(column):
+                    row[column] = utc_iso(row[column])
+            if table == "tasks":
+                row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+            prepared.append(row)
+        ids = []
+        with self._lock:
+            self.queries += 1
+            try:
+                self._conn.execute("BEGIN")
+                for row in prepared:
+                    columns = ", ".join(row)
+                    placeholders = ", ".join("?" * len(row))
+                    cursor = self._conn.execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", tuple(row.values()))
+                    ids.append(cursor.lastrowid)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._conn.execute("ROLLBACK")
+                raise RepositoryError(f"sqlite: insert into {table}: {e}") from e
+        placeholders = ", ".join("?" * len(ids))
+        return [self._row(table, row) for row in self._query(f"SELECT * FROM {table} WHERE id IN ({placeholders}) ORDER BY id", ids)]
+
+    @staticmethod
+    def _row(table: str, row: sqlite3.Row) -> Dict:
+        data = dict(row)
+        if table == "notifications":
+            data["is_sent"] = bool(data["is_sent"])
+        return data
+
+    # --- Notifikasi ---
+    def due_notifications(self, now_iso: str, limit: int, exclude_ids: Iterable[int] = ()) -> List[Dict]:
+        exclude_ids = list(exclude_ids)
+        rows = self._query(
+            "SELECT n.id, n.phone_number, n.notification_time, n.reminder_type, n.task_id, "
+            "t.id AS t_id, t.name AS t_name, t.description AS t_description, t.due_date AS t_due_date, "
+            "t.jenis_tugas AS t_jenis_tugas "
+            "FROM notifications n LEFT JOIN tasks t ON t.id = n.task_id "
+            "WHERE n.is_sent = 0 AND n.notification_time <= ? "
+            f"AND n.id NOT IN ({', '.join('?' * len(exclude_ids))}) ORDER BY n.notification_time LIMIT ?",
+            (utc_iso(now_iso), *exclude_ids, limit)
+        )
+        notifications = []
+        for row in rows:
+            task = None
+            if row['t_id'] is not None:
+                task = {'id': row['t_id'], 'name': row['t_name'], 'description': row['t_description'],
+                        'due_date': row['t_due_date'], 'jenis_tugas': row['t_jenis_tugas']}
+            notifications.append({
+                'id': row['id'], 'phone_number': row['phone_number'], 'notification_time': row['notification_time'],
+                'reminder_type': row['reminder_type'], 'task_id': row['task_id'], 'tasks': task,
+            })
+        return notifications
+
+    def next_notification_time(self, after_iso: str) -> Optional[str]:
+        rows = self._query(
+            "SELECT notification_time FROM notifications WHERE is_sent = 0 AND notification_time > ? "
+            "ORDER BY notification_time LIMIT 1",
+            (utc_iso(after_iso),)
+        )
+        return rows[0]['notification_time'] if rows else None
+
+    def mark_notifications_sent(self, notification_ids: List[int]) -> None:
+        if not notification_ids:
+            return
+        placeholders = ", ".join("?" * len(notification_ids))
+        self._query(f"UPDATE notifications SET is_sent = 1 WHERE id IN ({placeholders})", notification_ids)
+
+    # --- Impor ---
+    def load_rows(self, table: str, rows: Iterable[Dict]) -> int:
+        """Upsert rows with their ids as-is (seeding, copying from Supabase). Returns the row count."""
+        loaded = 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    row = {column: value for column, value in row.items() if column in self._columns[table]}
+                    for column in _TIMESTAMP_COLUMNS.get(table, ()):
+                        if row.get(column):
+                            row[column] = utc_iso(row[column])
+                    columns = ", ".join(row)
+                    placeholders = ", ".join("?" * len(row))
+                    # Upsert, bukan INSERT OR REPLACE: REPLACE menghapus baris lama dan ikut menghapus notifikasinya (cascade)
+                    updates = ", ".join(f"{column} = excluded.{column}" for column in row if column != "id")
+                    self._conn.execute(
+                        f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) ON CONFLICT (id) DO UPDATE SET {updates}",
+                        tuple(row.values())
+                    )
+                    loaded += 1
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._conn.execute("ROLLBACK")
+                raise RepositoryError(f"sqlite: load into {table}: {e}") from e
+        return loaded
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def copy_from_supabase(client, target: SQLiteRepository, page_size: int = 1000) -> Dict[str, int]:
+    """Copy classes, days, users, tasks and unsent notifications from Supabase into `target`."""
+    counts = {}
+    for table in ("classes", "days", "users", "tasks", "notifications"):
+        rows, start = [], 0
+        while True:
+            query = client.table(table).select('*').order('id').range(start, start + page_size - 1)
+            if table == "notifications":
+                query = query.eq('is_sent', False)
+            page = query.execute().data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+            start += page_size
+        counts[table] = target.load_rows(table, rows)
+        logger.info(f"copy_from_supabase: {counts[table]} {table} row(s) copied.")
+    return counts
+
+def main(argv=None):
+    from .config import supabase, SQLITE_PATH
+    parser = argparse.ArgumentParser(description="Create or fill the SQLite storage backend")
+    parser.add_argument("--path", default=SQLITE_PATH, help="SQLite file (default SQLITE_PATH)")
+    parser.add_argument("--copy-from-supabase", action="store_true",
+                        help="Copy classes, days, users, tasks and unsent notifications from Supabase")
+    args = parser.parse_args(argv)
+    target = SQLiteRepository(args.path)
+    if args.copy_from_supabase:
+        if supabase is None:
+            parser.error("SUPABASE_URL/SUPABASE_KEY are not set")
+        counts = copy_from_supabase(supabase, target)
+        print(", ".join(f"{count} {table}" for table, count in counts.items()) + f" copied to {args.path}")
+    else:
+        print(f"Schema ready in {args.path}")
+    target.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# src/supabase_client.py
+import threading
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazySupabaseClient:
+    """Supabase client that is created (and the supabase package imported) on first use.
+
+    Import supabase/postgrest/httpx memakan ~0.3 s dan tidak dibutuhkan oleh proses yang
+    tidak menyentuh Supabase (STORAGE_BACKEND=sqlite, tools, benchmark). `warm_up()` membuat
+    client dan membuka koneksi HTTP di thread background agar request pertama tidak membayar biayanya.
+    """
+    def __init__(self, url: str, key: str, timeout_seconds: float):
+        self.url = url
+        self._key = key
+        self.timeout_seconds = timeout_seconds
+        self._client = None
+        self._lock = threading.Lock()
+        self._warm_up_thread: Optional[threading.Thread] = None
+
+    @property
+    def created(self) -> bool:
+        return self._client is not None
+
+    def get(self):
+        """The real supabase Client, created on the first call."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    started = time.perf_counter()
+                    from supabase import create_client
+                    from supabase.lib.client_options import ClientOptions
+                    options = ClientOptions(
+                        auto_refresh_token=True,
+                        persist_session=True,
+                        postgrest_client_timeout=self.timeout_seconds
+                    )
+                    self._client = create_client(self.url, self._key, options=options)
+                    logger.info(f"Supabase client CREATED in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def warm_up(self, table: str = "days") -> threading.Thread:
+        """Create the client and open the HTTP connection with a one-row query in a background thread."""
+        if self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(target=self._warm_up, args=(table,), name="SupabaseWarmUp", daemon=True)
+            self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def _warm_up(self, table: str) -> None:
+        started = time.perf_counter()
+        try:
+            self.get().table(table).select("id").limit(1).execute()
+            logger.info(f"Supabase warm-up done in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        except Exception as e:
+            # Bukan fatal: request pertama akan mencoba lagi lewat repository (dan circuit breaker)
+            logger.warning(f"Supabase warm-up failed after {(time.perf_counter() - started) * 1000:.0f} ms: {e!r}")
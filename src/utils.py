@@ -1,6 +1,16 @@
+import csv
+import io
+import logging
 from datetime import datetime, timedelta
-from typing import List, Dict
-from .config import supabase, States
+from typing import List, Dict, Tuple, Iterable
+from .config import States
+from .repository import repository, RepositoryError
+
+logger = logging.getLogger(__name__)
+
+TASK_TYPES = {"1": "mandiri", "2": "kelompok", "3": "ujian", "4": "quiz", "5": "project"}
+DEADLINE_FORMAT = "%d-%m-%Y %H:%M"
+MAX_BULK_TASK_ROWS = 100
 
 def update_state_with_history(notification, new_state: str) -> None:
     """Update state while preserving previous states in history"""
@@ -20,42 +30,36 @@ def update_state_with_history(notification, new_state: str) -> None:
     notification.state_manager.update_state(notification.sender, new_state)
 
 async def get_tasks(class_name: str, day_name: str) -> List[Dict]:
-    """Get tasks from Supabase"""
+    """Get tasks of a class on a day (by name) from the storage backend, ordered by deadline"""
     try:
-        response = supabase.table('tasks') \
-            .select('*') \
-            .eq('class', class_name) \
-            .eq('day', day_name) \
-            .order('due_date') \
-            .execute()
-        return response.data
-    except Exception as e:
+        class_id = next((item['id'] for item in repository.classes() if item['name'] == class_name), None)
+        day_id = next((item['id'] for item in repository.days() if item['name'] == day_name), None)
+        if class_id is None or day_id is None:
+            return []
+        tasks, _ = repository.task_page(class_id, day_id, 0, 1000)
+        return tasks
+    except RepositoryError as e:
         return []
 
 async def save_notification(phone: str, task_id: int, notify_times: List[str]):
-    """Save notification to Supabase"""
+    """Save notifications to the storage backend"""
     try:
-        # Create notification record with all times in one record
-        notification = {
-            "phone_number": phone,
-            "task_id": task_id,
-            "notification_times": notify_times,
-            "is_sent": False
-        }
+        # Satu baris per waktu notifikasi (skema `notifications` tidak punya kolom notification_times)
+        notifications = [
+            {"phone_number": phone, "task_id": task_id, "notification_time": notify_time, "is_sent": False}
+            for notify_time in notify_times
+        ]
         
-        # Insert notification
-        response = supabase.table('notifications') \
-            .insert(notification) \
-            .execute()
+        saved = repository.insert_notifications(notifications)
         
-        if response.data:
-            print(f"Successfully saved notifications for task {task_id} at times: {notify_times}")
-            return response.data
+        if saved:
+            logger.info("Saved notifications for task %s at times: %s", task_id, notify_times)
+            return saved
         else:
-            print(f"Failed to save notifications for task {task_id}")
+            logger.warning("Failed to save notifications for task %s", task_id)
             return None
     except Exception as e:
-        print(f"Error saving notifications: {e}")
+        logger.error("Error saving notifications for task %s: %s", task_id, e)
         return None
 
 def calculate_notification_times(due_date: datetime) -> List[str]:
@@ -64,4 +68,80 @@ def calculate_notification_times(due_date: datetime) -> List[str]:
         (due_date - timedelta(days=3)).isoformat(),
         (due_date - timedelta(days=1)).isoformat(),
         (due_date - timedelta(hours=1)).isoformat()
-    ] 
\ No newline at end of file
+    ] 
+
+def _detect_bulk_delimiter(first_line: str) -> str:
+    """Pick the column separator used by a pasted block or CSV file"""
+    for delimiter in ("|", ";", "\t"):
+        if delimiter in first_line:
+            return delimiter
+    return ","
+
+def parse_bulk_tasks(raw_text: str, valid_class_ids: Iterable[int], tz, now: datetime = None) -> Tuple[List[Dict], List[str]]:
+    """Parse a bulk task block into insertable task rows and a per-row error report.
+
+    Every row is `Kelas;Nama;Jenis;Deskripsi;DD-MM-YYYY HH:MM`. The day_id is
+    derived from the deadline, so a row can never land on the wrong day.
+    """
+    raw_text = raw_text or ""
+    first_line = next((line for line in raw_text.splitlines() if line.strip()), None)
+    if first_line is None:
+        return [], ["Tidak ada baris tugas yang ditemukan."]
+
+    now = now or datetime.now(tz)
+    valid_class_ids = set(valid_class_ids)
+    delimiter = _detect_bulk_delimiter(first_line)
+    task_type_names = set(TASK_TYPES.values())
+
+    # Teks mentah langsung ke csv.reader: sel bertanda kutip boleh berisi baris baru (deskripsi dari spreadsheet)
+    reader = csv.reader(io.StringIO(raw_text, newline=""), delimiter=delimiter, skipinitialspace=True)
+    rows, errors = [], []
+    seen_record = False
+    previous_line_num = 0
+    for cells in reader:
+        line_no = previous_line_num + 1 # Baris awal record di teks yang ditempel admin
+        previous_line_num = reader.line_num
+        cells = [cell.strip() for cell in cells]
+        if not any(cells):
+            continue
+        # Header di record pertama (mis. "kelas;nama;jenis;...") dilewati
+        if not seen_record:
+            seen_record = True
+            if cells[0].lower().startswith("kelas"):
+                continue
+        if len(rows) >= MAX_BULK_TASK_ROWS:
+            errors.append(f"Baris {line_no}: melebihi batas {MAX_BULK_TASK_ROWS} tugas per import.")
+            continue
+        if len(cells) != 5:
+            errors.append(f"Baris {line_no}: harus 5 kolom, ditemukan {len(cells)}.")
+            continue
+
+        class_str, name, task_type, description, deadline_str = cells
+        if not class_str.isdigit() or int(class_str) not in valid_class_ids:
+            errors.append(f"Baris {line_no}: kelas '{class_str}' tidak dikenal.")
+            continue
+        if not name:
+            errors.append(f"Baris {line_no}: nama tugas kosong.")
+            continue
+        task_type = TASK_TYPES.get(task_type, task_type.lower())
+        if task_type not in task_type_names:
+            errors.append(f"Baris {line_no}: jenis '{cells[2]}' tidak dikenal.")
+            continue
+        try:
+            due_date = datetime.strptime(deadline_str, DEADLINE_FORMAT).replace(tzinfo=tz)
+        except ValueError:
+            errors.append(f"Baris {line_no}: deadline '{deadline_str}' tidak sesuai format DD-MM-YYYY HH:MM.")
+            continue
+        if due_date < now:
+            errors.append(f"Baris {line_no}: deadline {deadline_str} sudah lewat.")
+            continue
+
+        rows.append({
+            "class_id": int(class_str),
+            "day_id": due_date.weekday() + 1,
+            "name": name,
+            "description": description,
+            "jenis_tugas": task_type,
+            "due_date": due_date.isoformat(),
+        })
+    return rows, errors
@@ -0,0 +1,160 @@
+# src/warmup.py
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+from .config import WARMUP_ENABLED, WARMUP_REMINDER_WINDOW_MINUTES, WARMUP_REPORT_AFTER_SECONDS, WORKER_FETCH_BATCH_SIZE
+from .cache import reference_cache, admin_identity_cache, upcoming_tasks_cache, load_upcoming_tasks, cache_stats
+from .search import task_search_index
+from .repository import repository, RepositoryError, is_stale
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+warmup_duration_seconds = registry.gauge(
+    "crealert_warmup_duration_seconds", "Duration of the startup cache warm-up, by step (step=\"total\" for all)."
+)
+
+
+class CacheWarmUp:
+    """Fills the in-process caches in a background thread while the bot and worker start.
+
+    Receiver: kelas, hari, ID admin, tugas UPCOMING_DAYS ke depan dan index pencarian per kelas.
+    Worker: reminder yang jatuh tempo dalam `reminder_window_minutes` di-parse lebih dulu.
+    Setiap langkah berdiri sendiri; yang gagal dicatat dan dilewati, cache lalu terisi seperti
+    biasa saat request pertama. Hit rate sejak warm-up dilaporkan `report_after_seconds` kemudian.
+    """
+    def __init__(self, receiver: bool = True, worker: bool = True,
+                 reminder_window_minutes: int = WARMUP_REMINDER_WINDOW_MINUTES,
+                 report_after_seconds: float = WARMUP_REPORT_AFTER_SECONDS):
+        self.receiver = receiver
+        self.worker = worker
+        self.reminder_window_minutes = reminder_window_minutes
+        self.report_after_seconds = report_after_seconds
+        self.durations: Dict[str, float] = {}
+        self.loaded: Dict[str, int] = {}
+        self.done = threading.Event()
+        self._baseline: Dict[str, Tuple[int, int]] = {}
+        self._notification_worker = None
+        self._reminder_rows = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="CacheWarmUp", daemon=True)
+            self._thread.start()
+
+    def attach_worker(self, notification_worker) -> None:
+        """Hand the preloaded reminders to the worker, whichever of the two is ready first."""
+        with self._lock:
+            self._notification_worker = notification_worker
+            rows = self._reminder_rows
+        if rows is not None:
+            notification_worker.preload(rows)
+
+    def _step(self, name: str, load: Callable[[], int]) -> None:
+        started = time.perf_counter()
+        try:
+            self.loaded[name] = load()
+        except RepositoryError as e:
+            logger.warning(f"CacheWarmUp: Step '{name}' failed, cache will fill on first use: {e}")
+        except Exception as e:
+            logger.error(f"CacheWarmUp: Step '{name}' failed unexpectedly: {e}", exc_info=True)
+        self.durations[name] = time.perf_counter() - started
+        warmup_duration_seconds.set(self.durations[name], step=name)
+
+    def _load_reference(self) -> int:
+        reference_cache.refresh()
+        return len(reference_cache.classes()) + len(reference_cache.days())
+
+    def _load_admin_identities(self) -> int:
+        admin_identity_cache.refresh()
+        return len(admin_identity_cache.admin_phones)
+
+    def _load_upcoming_tasks(self) -> int:
+        count = 0
+        for item in reference_cache.classes():
+            tasks = load_upcoming_tasks(item['id'])
+            if tasks is not None and not is_stale(tasks):
+                upcoming_tasks_cache.set(item['id'], tasks)
+                count += len(tasks)
+        return count
+
+    def _load_search_indexes(self) -> int:
+        return sum(task_search_index.preload(item['id']) for item in reference_cache.classes())
+
+    def _load_reminders(self) -> int:
+        window_end = datetime.now(timezone.utc) + timedelta(minutes=self.reminder_window_minutes)
+        rows = repository.due_notifications(window_end.isoformat(), WORKER_FETCH_BATCH_SIZE)
+        with self._lock:
+            self._reminder_rows = rows
+            notification_worker = self._notification_worker
+        if notification_worker is not None:
+            notification_worker.preload(rows)
+        return len(rows)
+
+    def _run(self) -> None:
+        started = time.perf_counter()
+        if self.receiver:
+            self._step("reference", self._load_reference)
+            self._step("admin_identities", self._load_admin_identities)
+            self._step("upcoming_tasks", self._load_upcoming_tasks)
+            self._step("search_indexes", self._load_search_indexes)
+        if self.worker:
+            self._step("reminders", self._load_reminders)
+        total = time.perf_counter() - started
+        warmup_duration_seconds.set(total, step="total")
+        logger.info(
+            f"CacheWarmUp: Done in {total * 1000:.0f} ms ("
+            + ", ".join(f"{name} {self.loaded.get(name, 'failed')} in {seconds * 1000:.0f} ms" for name, seconds in self.durations.items())
+            + ")."
+        )
+        self._baseline = self.stats()
+        self.done.set()
+        if self.report_after_seconds > 0:
+            timer = threading.Timer(self.report_after_seconds, self.report)
+            timer.daemon = True
+            timer.start()
+
+    def stats(self) -> Dict[str, Tuple[int, int]]:
+        """(hits, misses) of every warmed cache since process start."""
+        stats = dict(cache_stats())
+        stats["search_index"] = task_search_index.stats()
+        if self._notification_worker is not None:
+            stats["reminder_records"] = self._notification_worker.stats()
+        return stats
+
+    def hit_rates(self) -> Dict[str, Optional[float]]:
+        """Hit rate per cache for lookups made after the warm-up finished (None when there were none)."""
+        rates = {}
+        for name, (hits, misses) in self.stats().items():
+            base_hits, base_misses = self._baseline.get(name, (0, 0))
+            lookups = (hits - base_hits) + (misses - base_misses)
+            rates[name] = (hits - base_hits) / lookups if lookups else None
+        return rates
+
+    def report(self) -> None:
+        rates = ", ".join(
+            f"{name} {'-' if rate is None else f'{rate:.0%}'}" for name, rate in self.hit_rates().items()
+        )
+        logger.info(f"CacheWarmUp: Hit rate since warm-up: {rates}.")
+
+
+_warm_up: Optional[CacheWarmUp] = None
+
+def start_warm_up(receiver: bool = True, worker: bool = True) -> Optional[CacheWarmUp]:
+    """Start the warm-up thread when enabled and storage is configured. Returns it (None when not started)."""
+    global _warm_up
+    if not WARMUP_ENABLED or not repository.is_available():
+        logger.info("CacheWarmUp: Disabled or storage unavailable, caches fill on first use.")
+        return None
+    if _warm_up is None:
+        _warm_up = CacheWarmUp(receiver=receiver, worker=worker)
+        registry.gauge(
+            "crealert_cache_hit_ratio", "Hit ratio per in-process cache for lookups since the startup warm-up.",
+            callback=lambda: [({"cache": name}, rate) for name, rate in _warm_up.hit_rates().items() if rate is not None]
+        )
+    _warm_up.start()
+    return _warm_up
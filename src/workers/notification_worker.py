@@ -1,22 +1,24 @@
 # src/workers/notification_worker.py
 import asyncio
+import time
 from datetime import datetime
 import logging
 
-# Impor Supabase client dari config (pastikan path ini benar!)
-# Jika config.py ada di src/, dan file ini di src/workers/, maka ..config sudah benar
-SUPABASE_CLIENT_AVAILABLE = False
-supabase = None
-try:
-    from ..config import supabase
-    SUPABASE_CLIENT_AVAILABLE = supabase is not None
-except ImportError as e:
-    logging.getLogger(__name__).error(f"Failed to import supabase from ..config: {e}", exc_info=True)
-    # supabase akan tetap None, SUPABASE_CLIENT_AVAILABLE akan False
+from .templates import ReminderTemplates, load_reminder_templates
+from ..outbox import CHANNEL_REMINDER, get_outbox, outbox_send_health
+from ..logging_setup import item_logger
+from ..repository import repository, RepositoryError, SupabaseUnavailableError, supabase_breaker
+from ..change_feed import change_feed, ChangeEvent, DELETE
+from ..metrics import db_latency_seconds, worker_cycles_total, worker_due_notifications, worker_last_cycle_timestamp
+from ..config import (
+    WORKER_FETCH_BATCH_SIZE, WORKER_MIN_INTERVAL_SECONDS, WORKER_MAX_INTERVAL_SECONDS,
+    WORKER_BACKLOG_INTERVAL_SECONDS, WORKER_ERROR_BACKOFF_BASE_SECONDS, WORKER_ERROR_BACKOFF_MAX_SECONDS,
+    WORKER_SEND_QUEUE_SIZE, WORKER_SEND_CONCURRENCY, OUTBOX_MAX_PENDING
+)
 
 # Setup logger untuk modul ini
 logger = logging.getLogger(__name__)
-print(f"### PYPRINT ### notification_worker.py: Module loaded. Logger name: {logger.name}")
+item_log = item_logger(__name__) # Log per reminder, disampling agar tidak membebani siklus besar
 logger.info("NotificationWorker module: Logger configured.")
 
 # Definisikan timezone object di level modul
@@ -31,245 +33,430 @@ except ImportError:
     INDONESIA_TZ_FOR_WORKER = pytz.timezone("Asia/Jakarta")
     logger.info("NotificationWorker module: Successfully imported timezone using pytz.")
 
-logger.info("NotificationWorker module: Supabase client imported/configured check: supabase is not None -> %s", SUPABASE_CLIENT_AVAILABLE)
+_MISSING = object()
+
+class ReminderRecord:
+    """Compact, pre-parsed view of one pending `notifications` row and its task.
+
+    Waktu disimpan sebagai epoch seconds dan deadline sudah di-render ke WIB,
+    sehingga baris yang sama tidak perlu di-parse ulang di setiap siklus worker.
+    """
+    __slots__ = (
+        "notification_id", "source_key", "phone_number", "reminder_type", "notify_at",
+        "task_id", "task_version", "task_name", "task_desc", "task_jenis", "deadline_display",
+    )
+
+    @staticmethod
+    def row_key(item: dict) -> tuple:
+        """Fields a record is built from; a different key means the row or its task was edited."""
+        task_details = item.get('tasks') or {}
+        return (item.get('notification_time'), item.get('phone_number'), item.get('reminder_type'),
+                task_details.get('id'), task_details.get('name'), task_details.get('description'),
+                task_details.get('due_date'), task_details.get('jenis_tugas'))
+
+    @classmethod
+    def from_row(cls, item: dict):
+        """Build a record from a PostgREST row, or return None if the row is unusable."""
+        notification_id = item.get('id')
+        task_details = item.get('tasks')
+        notify_time_str = item.get('notification_time')
+        if not task_details or not task_details.get('id'):
+            logger.warning(f"NotificationWorker: Notif ID {notification_id} has missing/incomplete task data. Task: {task_details}. Skipping.")
+            return None
+        if not notify_time_str:
+            logger.warning(f"NotificationWorker: Notif ID {notification_id} has no notification_time. Skipping.")
+            return None
+        task_due_iso = task_details.get('due_date')
+        if not task_due_iso:
+            logger.error(f"NotificationWorker: Task '{task_details.get('name')}' (ID: {task_details.get('id')}) for Notif ID {notification_id} missing 'due_date'.")
+            return None
+        try:
+            notify_at = datetime.fromisoformat(notify_time_str.strip().replace('Z', '+00:00')).timestamp()
+            task_due_wib = datetime.fromisoformat(task_due_iso.replace('Z', '+00:00')).astimezone(INDONESIA_TZ_FOR_WORKER)
+        except ValueError as ve_parse:
+            logger.error(f"NotificationWorker: ValueError parsing times for Notif ID {notification_id}: {ve_parse}")
+            return None
+
+        record = cls()
+        record.notification_id = notification_id
+        record.source_key = cls.row_key(item)
+        record.phone_number = item.get('phone_number')
+        record.reminder_type = item.get('reminder_type', 'N/A')
+        record.notify_at = notify_at
+        record.task_id = task_details['id']
+        # Versi tugas berubah jika isi tugas diedit, sehingga cache render tidak memakai teks lama
+        record.task_version = hash((task_details.get('name'), task_details.get('description'),
+                                    task_due_iso, task_details.get('jenis_tugas')))
+        record.task_name = task_details.get('name', 'Tugas Tidak Diketahui')
+        record.task_desc = task_details.get('description', 'Tidak ada deskripsi.')
+        record.task_jenis = (task_details.get('jenis_tugas') or 'N/A').capitalize()
+        record.deadline_display = task_due_wib.strftime('%d/%m/%Y %H:%M WIB')
+        return record
+
+
+class PollIntervalController:
+    """Decides how long NotificationWorker sleeps between cycles."""
+    def __init__(self, min_interval=WORKER_MIN_INTERVAL_SECONDS, max_interval=WORKER_MAX_INTERVAL_SECONDS,
+                 backlog_interval=WORKER_BACKLOG_INTERVAL_SECONDS, error_base=WORKER_ERROR_BACKOFF_BASE_SECONDS,
+                 error_max=WORKER_ERROR_BACKOFF_MAX_SECONDS):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backlog_interval = backlog_interval
+        self.error_base = error_base
+        self.error_max = error_max
+        self.consecutive_errors = 0
+
+    def after_success(self, backlog: bool, next_due_ts, now_ts: float) -> float:
+        """Interval after a clean cycle: poll fast on backlog, else sleep until the next reminder is due."""
+        self.consecutive_errors = 0
+        if backlog:
+            return self.backlog_interval
+        if next_due_ts is None:
+            return self.max_interval
+        return min(max(next_due_ts - now_ts, self.min_interval), self.max_interval)
+
+    def after_error(self) -> float:
+        """Exponential backoff over consecutive failed cycles."""
+        self.consecutive_errors += 1
+        return min(self.error_base * (2 ** (self.consecutive_errors - 1)), self.error_max)
+
 
 class NotificationWorker:
-    def __init__(self, bot):
-        self.bot = bot
+    def __init__(self, api=None):
+        self.api = api # Client GreenAPI; pengiriman sendiri lewat outbox
         self.running = False
         self.task = None
-        print(f"### PYPRINT ### NotificationWorker __init__ called.")
+        self.records = {} # notification_id -> ReminderRecord (atau None untuk baris yang tidak valid)
+        self.preloaded = {} # Diisi warm-up dari thread lain, digabung ke records di awal siklus berikutnya
+        self.record_hits = 0
+        self.record_misses = 0
+        self.templates = ReminderTemplates(load_reminder_templates())
+        self.interval = PollIntervalController()
+        self.outbox = get_outbox()
+        self.send_health = outbox_send_health # Diisi oleh OutboxSender, yang benar-benar mengirim pesan
+        self.write_failures = 0
+        self.send_queue = None
+        self.in_flight = set() # notification_id yang sudah di antrean kirim tapi belum ditulis/ditandai
+        self.sender_tasks = []
+        self.loop = None
+        self.wake_event = None
+        self.wakeups = 0
         logger.info("NotificationWorker class: Instance initialized.")
 
     async def start(self):
         if self.running:
-            print("### PYPRINT ### NotificationWorker.start: Worker already running.")
             logger.info("NotificationWorker.start: Worker already running.")
             return self.task
         
         self.running = True
-        print("### PYPRINT ### NotificationWorker.start: self.running set to True. Attempting to create _run task.")
         logger.info("NotificationWorker.start: Worker flag set to running. Attempting to create _run task.")
         try:
             self.task = asyncio.create_task(self._run())
-            print(f"### PYPRINT ### NotificationWorker.start: asyncio.create_task(self._run) SUCCEEDED. Task: {self.task}")
             logger.info(f"NotificationWorker.start: asyncio.create_task(self._run()) called successfully. Task: {self.task}")
         except Exception as e_create_task:
-            print(f"### PYPRINT ERROR ### NotificationWorker.start: FAILED to create_task for _run: {e_create_task}")
             logger.error(f"NotificationWorker.start: FAILED to create_task for _run: {e_create_task}", exc_info=True)
             self.running = False
             self.task = None
         return self.task
 
     async def stop(self):
-        print("### PYPRINT ### NotificationWorker.stop called.")
         logger.info("NotificationWorker.stop: Attempting to stop worker.")
         self.running = False
         if self.task and not self.task.done():
-            print(f"### PYPRINT ### NotificationWorker.stop: Task {self.task} found, cancelling.")
             logger.info("NotificationWorker.stop: Cancelling worker task.")
             self.task.cancel()
             try:
                 await self.task
-                print("### PYPRINT ### NotificationWorker.stop: Task awaited after cancel.")
                 logger.info("NotificationWorker.stop: Worker task awaited after cancellation.")
             except asyncio.CancelledError:
-                print("### PYPRINT ### NotificationWorker.stop: Task successfully cancelled (Caught CancelledError).")
                 logger.info("NotificationWorker.stop: Worker task successfully cancelled and caught CancelledError.")
             except Exception as e:
-                print(f"### PYPRINT ERROR ### NotificationWorker.stop: Error awaiting cancelled task: {e}")
                 logger.error(f"NotificationWorker.stop: Error encountered while awaiting cancelled task: {e}", exc_info=True)
         elif self.task and self.task.done():
-            print(f"### PYPRINT ### NotificationWorker.stop: Task {self.task} was already done.")
             logger.info("NotificationWorker.stop: Worker task was already done.")
         else:
-            print("### PYPRINT ### NotificationWorker.stop: No active task to cancel or task is None.")
             logger.info("NotificationWorker.stop: No active task to cancel or task is None.")
         self.task = None
-        print("### PYPRINT ### NotificationWorker.stop: Worker fully stopped.")
         logger.info("NotificationWorker.stop: Worker stopped procedure complete.")
 
+    def wake(self, event: ChangeEvent) -> None:
+        """Change feed subscriber: end the current idle sleep when pending reminders may have changed.
+
+        Dipanggil dari thread lain (Realtime listener, thread bot), jadi event loop worker
+        dibangunkan lewat call_soon_threadsafe.
+        """
+        if event.type == DELETE or (event.record and event.record.get('is_sent')):
+            return # Termasuk update is_sent dari worker ini sendiri yang kembali lewat Realtime
+        if self.loop is None or self.wake_event is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.wake_event.set)
+
+    def preload(self, rows) -> int:
+        """Parse reminders that fall due soon ahead of time (called by the startup warm-up thread).
+
+        Record hanya diserahkan lewat satu assignment; event loop worker yang menggabungkannya
+        ke `records` dan me-render templatenya, jadi tidak ada dict yang diubah dari dua thread.
+        """
+        records = {}
+        for row in rows:
+            record = ReminderRecord.from_row(row)
+            if record is not None:
+                records[record.notification_id] = record
+        self.preloaded = records
+        return len(records)
+
+    def stats(self):
+        """(hits, misses) of the parsed reminder record cache."""
+        return self.record_hits, self.record_misses
+
+    def _adopt_preloaded(self) -> None:
+        preloaded, self.preloaded = self.preloaded, {}
+        for notification_id, record in preloaded.items():
+            if notification_id not in self.records:
+                self.records[notification_id] = record
+                self.templates.render(record)
+        logger.info(f"NotificationWorker: Adopted {len(preloaded)} preloaded reminder records from warm-up.")
+
+    async def _sleep_until_woken(self, seconds: float) -> None:
+        """Sleep until the next poll, or earlier when the change feed reports new reminders."""
+        try:
+            await asyncio.wait_for(self.wake_event.wait(), timeout=seconds)
+            self.wakeups += 1
+            logger.debug("NotificationWorker: Woken by change feed before the %.1fs poll interval ended.", seconds)
+        except asyncio.TimeoutError:
+            pass
+        self.wake_event.clear()
+
+    async def _db(self, loop_for_executor, query_name, run_query):
+        """Run a blocking Supabase query in the executor, recording its latency."""
+        started = time.perf_counter()
+        try:
+            return await loop_for_executor.run_in_executor(None, run_query)
+        finally:
+            db_latency_seconds.observe(time.perf_counter() - started, query=query_name)
+
+    async def _send_stage(self, loop_for_executor):
+        """Take reminders off the bounded queue and hand them to the outbox in batches."""
+        while True:
+            records = [await self.send_queue.get()]
+            while not self.send_queue.empty():
+                records.append(self.send_queue.get_nowait())
+            try:
+                await self._write_batch(records, loop_for_executor)
+            except Exception as e_write:
+                self.write_failures += 1
+                logger.error(f"NotificationWorker: Error writing {len(records)} reminders to the outbox: {e_write}", exc_info=True)
+            finally:
+                for record in records:
+                    self.in_flight.discard(record.notification_id)
+                    self.send_queue.task_done()
+
+    async def _clear_unusable(self, notification_ids, loop_for_executor) -> int:
+        """Mark unusable notification rows as sent so they leave the pending queue. Returns how many remain."""
+        if not notification_ids:
+            return 0
+        try:
+            await self._db(loop_for_executor, 'mark_unusable', lambda: repository.mark_notifications_sent(notification_ids))
+        except RepositoryError as e:
+            logger.error(f"NotificationWorker: Failed to retire {len(notification_ids)} unusable notifications (first IDs: {notification_ids[:10]}): {e}")
+            return len(notification_ids)
+        logger.warning(f"NotificationWorker: Marked {len(notification_ids)} unusable notifications as sent without sending (first IDs: {notification_ids[:10]}).")
+        for notification_id in notification_ids:
+            self.records.pop(notification_id, None)
+        return 0
+
+    async def _write_batch(self, records, loop_for_executor):
+        """Write rendered reminders to the outbox, then mark them as sent in one update.
+
+        Outbox menyimpan pesan secara durable dengan dedupe key per notifikasi, jadi
+        jika update `is_sent` gagal atau proses crash, baris yang diambil ulang tidak
+        masuk outbox dua kali. `is_sent` berarti "sudah diserahkan ke outbox", bukan
+        "sudah terkirim": pengiriman at-least-once, dan pesan yang gagal permanen
+        tetap di outbox sebagai 'failed' untuk di-requeue (lihat Outbox).
+        """
+        items = []
+        for record in records:
+            message_to_send = self.templates.render(record)
+            items.append((record.phone_number, message_to_send, f"reminder:{record.notification_id}"))
+            item_log.info("NotificationWorker: Queueing reminder to %s for task '%s' (Notif ID %s, Type: %s)",
+                          record.phone_number, record.task_name, record.notification_id, record.reminder_type)
+        inserted = await loop_for_executor.run_in_executor(None, self.outbox.enqueue_many, items, CHANNEL_REMINDER)
+        logger.info("NotificationWorker: Wrote %d new reminders to the outbox (%d already queued).", inserted, len(items) - inserted)
+
+        notification_ids = [record.notification_id for record in records]
+        try:
+            await self._db(loop_for_executor, 'mark_sent', lambda: repository.mark_notifications_sent(notification_ids))
+        except RepositoryError as e:
+            self.write_failures += 1
+            logger.error(f"NotificationWorker: Failed to mark Notif IDs {notification_ids} as sent. Error: {e}")
+            return
+        logger.info("NotificationWorker: Marked %d notifications as sent.", len(notification_ids))
+        for notification_id in notification_ids:
+            self.records.pop(notification_id, None)
+
     async def _run(self):
-        print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-        print(f"### PYPRINT _RUN ### NotificationWorker._run: Method entered. self.running is {self.running}")
-        print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
         logger.info("NotificationWorker._run: Method entered. self.running is %s", self.running)
         
         loop_for_executor = None  # Akan diisi nanti
 
         try:
-            if not SUPABASE_CLIENT_AVAILABLE:
-                logger.critical("NotificationWorker._run: Supabase client is NOT AVAILABLE. Worker cannot function. Exiting _run.")
+            if not repository.is_available():
+                logger.critical(f"NotificationWorker._run: Storage backend '{repository.name}' is NOT AVAILABLE. Worker cannot function. Exiting _run.")
                 self.running = False
                 return
 
             logger.info(f"NotificationWorker._run: Timezone objects successfully accessed - UTC: {UTC_TZ_FOR_WORKER}, WIB: {INDONESIA_TZ_FOR_WORKER}")
-            logger.info(f"NotificationWorker._run: Supabase client appears accessible (imported successfully).")
+            logger.info(f"NotificationWorker._run: Storage backend '{repository.name}' is available.")
             
             loop_for_executor = asyncio.get_event_loop()  # Dapatkan event loop saat ini
+            self.loop = loop_for_executor
+            self.wake_event = asyncio.Event()
+            change_feed.subscribe(self.wake, tables=('notifications',))
+            self.send_queue = asyncio.Queue(maxsize=WORKER_SEND_QUEUE_SIZE)
+            self.sender_tasks = [
+                asyncio.create_task(self._send_stage(loop_for_executor), name=f"NotificationSender-{i}")
+                for i in range(WORKER_SEND_CONCURRENCY)
+            ]
+            logger.info(f"NotificationWorker._run: Started {len(self.sender_tasks)} send stage task(s), queue size {WORKER_SEND_QUEUE_SIZE}.")
 
             cycle_count = 0
             while self.running:
                 cycle_count += 1
+                worker_cycles_total.inc()
                 current_time_utc = datetime.now(UTC_TZ_FOR_WORKER)
-                print(f"### PYPRINT _RUN ### Cycle {cycle_count}. Current UTC: {current_time_utc.isoformat()}")
-                logger.info(f"NotificationWorker: Cycle {cycle_count} START. Current UTC: {current_time_utc.isoformat()}. self.running: {self.running}")
+                logger.debug("NotificationWorker: Cycle %d START. Current UTC: %s.", cycle_count, current_time_utc)
                 
                 try:
-                    logger.debug("NotificationWorker: Fetching unsent notifications from database...")
-                    # Jalankan operasi blocking Supabase di executor
-                    response = await loop_for_executor.run_in_executor(
-                        None,
-                        lambda: supabase.table('notifications')
-                            .select('id, phone_number, notification_time, reminder_type, task_id, tasks(id, name, description, due_date, jenis_tugas)')
-                            .eq('is_sent', False)
-                            .execute()
-                    )
-                    
-                    if hasattr(response, 'error') and response.error:
-                        logger.error(f"NotificationWorker: Supabase error fetching notifications in cycle {cycle_count}: {response.error}")
-                        logger.info(f"NotificationWorker: Cycle {cycle_count} will sleep for 60s due to Supabase fetch error and then continue.")
-                        await asyncio.sleep(60)
+                    if self.send_health.is_degraded():
+                        pause_seconds = self.interval.after_error()
+                        logger.warning(f"NotificationWorker: Send error rate {self.send_health.error_rate():.0%} over the last {len(self.send_health.outcomes)} sends. Pausing fetch for {pause_seconds}s.")
+                        await asyncio.sleep(pause_seconds)
+                        self.send_health.reset()
+                        continue
+                    outbox_depth = self.outbox.depth(CHANNEL_REMINDER)
+                    if outbox_depth >= OUTBOX_MAX_PENDING:
+                        # Backpressure, bukan error: cek lagi setelah interval minimum, tanpa backoff eksponensial
+                        pause_seconds = self.interval.min_interval
+                        logger.warning(f"NotificationWorker: Outbox has {outbox_depth} pending reminders (limit {OUTBOX_MAX_PENDING}). Pausing fetch for {pause_seconds}s.")
+                        await asyncio.sleep(pause_seconds)
                         continue
-                    
-                    notifications_data = response.data
-                    if notifications_data is None:
-                        logger.warning(f"NotificationWorker: Fetched notifications data is None in cycle {cycle_count}. Assuming empty. Response: {response}")
-                        notifications_data = []
 
-                    logger.info(f"NotificationWorker: Found {len(notifications_data)} unsent notification records in cycle {cycle_count}.")
-                    
-                    if not notifications_data:
-                        logger.info(f"NotificationWorker: No pending notifications to process in this cycle {cycle_count}.")
+                    logger.debug("NotificationWorker: Fetching due unsent notifications from database...")
+                    current_time_iso = current_time_utc.isoformat()
+                    in_flight_ids = list(self.in_flight)
+                    # Jalankan operasi blocking Supabase di executor. Hanya baris yang sudah jatuh tempo yang diambil.
+                    try:
+                        notifications_data = await self._db(
+                            loop_for_executor, 'fetch_due',
+                            lambda: repository.due_notifications(current_time_iso, WORKER_FETCH_BATCH_SIZE, in_flight_ids)
+                        )
+                    except RepositoryError as e:
+                        backoff_seconds = self.interval.after_error()
+                        if isinstance(e, SupabaseUnavailableError):
+                            # Circuit terbuka: tidak ada gunanya mencoba sebelum breaker mengizinkan probe
+                            backoff_seconds = max(backoff_seconds, supabase_breaker.retry_after())
+                        logger.error(f"NotificationWorker: Supabase error fetching notifications in cycle {cycle_count}: {e}")
+                        logger.info(f"NotificationWorker: Cycle {cycle_count} will back off for {backoff_seconds}s (consecutive errors: {self.interval.consecutive_errors}).")
+                        await asyncio.sleep(backoff_seconds)
+                        continue
 
+                    if notifications_data:
+                        logger.info("NotificationWorker: Found %d due unsent notification records in cycle %d.", len(notifications_data), cycle_count)
+                    else:
+                        logger.debug("NotificationWorker: No pending notifications to process in cycle %d.", cycle_count)
+
+                    if self.preloaded:
+                        self._adopt_preloaded()
+                    current_ts = current_time_utc.timestamp()
+                    seen_ids = set()
+                    unusable_ids = []
+                    enqueued_count = 0
+                    failures_before_cycle = self.write_failures
                     for item_index, item in enumerate(notifications_data):
                         notification_id = item.get('id')
-                        phone_number = item.get('phone_number')
-                        task_details = item.get('tasks')
-                        notify_time_str = item.get('notification_time')
-                        reminder_type = item.get('reminder_type', 'N/A')
+                        seen_ids.add(notification_id)
+                        if notification_id in self.in_flight:
+                            continue # Masih di tahap kirim dari fetch sebelumnya, belum ditandai is_sent
+                        # Baris yang sudah pernah dilihat tidak di-parse ulang selama isinya sama; baris atau tugas
+                        # yang diedit (waktu reminder, nama, deadline, ...) di-parse ulang
+                        record = self.records.get(notification_id, _MISSING)
+                        if record is not _MISSING and (record is None or record.source_key == ReminderRecord.row_key(item)):
+                            self.record_hits += 1
+                        else:
+                            self.record_misses += 1
+                            record = ReminderRecord.from_row(item)
+                            self.records[notification_id] = record # None juga disimpan agar baris rusak tidak di-log tiap siklus
+                        if record is None:
+                            unusable_ids.append(notification_id)
+                            continue
 
-                        logger.info(f"NotificationWorker: Cycle {cycle_count}, Processing item {item_index + 1}/{len(notifications_data)}, Notif ID: {notification_id}")
-                        print(f"### PYPRINT _RUN ### Processing record ID: {notification_id}, phone: {phone_number}, type: {reminder_type}")
-                        logger.debug(f"NotificationWorker: Processing record ID: {notification_id}, phone: {phone_number}, type: {reminder_type}")
+                        if current_ts >= record.notify_at:
+                            # put() menunggu saat antrean penuh: inilah backpressure ke tahap fetch
+                            self.in_flight.add(notification_id)
+                            await self.send_queue.put(record)
+                            enqueued_count += 1
+                        else:
+                            item_log.debug("NotificationWorker: Notif ID %s time not yet reached. Current: %s, Notify: %s",
+                                           notification_id, current_ts, record.notify_at)
 
-                        if not task_details or not task_details.get('id'):
-                            logger.warning(f"NotificationWorker: Notif ID {notification_id} has missing/incomplete task data. Task: {task_details}. Skipping.")
-                            continue
-                        
-                        if not notify_time_str:
-                            logger.warning(f"NotificationWorker: Notif ID {notification_id} has no notification_time. Skipping.")
-                            continue
+                    if enqueued_count:
+                        logger.info("NotificationWorker: Enqueued %d reminders in cycle %d (%d in flight).", enqueued_count, cycle_count, len(self.in_flight))
 
-                        try:
-                            cleaned_time_str = notify_time_str.strip()
-                            notify_datetime_utc = datetime.fromisoformat(cleaned_time_str.replace('Z', '+00:00'))
-                            logger.debug(f"NotificationWorker: Record ID {notification_id} - Checking notification_time: {cleaned_time_str} (Parsed UTC: {notify_datetime_utc.isoformat()})")
-
-                            if current_time_utc >= notify_datetime_utc:
-                                print(f"### PYPRINT _RUN ### CONDITION MET for Notif ID {notification_id}, Task '{task_details.get('name', 'N/A')}', Type: {reminder_type}")
-                                logger.info(f"NotificationWorker: CONDITION MET for Notif ID {notification_id}, Task '{task_details.get('name', 'N/A')}', Type: {reminder_type}")
-                                
-                                task_name = task_details.get('name', 'Tugas Tidak Diketahui')
-                                task_desc = task_details.get('description', 'Tidak ada deskripsi.')
-                                task_jenis = task_details.get('jenis_tugas', 'N/A').capitalize()
-                                task_due_iso = task_details.get('due_date')
-
-                                if not task_due_iso:
-                                    logger.error(f"NotificationWorker: Task '{task_name}' (ID: {task_details.get('id')}) for Notif ID {notification_id} missing 'due_date'.")
-                                    continue
-
-                                task_due_utc = datetime.fromisoformat(task_due_iso.replace('Z', '+00:00'))
-                                task_due_wib = task_due_utc.astimezone(INDONESIA_TZ_FOR_WORKER)
-                                deadline_display_wib = task_due_wib.strftime('%d/%m/%Y %H:%M WIB')
-                                
-                                # Pesan berdasarkan reminder_type
-                                if reminder_type == "H-3D":
-                                    message_to_send = (
-                                        "🔔 *Hai, udah H-3 nih! Jangan lupa untuk menyelesaikan tugas ini ya!*\n\n"
-                                        f"📝 *Tugas:* {task_name}\n"
-                                        f"📖 *Deskripsi:* {task_desc}\n"
-                                        f"⏰ *Deadline:* {deadline_display_wib}\n"
-                                        f"📂 *Jenis:* {task_jenis}"
-                                    )
-                                elif reminder_type == "H-1D":
-                                    message_to_send = (
-                                        "🔔 *Jangan lupa ya, udah 24 jam terakhir!*\n\n"
-                                        f"📝 *Tugas:* {task_name}\n"
-                                        f"📖 *Deskripsi:* {task_desc}\n"
-                                        f"⏰ *Deadline:* {deadline_display_wib}\n"
-                                        f"📂 *Jenis:* {task_jenis}"
-                                    )
-                                elif reminder_type == "H-1H":
-                                    message_to_send = (
-                                        "🔔 *Gimana udah diupload? Jangan sampe terlambat!*\n\n"
-                                        f"📝 *Tugas:* {task_name}\n"
-                                        f"📖 *Deskripsi:* {task_desc}\n"
-                                        f"⏰ *Deadline:* {deadline_display_wib}\n"
-                                        f"📂 *Jenis:* {task_jenis}"
-                                    )
-                                else:
-                                    logger.warning(f"NotificationWorker: Unknown reminder_type '{reminder_type}' for Notif ID {notification_id}. Sending generic reminder.")
-                                    message_to_send = (
-                                        "🔔 *Reminder Tugas!*\n\n"
-                                        f"📝 *Tugas:* {task_name}\n"
-                                        f"⏰ *Deadline:* {deadline_display_wib}\n"
-                                        "Segera selesaikan tugasmu!"
-                                    )
-                                
-                                print(f"### PYPRINT _RUN ### Attempting send to {phone_number} for task '{task_name}' with message: '{message_to_send[:30]}...'")
-                                logger.info(f"NotificationWorker: Attempting send to {phone_number} for task '{task_name}' (Notif ID {notification_id}, Type: {reminder_type})")
-                                
-                                send_response = await loop_for_executor.run_in_executor(
-                                    None,
-                                    lambda: self.bot.api.sending.sendMessage(chatId=phone_number, message=message_to_send)
-                                )
-                                
-                                logger.info(f"NotificationWorker: sendMessage API call completed. Response: {send_response}")
-                                
-                                update_db_response = await loop_for_executor.run_in_executor(
-                                    None,
-                                    lambda: supabase.table('notifications')
-                                        .update({'is_sent': True})
-                                        .eq('id', notification_id)
-                                        .execute()
-                                )
-                                if hasattr(update_db_response, 'error') and update_db_response.error:
-                                    logger.error(f"NotificationWorker: Failed to mark Notif ID {notification_id} as sent. Error: {update_db_response.error}")
-                                else:
-                                    logger.info(f"NotificationWorker: Successfully marked Notif ID {notification_id} as sent.")
-                            else:
-                                logger.debug(f"NotificationWorker: Notif ID {notification_id} time not yet reached. Current: {current_time_utc.isoformat()}, Notify: {notify_datetime_utc.isoformat()}")
-                        except ValueError as ve_parse:
-                            logger.error(f"NotificationWorker: ValueError parsing time '{notify_time_str}' for Notif ID {notification_id}: {ve_parse}", exc_info=True)
-                        except Exception as e_inner:
-                            logger.error(f"NotificationWorker: Error processing notification ID {notification_id}: {e_inner}", exc_info=True)
-                    
-                    logger.info(f"NotificationWorker: Finished processing all items (if any) in cycle {cycle_count}.")
-                    sleep_duration = 30
-                    print(f"### PYPRINT _RUN ### Cycle {cycle_count} finished. Sleeping {sleep_duration}s.")
-                    logger.info(f"NotificationWorker: Cycle {cycle_count} COMPLETED successfully. Preparing to sleep for {sleep_duration}s.")
-                    await asyncio.sleep(sleep_duration)
-                    logger.info(f"NotificationWorker: Cycle {cycle_count} AWAKENED after {sleep_duration}s sleep.")
+                    # Baris rusak (tanpa tugas/waktu) tidak akan pernah terkirim; tanpa ditandai mereka tetap di
+                    # urutan teratas setiap fetch dan bisa memenuhi seluruh batch di depan reminder yang valid
+                    stuck_unusable = await self._clear_unusable(unusable_ids, loop_for_executor)
+
+                    # Buang record untuk notifikasi yang sudah tidak pending (terkirim/dihapus), dan lepas dict mentah PostgREST.
+                    # Record hasil warm-up yang belum jatuh tempo memang belum ikut terambil, jadi disimpan sampai waktunya.
+                    for stale_id in self.records.keys() - seen_ids:
+                        stale_record = self.records[stale_id]
+                        if stale_record is None or stale_record.notify_at <= current_ts:
+                            del self.records[stale_id]
+                    notifications_data = None
+                    logger.debug("NotificationWorker: %d reminder records cached after cycle %d.", len(self.records), cycle_count)
+                    backlog = len(seen_ids) - stuck_unusable >= WORKER_FETCH_BATCH_SIZE
+                    # Selama backlog, fetch berikutnya berjalan bersamaan dengan tahap kirim: baris in flight dikecualikan
+                    # dari query, dan batasan antrean yang menahan fetch. Sebelum tidur (atau jika tidak ada baris baru)
+                    # tahap kirim ditunggu, agar penulisan yang gagal dihitung di siklus ini dan dicoba ulang dengan backoff.
+                    if not backlog or not enqueued_count:
+                        await self.send_queue.join()
+                    worker_due_notifications.set(len(seen_ids))
+                    worker_last_cycle_timestamp.set(time.time())
+                    next_due_ts = None
+                    if not backlog:
+                        next_due_time = await self._db(
+                            loop_for_executor, 'next_due', lambda: repository.next_notification_time(current_time_iso)
+                        )
+                        if next_due_time:
+                            next_due_ts = datetime.fromisoformat(next_due_time.strip().replace('Z', '+00:00')).timestamp()
+                    if self.write_failures > failures_before_cycle:
+                        # Ada reminder yang gagal ditulis/ditandai: coba lagi dengan backoff, bukan menunggu jadwal berikutnya
+                        sleep_duration = self.interval.after_error()
+                    else:
+                        sleep_duration = self.interval.after_success(backlog, next_due_ts, datetime.now(UTC_TZ_FOR_WORKER).timestamp())
+                    logger.debug("NotificationWorker: Cycle %d COMPLETED. Sleeping %.1fs (backlog: %s).", cycle_count, sleep_duration, backlog)
+                    await self._sleep_until_woken(sleep_duration)
                     
                 except Exception as e_main_loop_try:
                     logger.error(f"NotificationWorker: Uncaught error in main processing block of worker cycle {cycle_count}: {e_main_loop_try}", exc_info=True)
-                    logger.info(f"NotificationWorker: Cycle {cycle_count} will sleep for 60s due to unhandled error in processing block and then continue.")
-                    await asyncio.sleep(60)
+                    backoff_seconds = self.interval.after_error()
+                    logger.info(f"NotificationWorker: Cycle {cycle_count} will back off for {backoff_seconds}s due to unhandled error in processing block and then continue.")
+                    await asyncio.sleep(backoff_seconds)
                     continue
 
             logger.info(f"NotificationWorker._run: Gracefully exited 'while self.running' loop. self.running is {self.running}. Total cycles: {cycle_count}.")
 
         except ImportError as e_imp:
-            print(f"### PYPRINT _RUN ERROR ### CRITICAL IMPORT ERROR in _run task: {e_imp}")
             logger.critical(f"NotificationWorker._run: CRITICAL IMPORT ERROR in _run task: {e_imp}", exc_info=True)
             self.running = False
         except Exception as e_very_outer:
-            print(f"### PYPRINT _RUN ERROR ### CRITICAL UNHANDLED EXCEPTION in _run task: {e_very_outer}")
             logger.critical(f"NotificationWorker._run: CRITICAL UNHANDLED EXCEPTION in _run task (outside main while loop): {e_very_outer}", exc_info=True)
             self.running = False
         finally:
-            print(f"### PYPRINT _RUN ### Method _run FINALLY block. self.running is {self.running}")
+            change_feed.unsubscribe(self.wake)
+            for sender_task in self.sender_tasks:
+                sender_task.cancel()
+            self.sender_tasks = []
             task_status = "No task object or self.task not set"
             if hasattr(self, 'task') and self.task:
                 task_is_done = self.task.done()
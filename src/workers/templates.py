@@ -0,0 +1,102 @@
+# src/workers/templates.py
+import json
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from ..config import REMINDER_TEMPLATES_FILE, REMINDER_RENDER_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Placeholder yang tersedia: {task_name}, {task_desc}, {deadline}, {task_jenis}
+DEFAULT_REMINDER_TEMPLATES = {
+    "H-3D": (
+        "🔔 *Hai, udah H-3 nih! Jangan lupa untuk menyelesaikan tugas ini ya!*\n\n"
+        "📝 *Tugas:* {task_name}\n"
+        "📖 *Deskripsi:* {task_desc}\n"
+        "⏰ *Deadline:* {deadline}\n"
+        "📂 *Jenis:* {task_jenis}"
+    ),
+    "H-1D": (
+        "🔔 *Jangan lupa ya, udah 24 jam terakhir!*\n\n"
+        "📝 *Tugas:* {task_name}\n"
+        "📖 *Deskripsi:* {task_desc}\n"
+        "⏰ *Deadline:* {deadline}\n"
+        "📂 *Jenis:* {task_jenis}"
+    ),
+    "H-1H": (
+        "🔔 *Gimana udah diupload? Jangan sampe terlambat!*\n\n"
+        "📝 *Tugas:* {task_name}\n"
+        "📖 *Deskripsi:* {task_desc}\n"
+        "⏰ *Deadline:* {deadline}\n"
+        "📂 *Jenis:* {task_jenis}"
+    ),
+    # Dipakai untuk reminder_type yang tidak dikenal
+    "DEFAULT": (
+        "🔔 *Reminder Tugas!*\n\n"
+        "📝 *Tugas:* {task_name}\n"
+        "⏰ *Deadline:* {deadline}\n"
+        "Segera selesaikan tugasmu!"
+    ),
+}
+
+_SAMPLE_FIELDS = {"task_name": "", "task_desc": "", "deadline": "", "task_jenis": ""}
+
+def load_reminder_templates(path: Optional[str] = REMINDER_TEMPLATES_FILE) -> Dict[str, str]:
+    """Default templates, overridden per reminder_type by a JSON file if one is configured."""
+    templates = dict(DEFAULT_REMINDER_TEMPLATES)
+    if not path:
+        return templates
+    try:
+        with open(path, encoding="utf-8") as templates_file:
+            overrides = json.load(templates_file)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to load reminder templates from {path}: {e}. Using defaults.")
+        return templates
+    if not isinstance(overrides, dict):
+        logger.warning(f"Reminder templates file {path} must contain a JSON object of reminder_type -> template, got {type(overrides).__name__}. Using defaults.")
+        return templates
+
+    for reminder_type, template in overrides.items():
+        try:
+            template.format(**_SAMPLE_FIELDS)
+        except (AttributeError, KeyError, IndexError, ValueError) as e:
+            logger.error(f"Reminder template '{reminder_type}' in {path} is invalid ({e}). Keeping default.")
+            continue
+        templates[reminder_type] = template
+    logger.info(f"Loaded {len(overrides)} reminder template override(s) from {path}.")
+    return templates
+
+
+class ReminderTemplates:
+    """Template registry keyed by reminder_type with an LRU render cache.
+
+    Cache key adalah (task_id, reminder_type, task_version), jadi satu reminder
+    yang dikirim ke seluruh kelas hanya di-format sekali.
+    """
+    def __init__(self, templates: Dict[str, str], cache_size: int = REMINDER_RENDER_CACHE_SIZE):
+        self.templates = templates
+        self.cache_size = cache_size
+        self._rendered: "OrderedDict[tuple, str]" = OrderedDict()
+
+    def render(self, record) -> str:
+        cache_key = (record.task_id, record.reminder_type, record.task_version)
+        message = self._rendered.get(cache_key)
+        if message is not None:
+            self._rendered.move_to_end(cache_key)
+            return message
+
+        template = self.templates.get(record.reminder_type)
+        if template is None:
+            logger.warning(f"NotificationWorker: Unknown reminder_type '{record.reminder_type}' for Notif ID {record.notification_id}. Sending generic reminder.")
+            template = self.templates["DEFAULT"]
+        message = template.format(
+            task_name=record.task_name,
+            task_desc=record.task_desc,
+            deadline=record.deadline_display,
+            task_jenis=record.task_jenis,
+        )
+        self._rendered[cache_key] = message
+        if len(self._rendered) > self.cache_size:
+            self._rendered.popitem(last=False)
+        return message